@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 15:31:09 2026
+
+@author: cgwork
+"""
+
+import json
+import os
+import re
+import subprocess
+import threading
+
+from fileutils import atomic_write_json
+
+# Options handled by FFMPEG itself, or by the generic AVCodecContext options,
+# they are honoured whatever the video encoder.
+_GENERIC_OPTIONS = {
+    "c:v", "vcodec", "codec:v", "c:a", "acodec", "codec:a", "f", "format",
+    "pix_fmt", "loglevel", "color_range", "color_primaries", "color_trc",
+    "colorspace", "export_side_data", "threads", "b:v", "b:a", "minrate",
+    "maxrate", "bufsize", "g", "keyint_min", "bf", "refs", "r", "s",
+    "frames:v", "an", "sn", "strict", "map", "pass", "passlogfile", "vf",
+    "filter:v", "movflags",
+}
+
+# Option support matrix from codec_notes.txt, option : honoured values, or
+# None for any value. It restricts the <string> options FFMPEG can't
+# enumerate, and stands alone when the FFMPEG help can't be parsed.
+_PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium",
+            "slow", "slower", "veryslow", "placebo"]
+_STATIC_OPTIONS = {
+    "libx264": {
+        "crf": None, "qp": None, "preset": _PRESETS, "profile": None,
+        "tune": ["film", "animation", "grain", "stillimage", "psnr", "ssim",
+                 "fastdecode", "zerolatency"],
+        "motion-est": ["dia", "hex", "umh", "esa", "tesa",
+                       -1, 0, 1, 2, 3, 4],
+        "aq-mode": [-1, 0, 1, 2, 3], "weightp": [-1, 0, 1, 2],
+        "coder": ["default", "cavlc", "cabac", "vlc", "ac", -1, 0, 1],
+        "x264-params": None, "x264opts": None,
+    },
+    "libx265": {
+        "crf": None, "qp": None, "preset": _PRESETS,
+        "tune": ["grain", "animation", "fastdecode", "zerolatency", "psnr",
+                 "ssim"],
+        "profile": ["main", "main-intra", "mainstillpicture", "main444-8",
+                    "main444-intra", "main10"],
+        "x265-params": None,
+    },
+    "libvpx": {
+        "crf": None, "tune": ["psnr", "ssim"], "deadline": None,
+        "cpu-used": None,
+    },
+    "libvpx-vp9": {
+        "crf": None, "tune": ["psnr", "ssim"], "deadline": None,
+        "cpu-used": None, "aq-mode": [-1, 0, 1, 2, 3, 4], "row-mt": None,
+    },
+    "libsvtav1": {
+        "crf": None, "qp": None, "preset": list(range(-2, 14)),
+        "svtav1-params": None,
+    },
+    "libaom-av1": {
+        "crf": None, "tune": ["psnr", "ssim"], "cpu-used": None,
+        "aq-mode": [-1, 0, 1, 2, 3], "aom-params": None,
+    },
+}
+
+_OPTION_RE = re.compile(r"^  -(\S+)\s+<(\w+)>\s+\S+\s*(.*)$")
+_CONSTANT_RE = re.compile(r"^ {4,}(\S+)\s+(-?\d+)\s+[E.][.D][.FVASXRBTP]")
+_RANGE_RE = re.compile(r"\(from (\S+) to (\S+)\)")
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class CodecCapabilities:
+    """Video encoder option capability table, from FFMPEG encoder help."""
+
+    def __init__(self, cache_file=None, ffmpeg_bin="ffmpeg"):
+        self.__cache_file = cache_file
+        self.__ffmpeg = ffmpeg_bin
+        self.__lock = threading.Lock()
+        self.__version = None
+        self.__table = {}
+
+        if cache_file is not None and os.path.isfile(cache_file):
+            with open(cache_file, "r", encoding="utf8") as jsonfile:
+                cached = json.load(jsonfile)
+            if cached.get("version") == self.version():
+                self.__table = cached.get("codecs", {})
+
+    def version(self):
+        """
+        Return the FFMPEG version string the capabilities were read from.
+
+        Returns
+        -------
+        str
+            First line of ffmpeg -version, or None if FFMPEG isn't found.
+
+        """
+        if self.__version is None:
+            try:
+                output = subprocess.run(
+                    [self.__ffmpeg, "-hide_banner", "-version"],
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                    universal_newlines=True, check=False).stdout
+                self.__version = output.splitlines()[0] if output else ""
+            except OSError:
+                self.__version = ""
+        return self.__version or None
+
+    @staticmethod
+    def parse_encoder_help(text):
+        """
+        Parse the output of ffmpeg -h encoder=<name>.
+
+        Parameters
+        ----------
+        text : str
+            FFMPEG encoder help output.
+
+        Returns
+        -------
+        dict
+            Dictionary with the "pix_fmts" list, and the "options" dictionary
+            of option name : {"type", "min", "max", "values"}, values being
+            the named constants of the option.
+
+        """
+        caps = {"pix_fmts": [], "options": {}}
+        option = None
+
+        for line in text.splitlines():
+            if line.strip().startswith("Supported pixel formats:"):
+                caps["pix_fmts"] = line.split(":", 1)[1].split()
+                continue
+
+            match = _OPTION_RE.match(line)
+            if match is not None:
+                name, kind, help_text = match.groups()
+                option = {"type": kind, "min": None, "max": None,
+                          "values": {}}
+                bounds = _RANGE_RE.search(help_text)
+                if bounds is not None:
+                    option["min"] = _number(bounds.group(1))
+                    option["max"] = _number(bounds.group(2))
+                caps["options"][name] = option
+                continue
+
+            match = _CONSTANT_RE.match(line)
+            if match is not None and option is not None:
+                option["values"][match.group(1)] = int(match.group(2))
+
+        return caps
+
+    def __read(self, codec):
+        try:
+            process = subprocess.run(
+                [self.__ffmpeg, "-hide_banner", "-h", f"encoder={codec}"],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                universal_newlines=True, check=False)
+        except OSError:
+            return None
+
+        if f"Encoder {codec} " not in process.stdout:
+            return None
+        return self.parse_encoder_help(process.stdout)
+
+    def capabilities(self, codec):
+        """
+        Return the capabilities of a video encoder, read once and cached.
+
+        Parameters
+        ----------
+        codec : str
+            FFMPEG encoder name, i.e, "libx264".
+
+        Returns
+        -------
+        dict
+            Parsed encoder help, see parse_encoder_help, or None when FFMPEG
+            or the encoder aren't available.
+
+        """
+        with self.__lock:
+            if codec not in self.__table:
+                self.__table[codec] = self.__read(codec)
+                if self.__cache_file is not None and \
+                        self.version() is not None:
+                    atomic_write_json(
+                        {"version": self.version(), "codecs": self.__table},
+                        self.__cache_file)
+            return self.__table[codec]
+
+    def honours(self, codec, option, value):
+        """
+        Check if a video encoder honours an option with a given value.
+
+        Parameters
+        ----------
+        codec : str
+            FFMPEG encoder name, i.e, "libx264".
+        option : str
+            FFMPEG option name, i.e, "tune".
+        value : Any
+            Option value.
+
+        Returns
+        -------
+        bool
+            False if the encoder would reject or silently ignore the option.
+
+        """
+        caps = self.capabilities(codec)
+
+        if option in _GENERIC_OPTIONS:
+            if option == "pix_fmt" and caps is not None and caps["pix_fmts"]:
+                return str(value) in caps["pix_fmts"]
+            return True
+
+        static = _STATIC_OPTIONS.get(codec, {})
+        if option in static:
+            values = static[option]
+            return values is None or str(value) in map(str, values)
+
+        if caps is None or option not in caps["options"]:
+            return False
+
+        parsed = caps["options"][option]
+        number = _number(value)
+        if number is None:
+            return parsed["type"] in ("string", "dictionary") or \
+                str(value) in parsed["values"]
+
+        low, high = parsed["min"], parsed["max"]
+        return (low is None or number >= low) and \
+            (high is None or number <= high)
+
+    def effective_options(self, options):
+        """
+        Drop the options the video encoder would reject or ignore.
+
+        Parameters
+        ----------
+        options : dict
+            FFMPEG options in key:pair form, with the "c:v" video codec.
+
+        Returns
+        -------
+        dict
+            The options the encoder actually honours.
+
+        """
+        codec = options.get(
+            "c:v", options.get("vcodec", options.get("codec:v")))
+        if codec is None:
+            return dict(options)
+
+        return {
+            key: value for key, value in options.items()
+            if self.honours(codec, key, value)
+        }
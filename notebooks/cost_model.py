@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 20:14:27 2026
+
+@author: cgwork
+"""
+
+import heapq
+import json
+import math
+import os
+import threading
+
+from fileutils import atomic_write_json
+
+# Rough single thread CPU seconds per megapixel frame of each encoder at its
+# default preset, and the relative cost of the x264/x265 presets. They only
+# rank the jobs until the model is calibrated from recorded runs.
+_CODEC_COST = {
+    "libx264": 0.013, "libx265": 0.06, "libvpx": 0.03, "libvpx-vp9": 0.1,
+    "libsvtav1": 0.04, "libaom-av1": 0.5,
+}
+_PRESET_FACTORS = {
+    "ultrafast": 0.15, "superfast": 0.25, "veryfast": 0.4, "faster": 0.6,
+    "fast": 0.8, "medium": 1.0, "slow": 1.6, "slower": 3.0, "veryslow": 6.0,
+    "placebo": 20.0,
+}
+# samples per pixel, relative to 4:2:0
+_CHROMA_FACTORS = {
+    "yuv420p": 1.0, "yuv422p": 4 / 3, "yuv444p": 2.0,
+    "yuv420p10le": 1.0, "yuv422p10le": 4 / 3, "yuv444p10le": 2.0,
+}
+# bits per pixel of a CRF 23 x264 encode, halving every 6 CRF steps
+_PRIOR_BPP = 0.1
+
+
+class CostModel:
+    """Encode cost and size model, calibrated from recorded encodes."""
+
+    def __init__(self, filename=None):
+        self.__filename = filename
+        self.__lock = threading.Lock()
+        # "codec|preset" : [n, log cpu ratio, log wall ratio]
+        self.__speed = {}
+        self.__size = {}  # "codec|crf" : [n, log bits per pixel ratio]
+
+        if filename is not None and os.path.isfile(filename):
+            with open(filename, "r", encoding="utf8") as jsonfile:
+                data = json.load(jsonfile)
+            self.__speed = data.get("speed", {})
+            self.__size = data.get("size", {})
+
+    @staticmethod
+    def features(options, width, height, frames):
+        """
+        Return the cost features of an encode.
+
+        Parameters
+        ----------
+        options : dict
+            FFMPEG options in key:pair form.
+        width : int
+            Source width.
+        height : int
+            Source height.
+        frames : int
+            Number of frames encoded.
+
+        Returns
+        -------
+        dict
+            Dictionary with the "codec", "preset", "pix_fmt", "crf",
+            "bitrate" in bit/s if set, and "mpixels", the megapixel frames.
+
+        """
+        bitrate = options.get("b:v")
+        if isinstance(bitrate, str):
+            scale = {"k": 1e3, "m": 1e6}.get(bitrate[-1:].lower(), 1)
+            bitrate = float(bitrate.rstrip("kKmM")) * scale
+        return {
+            "codec": options.get("c:v", "libx264"),
+            "preset": options.get("preset"),
+            "pix_fmt": options.get("pix_fmt", "yuv420p"),
+            "crf": options.get("crf"),
+            "bitrate": bitrate,
+            "mpixels": width * height * frames / 1e6,
+        }
+
+    @staticmethod
+    def __prior_cost(features):
+        """Prior CPU seconds of an encode, see _CODEC_COST."""
+        cost = _CODEC_COST.get(features["codec"], 0.05)
+        preset = features["preset"]
+        if features["codec"] == "libsvtav1" and preset is not None:
+            # SVT-AV1 presets -2 to 13, from the slowest to the fastest
+            cost *= 2 ** ((8 - int(preset)) * 0.6)
+        else:
+            cost *= _PRESET_FACTORS.get(preset, 1.0)
+        return cost * _CHROMA_FACTORS.get(features["pix_fmt"], 1.0) * \
+            features["mpixels"]
+
+    @staticmethod
+    def __prior_bpp(features):
+        """Prior bits per pixel of a CRF encode, see _PRIOR_BPP."""
+        crf = features["crf"] if features["crf"] is not None else 23
+        return _PRIOR_BPP * 2 ** ((23 - float(crf)) / 6)
+
+    @staticmethod
+    def __mean(entries, index):
+        """Geometric mean of the log ratios of a list of entries."""
+        count = sum(entry[0] for entry in entries)
+        if count == 0:
+            return 1.0
+        return math.exp(sum(entry[index] for entry in entries) / count)
+
+    def __correction(self, table, key, index):
+        """Calibration of a key, else of its codec, else of every key."""
+        codec = key.split("|")[0]
+        for entries in (
+                [table[key]] if key in table else [],
+                [v for k, v in table.items() if k.split("|")[0] == codec],
+                list(table.values())):
+            if entries:
+                return self.__mean(entries, index)
+        return 1.0
+
+    def predict(self, features, duration=None):
+        """
+        Predict the cost and output size of an encode.
+
+        Parameters
+        ----------
+        features : dict
+            Cost features, see features().
+        duration : float, optional
+            Media duration in seconds, sizing the bitrate encodes.
+            The default is None.
+
+        Returns
+        -------
+        dict
+            Dictionary with the predicted "cpu_time" and "wall_time" in
+            seconds, and the output "size" in bytes.
+
+        """
+        prior = self.__prior_cost(features)
+        speed_key = f"{features['codec']}|{features['preset']}"
+
+        with self.__lock:
+            cpu_time = prior * self.__correction(self.__speed, speed_key, 1)
+            wall_time = prior * self.__correction(self.__speed, speed_key, 2)
+
+            if features["bitrate"] is not None and duration:
+                size = features["bitrate"] * duration / 8
+            else:
+                size_key = f"{features['codec']}|{features['crf']}"
+                bpp = self.__prior_bpp(features) * \
+                    self.__correction(self.__size, size_key, 1)
+                size = bpp * features["mpixels"] * 1e6 / 8
+
+        return {"cpu_time": cpu_time, "wall_time": wall_time, "size": size}
+
+    def observe(self, features, telemetry):
+        """
+        Calibrate the model with the telemetry of a done encode.
+
+        Parameters
+        ----------
+        features : dict
+            Cost features of the encode, see features().
+        telemetry : dict
+            Encode telemetry, with the "cpu_time", "wall_time", and "size".
+
+        Returns
+        -------
+        None.
+
+        """
+        prior = self.__prior_cost(features)
+        if prior <= 0 or not telemetry.get("wall_time"):
+            return
+
+        cpu_time = telemetry.get("cpu_time") or telemetry["wall_time"]
+        speed_key = f"{features['codec']}|{features['preset']}"
+
+        with self.__lock:
+            entry = self.__speed.setdefault(speed_key, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += math.log(cpu_time / prior)
+            entry[2] += math.log(telemetry["wall_time"] / prior)
+
+            if telemetry.get("size") and features["bitrate"] is None:
+                # relative to the prior, so the codec level correction also
+                # applies to the CRF values never encoded
+                bpp = telemetry["size"] * 8 / (features["mpixels"] * 1e6)
+                entry = self.__size.setdefault(
+                    f"{features['codec']}|{features['crf']}", [0, 0.0])
+                entry[0] += 1
+                entry[1] += math.log(bpp / self.__prior_bpp(features))
+
+            if self.__filename is not None:
+                atomic_write_json(
+                    {"version": 1, "speed": self.__speed,
+                     "size": self.__size},
+                    self.__filename)
+
+    @staticmethod
+    def makespan(durations, slots):
+        """
+        Simulate the wall time of jobs dispatched longest-first.
+
+        Parameters
+        ----------
+        durations : list
+            Wall time of each job in seconds.
+        slots : int
+            Number of concurrent jobs.
+
+        Returns
+        -------
+        float
+            Time at which the last job ends.
+
+        """
+        ends = [0.0] * max(1, int(slots))
+        for duration in sorted(durations, reverse=True):
+            heapq.heappush(ends, heapq.heappop(ends) + duration)
+        return max(ends)
@@ -6,12 +6,32 @@ Created on Mon Dec 27 06:44:38 2021
 @author: cgwork
 """
 
-import copy as cp
-from alive_progress import alive_bar
+import asyncio
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
 from itertools import product
 
+from alive_progress import alive_bar
+
 import ffmpeg
 
+from codec_caps import CodecCapabilities
+from cost_model import CostModel
+from manifest import SweepManifest
+from pass_cache import PassLogCache
+from proxy import ProxyClips
+from telemetry import (
+    combine, output_stats, run_ffmpeg, run_ffmpeg_async, run_in_thread,
+    save_telemetry)
+
+# options of the concatenated output, the others only apply to the segments
+_CONCAT_OPTIONS = {
+    "c:a", "acodec", "codec:a", "b:a", "f", "format", "movflags", "loglevel",
+}
+
 # import media as md
 # import options as op
 
@@ -23,6 +43,11 @@ class Encoder:
         self.__media = media  # md.Media
         self.__options = options  # op.Options
         self.__full_test_filenames = {}  # output basename + parameters
+        self.__manifest = None
+        self.__capabilities = None
+        self.__pass_logs = None
+        self.__cost_model = None
+        self.__proxies = None
         # op.Options has
         # common_options | encode_options | encoding_sets (iters)
 
@@ -84,6 +109,132 @@ class Encoder:
         """
         return self.__options
 
+    def manifest(self):
+        """
+        Getter for the sweep manifest of the media output directory.
+
+        Returns
+        -------
+        SweepManifest
+            Manifest of completed jobs, stored as .sweep_manifest.json
+            in the media output directory.
+
+        """
+        filename = os.path.join(
+            self.__media.output_dir, ".sweep_manifest.json")
+        if self.__manifest is None or self.__manifest.filename != filename:
+            self.__manifest = SweepManifest(filename)
+        return self.__manifest
+
+    def capabilities(self):
+        """
+        Getter for the video encoder option capability table.
+
+        Returns
+        -------
+        CodecCapabilities
+            Capability table read from the FFMPEG encoder help, cached in
+            the media cache directory.
+
+        """
+        if self.__capabilities is None:
+            self.__capabilities = CodecCapabilities(os.path.join(
+                self.__media.cache_dir, "codec_capabilities.json"))
+        return self.__capabilities
+
+    def pass_logs(self):
+        """
+        Getter for the first pass statistics cache.
+
+        Returns
+        -------
+        PassLogCache
+            Cache of the two-pass encode statistics, stored in the passlogs
+            subdirectory of the media cache directory.
+
+        """
+        if self.__pass_logs is None:
+            self.__pass_logs = PassLogCache(
+                os.path.join(self.__media.cache_dir, "passlogs"))
+        return self.__pass_logs
+
+    def proxies(self):
+        """
+        Getter for the proxy clips cache.
+
+        Returns
+        -------
+        ProxyClips
+            Cache of the scene-sampled proxy clips of the sources, stored in
+            the proxies subdirectory of the media cache directory.
+
+        """
+        if self.__proxies is None:
+            self.__proxies = ProxyClips(
+                self.__media, os.path.join(self.__media.cache_dir, "proxies"))
+        return self.__proxies
+
+    def cost_model(self):
+        """
+        Getter for the encode cost model.
+
+        Returns
+        -------
+        CostModel
+            Cost and size model calibrated from the done encodes, stored in
+            the media cache directory.
+
+        """
+        if self.__cost_model is None:
+            self.__cost_model = CostModel(os.path.join(
+                self.__media.cache_dir, "cost_model.json"))
+        return self.__cost_model
+
+    def job_features(self, job):
+        """
+        Return the cost features of an encode job.
+
+        Parameters
+        ----------
+        job : dict
+            Encode job, as built by jobs().
+
+        Returns
+        -------
+        dict
+            The job cost features, see CostModel.features.
+
+        """
+        record = self.__media.record(job["input"])
+        return CostModel.features(
+            job["options"], record.width, record.height,
+            self.__media.number_of_frames(job["input"]))
+
+    def predict(self, job):
+        """
+        Predict the cost and output size of an encode job.
+
+        Parameters
+        ----------
+        job : dict
+            Encode job, as built by jobs().
+
+        Returns
+        -------
+        dict
+            Dictionary with the predicted "cpu_time" and "wall_time" in
+            seconds, and the output "size" in bytes, see CostModel.predict.
+            A two-pass job counts its first pass as a second encode.
+
+        """
+        prediction = self.cost_model().predict(
+            self.job_features(job),
+            self.__media.record(job["input"]).duration)
+        if job.get("passes", 1) == 2:
+            prediction["cpu_time"] *= 2
+            prediction["wall_time"] *= 2
+        return prediction
+
     def full_test_filenames(self):
         """
         Return the fully assembled VQA output test filenames.
@@ -99,7 +250,8 @@ class Encoder:
         return self.__full_test_filenames
 
     @staticmethod
-    def encode_video(video_in, video_out, options, debug=False):
+    def encode_video(video_in, video_out, options, debug=False,
+                     reference=None, audio=True):
         """
         Encode video with the FFMPEG options passed.
 
@@ -113,26 +265,154 @@ class Encoder:
             FFMPEG options in key:pair form.
         debug : bool
             When true, skips encoding and dump the I/O media paths instead.
+        reference : str, optional
+            Raw decoded reference of video_in to read the video stream from,
+            see Media.reference. The default is None.
+        audio : bool, optional
+            With a reference, also map the audio stream of video_in.
+            The default is True.
 
         Returns
         -------
-        None.
+        dict
+            The encode telemetry, see telemetry.run_ffmpeg, None in debug.
 
         """
         if debug is True:
             print(f"in = {video_in}, out = {video_out}, opt = {options}")
+            return None
+
+        return run_ffmpeg(Encoder.encode_stream(
+            video_in, video_out, options, reference=reference, audio=audio))
+
+    @staticmethod
+    def encode_stream(video_in, video_out, options, reference=None,
+                      audio=True):
+        """
+        Build the ffmpeg-python output stream of an encode.
+
+        Parameters
+        ----------
+        video_in : str
+            Input video filename.
+        video_out : str
+            Output video filename.
+        options : dict
+            FFMPEG options in key:pair form.
+        reference : str, optional
+            Raw decoded reference of video_in to read the video stream from,
+            see Media.reference. The default is None.
+        audio : bool, optional
+            With a reference, also map the audio stream of video_in.
+            The default is True.
 
+        Returns
+        -------
+        ffmpeg.Stream
+            The output stream, see encode_video.
+
+        """
+        if reference is None or reference == video_in:
+            streams = [ffmpeg.input(video_in)]
         else:
-            vin = ffmpeg.input(video_in)
+            streams = [ffmpeg.input(reference).video]
+            if audio is True:
+                streams.append(ffmpeg.input(video_in).audio)
+
+        return ffmpeg.output(*streams, video_out, **options)
+
+    @staticmethod
+    def encode_group(video_in, outputs, debug=False, reference=None,
+                     audio=True):
+        """
+        Encode several outputs of one input with a single FFMPEG process.
+
+        The source is decoded once, and split N ways in the filter graph,
+        each branch feeding an output with its own codec options.
+
+        Parameters
+        ----------
+        video_in : str
+            Input video filename.
+        outputs : list
+            List of (video_out, options) tuples, options being the FFMPEG
+            options of that output in key:pair form.
+        debug : bool
+            When true, skips encoding and dump the I/O media paths instead.
+        reference : str, optional
+            Raw decoded reference of video_in to read the video stream from,
+            see Media.reference. The default is None.
+        audio : bool, optional
+            Map the audio stream of video_in to every output.
+            The default is True.
+
+        Returns
+        -------
+        dict
+            The telemetry of the whole group encode, see
+            telemetry.run_ffmpeg, None in debug.
+
+        """
+        if debug is True:
+            for video_out, options in outputs:
+                print(f"in = {video_in}, out = {video_out}, opt = {options}")
+            return None
+
+        source = ffmpeg.input(video_in)
+        video = source.video if reference is None or \
+            reference == video_in else ffmpeg.input(reference).video
+        branches = video.filter_multi_output("split", len(outputs))
+
+        return run_ffmpeg(ffmpeg.merge_outputs(*[
             ffmpeg.output(
-                vin,
+                branches.stream(i),
+                *([source.audio] if audio is True else []),
                 video_out,
                 **options,
-            ).overwrite_output().run()
+            )
+            for i, (video_out, options) in enumerate(outputs)
+        ]))
 
-    def encoding(self, video_in, video_out, debug=False, bar=None):
+    @staticmethod
+    def pass_options(options, npass, prefix):
         """
-        Encode video with the option sets configuration.
+        Add the two-pass encoding options of one of the passes.
+
+        Parameters
+        ----------
+        options : dict
+            FFMPEG options in key:pair form, with the "c:v" video codec.
+        npass : int
+            Pass number, 1 or 2.
+        prefix : str
+            Pass log file prefix, see PassLogCache.
+
+        Returns
+        -------
+        dict
+            The options with the pass settings. libx265 takes them through
+            x265-params, the other encoders through -pass and -passlogfile.
+
+        """
+        options = dict(options)
+        if options.get("c:v") == "libx265":
+            params = f"pass={npass}:stats={PassLogCache.stats_file(prefix)}"
+            if options.get("x265-params"):
+                params = f"{options['x265-params']}:{params}"
+            options["x265-params"] = params
+        else:
+            options["pass"] = npass
+            options["passlogfile"] = prefix
+        return options
+
+    def encode_two_pass(self, video_in, video_out, options, debug=False,
+                        reference=None, audio=True):
+        """
+        Encode a video in two passes, reusing cached first pass statistics.
+
+        The first pass runs only if no statistics were cached for the same
+        source and analysis options, see PassLogCache.analysis_options, so
+        every target bitrate of a (source, codec, preset) shares it.
 
         Parameters
         ----------
@@ -140,75 +420,1084 @@ class Encoder:
             Input video filename.
         video_out : str
             Output video filename.
-        debug: bool, optional
-            Skip encoding and print the full test filenames.
+        options : dict
+            FFMPEG options in key:pair form, with the "b:v" target bitrate.
+        debug : bool
+            When true, skips encoding and dump the I/O media paths instead.
+        reference : str, optional
+            Raw decoded reference of video_in to read the video stream from,
+            see Media.reference. The default is None.
+        audio : bool, optional
+            With a reference, also map the audio stream of video_in to the
+            second pass output. The default is True.
 
         Returns
         -------
-        full_test_filenames : list
-            Return a list of strings with full formatted test filenames with
-            appended parameters in the form <output_base_filename>__+
-            <param>__<value>__(...).<ext>.
-            Example, foobar_-_crf_23__preset_high__... .mp4
+        dict
+            The second pass telemetry, see telemetry.run_ffmpeg, with the
+            "first_pass" telemetry, None when the statistics were cached.
+            None in debug.
+
+        """
+        if debug is True:
+            print(f"in = {video_in}, out = {video_out}, opt = {options}, "
+                  "two-pass")
+            return None
+
+        first = []
+
+        def first_pass(prefix):
+            source = video_in if reference is None else reference
+            first_options = self.pass_options(options, 1, prefix)
+            # the output muxer decides the frame duplication, the first pass
+            # must see the frames the second pass encodes
+            first_options.setdefault("f", "null")
+            first_options.pop("movflags", None)
+            first_options["an"] = None
+            first.append(run_ffmpeg(ffmpeg.output(
+                ffmpeg.input(source).video,
+                os.devnull,
+                **first_options,
+            )))
+
+        prefix = self.pass_logs().get(video_in, options, first_pass)
+        telemetry = self.encode_video(
+            video_in, video_out, self.pass_options(options, 2, prefix),
+            reference=reference, audio=audio)
+        telemetry["first_pass"] = first[0] if first else None
+        return telemetry
+
+    def split_points(self, video_in, chunks, scene_cut=False,
+                     min_frames=None):
+        """
+        Choose the frames splitting a video into chunks of similar length.
+
+        Each split is the source keyframe, or scene cut, nearest to an even
+        split of the frames, within half a chunk length, so the chunk
+        boundaries are cheap to seek to, or hidden by a change of scene.
+        Without any candidate near enough, the even split frame is used.
+
+        Parameters
+        ----------
+        video_in : str
+            Input video filename.
+        chunks : int
+            Number of chunks.
+        scene_cut : bool, optional
+            Split on scene cuts instead of keyframes. The default is False.
+        min_frames : int, optional
+            Minimum chunk length in frames. The default is None, a quarter
+            of the even chunk length.
+
+        Returns
+        -------
+        list
+            Sorted list of the first frame index of every chunk, starting
+            with 0.
 
         """
-        full_test_filenames = {video_in: []}
+        total = self.__media.count_frames(video_in)
+        chunks = max(1, min(int(chunks), total))
+        if min_frames is None:
+            min_frames = max(1, total // (4 * chunks))
+
+        candidates = self.__media.scene_cuts(video_in) if scene_cut \
+            else self.__media.keyframes(video_in)
+
+        points = [0]
+        for i in range(1, chunks):
+            target = total * i // chunks
+            valid = [
+                frame for frame in candidates
+                if frame - points[-1] >= min_frames and
+                total - frame >= min_frames and
+                abs(frame - target) <= total // (2 * chunks)
+            ]
+            point = min(valid, key=lambda frame: abs(frame - target)) \
+                if valid else target
+            if point - points[-1] >= min_frames:
+                points.append(point)
+
+        return points
+
+    def encode_chunked(self, video_in, video_out, options, chunks,
+                       scene_cut=False, threads=None, debug=False,
+                       reference=None, audio=True):
+        """
+        Encode a video as chunks encoded in parallel, then concatenated.
+
+        The chunks are encoded with identical options by concurrent FFMPEG
+        processes, each seeking to its first frame, and joined without
+        re-encoding by the concat demuxer, the audio stream being encoded
+        once from the source. The frame count of the result is checked
+        against Media.count_frames.
 
-        # build list of dicts with permutations set via itertools.product
-        # and pass the iterated dict to expand to ffmpeg
-        enc = self.__options.encoding_sets()
-        keys, values = zip(*enc.items())
-        info = [dict(zip(keys, v)) for v in product(*values)]
+        Parameters
+        ----------
+        video_in : str
+            Input video filename.
+        video_out : str
+            Output video filename.
+        options : dict
+            FFMPEG options in key:pair form.
+        chunks : int
+            Number of chunks, and of concurrent encodes.
+        scene_cut : bool, optional
+            Split on scene cuts instead of keyframes, see split_points().
+            The default is False.
+        threads : int, optional
+            FFMPEG -threads for each chunk encode. The default is None.
+        debug : bool
+            When true, skips encoding and dump the I/O media paths instead.
+        reference : str, optional
+            Raw decoded reference of video_in to read the video stream from,
+            see Media.reference. The default is None.
+        audio : bool, optional
+            Map the audio stream of video_in to the output.
+            The default is True.
+
+        Raises
+        ------
+        RuntimeError
+            If the concatenated output doesn't have the source frame count.
 
-        for i in info:
-            fname_suffix = "__".join(
-                map(lambda x, y: x + "_" + str(y),
-                    i.keys(), i.values()))
+        Returns
+        -------
+        dict
+            The telemetry of the chunk and concat encodes, see
+            telemetry.combine, with the "chunks" first frames.
+            None in debug.
 
-            fname, ext = video_out.split(".")
-            fname = f"{fname}_-_{fname_suffix}.{ext}"
-            full_test_filenames[video_in].append(fname)
+        """
+        points = self.split_points(video_in, chunks, scene_cut=scene_cut)
+        total = self.__media.count_frames(video_in)
+
+        if debug is True:
+            print(f"in = {video_in}, out = {video_out}, opt = {options}, "
+                  f"chunks = {points}")
+            return None
+
+        start_time = time.perf_counter()
+
+        frame_rate = self.__media.record(video_in).frame_rate
+        source = video_in if reference is None else reference
+        ext = os.path.splitext(video_out)[1]
+        chunk_dir = f"{video_out}.chunks"
+        os.makedirs(chunk_dir, exist_ok=True)
+
+        chunk_options = {
+            k: v for k, v in options.items()
+            if k not in _CONCAT_OPTIONS or k in ("f", "format", "loglevel")
+        }
+        chunk_options["an"] = None
+        if threads is not None:
+            chunk_options["threads"] = threads
+
+        def encode_chunk(i):
+            start, end = points[i], (points + [total])[i + 1]
+            chunk = os.path.join(chunk_dir, f"chunk_{i:04d}{ext}")
+            return chunk, run_ffmpeg(ffmpeg.output(
+                # seek half a frame early, the accurate seek then starts on
+                # the first frame of the chunk
+                ffmpeg.input(source, ss=float((start - 0.5) / frame_rate))
+                if start > 0 else ffmpeg.input(source),
+                chunk,
+                **{**chunk_options, "frames:v": end - start},
+            ))
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(points)) as executor:
+                chunk_files, telemetries = zip(*executor.map(
+                    encode_chunk, range(len(points))))
+
+            concat_list = os.path.join(chunk_dir, "concat.txt")
+            with open(concat_list, "w", encoding="utf8") as listfile:
+                for chunk in chunk_files:
+                    escaped = os.path.abspath(chunk).replace("'", "'\\''")
+                    listfile.write(f"file '{escaped}'\n")
+
+            streams = [
+                ffmpeg.input(concat_list, f="concat", safe=0).video]
+            if audio is True:
+                streams.append(ffmpeg.input(video_in).audio)
+
+            concat = run_ffmpeg(ffmpeg.output(
+                *streams,
+                video_out,
+                **{k: v for k, v in options.items() if k in _CONCAT_OPTIONS},
+                **{"c:v": "copy"},
+            ))
+        finally:
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+
+        frames = self.__media.count_frames(video_out)
+        if frames != total:
+            raise RuntimeError(
+                f"{video_out} has {frames} frames, {video_in} has {total}.")
+
+        telemetry = combine(
+            list(telemetries) + [{**concat, "frames": 0}],
+            wall_time=time.perf_counter() - start_time)
+        telemetry["chunks"] = points
+        return telemetry
+
+    def parameter_sets(self, codec=None):
+        """
+        Expand the encoding sets into the list of parameter combinations.
+
+        The product is expanded per video codec, the encoding set values
+        (and common options) that codec would reject or ignore are dropped,
+        and the combinations collapsing into the same effective command line
+        are only kept once.
+
+        Parameters
+        ----------
+        codec : str, optional
+            Video codec to expand the sets for. The default is None, using
+            the "c:v" encoding set if any, or the common options codec.
+
+        Returns
+        -------
+        list
+            List of dictionaries, one for each effective combination of the
+            encoding sets values, built via itertools.product. The "c:v" key
+            is included when the codec isn't the common options one.
+
+        """
+        enc = dict(self.__options.encoding_sets())
+        common = self.__options.common_options()
+        codec_set = enc.pop("c:v", None)
+
+        if codec is not None:
+            codecs = [codec]
+        else:
+            codecs = codec_set if codec_set else [common["c:v"]]
+
+        keys, values = zip(*enc.items()) if enc else ((), ())
+        parameter_sets, seen = [], set()
+
+        for vcodec in codecs:
+            for combination in product(*values):
+                parameters = dict(zip(keys, combination))
+                if codec_set or vcodec != common["c:v"]:
+                    parameters = {"c:v": vcodec, **parameters}
+
+                effective = self.capabilities().effective_options(
+                    {**common, **parameters, "c:v": vcodec})
+                command_line = tuple(
+                    sorted((k, str(v)) for k, v in effective.items()))
+                if command_line in seen:
+                    continue
+
+                seen.add(command_line)
+                parameter_sets.append({
+                    k: v for k, v in parameters.items() if k in effective
+                })
+
+        return parameter_sets
+
+    def effective_options(self, parameters):
+        """
+        Return the full FFMPEG options of a parameter set.
+
+        Parameters
+        ----------
+        parameters : dict
+            Encoding parameters, as built by parameter_sets().
+
+        Returns
+        -------
+        dict
+            The common options merged with the parameters, keeping only the
+            options the video codec honours.
+
+        """
+        return self.capabilities().effective_options(
+            {**self.__options.common_options(), **parameters})
+
+    @staticmethod
+    def output_name(basename, parameters):
+        """
+        Build the fully qualified output filename for a parameter set.
+
+        Parameters
+        ----------
+        basename : str
+            Output base filename.
+        parameters : dict
+            Encoding parameters appended to the filename.
+
+        Returns
+        -------
+        str
+            Filename in the form <basename>_-_<param>_<value>__(...).<ext>.
+
+        """
+        fname_suffix = "__".join(
+            map(lambda x, y: x + "_" + str(y),
+                parameters.keys(), parameters.values()))
 
-            options = {
-                **self.__options.common_options(),
-                **i
+        fname, ext = os.path.splitext(basename)
+        return f"{fname}_-_{fname_suffix}{ext}"
+
+    def jobs(self, video_in=None, video_out=None):
+        """
+        Build the encode job list, one job per input and parameter set.
+
+        Parameters
+        ----------
+        video_in : str, optional
+            Single input video filename. The default is None, building the
+            jobs for every media input file.
+        video_out : str, optional
+            Output base filename of video_in. The default is None.
+
+        Returns
+        -------
+        list
+            List of job dictionaries with the keys "input", "output",
+            "parameters" (the encoding set values) and "options" (the full
+            FFMPEG options).
+
+        """
+        if video_in is not None:
+            io_files = [(video_in, video_out)]
+        else:
+            io_files = zip(
+                self.__media.input_files() or [],
+                self.__media.output_files() or [])
+
+        parameter_sets = self.parameter_sets()
+        return [
+            {
+                "input": vin,
+                "output": self.output_name(vout, parameters),
+                "parameters": parameters,
+                "options": self.effective_options(parameters),
+            }
+            for vin, vout in io_files for parameters in parameter_sets
+        ]
+
+    def target_size_jobs(self, target_sizes_mib, video_in=None,
+                         video_out=None):
+        """
+        Build the two-pass encode jobs of a target file size sweep.
+
+        The video bitrate of each size comes from Media.bitrates_for_size,
+        the CRF/QP encoding sets don't apply to bitrate encodes and are left
+        out of the parameter sets.
+
+        Parameters
+        ----------
+        target_sizes_mib : list
+            Target file sizes in MiB.
+        video_in : str, optional
+            Single input video filename. The default is None, building the
+            jobs for every media input file.
+        video_out : str, optional
+            Output base filename of video_in. The default is None.
+
+        Raises
+        ------
+        ValueError
+            If a target size leaves no bitrate for the video stream.
+
+        Returns
+        -------
+        list
+            List of job dictionaries, see jobs(), with "passes" set to 2 and
+            the "size_mib" parameter naming the outputs.
+
+        """
+        if video_in is not None:
+            io_files = [(video_in, video_out)]
+        else:
+            io_files = zip(
+                self.__media.input_files() or [],
+                self.__media.output_files() or [])
+
+        parameter_sets = []
+        for parameters in self.parameter_sets():
+            parameters = {
+                k: v for k, v in parameters.items() if k not in ("crf", "qp")
             }
+            if parameters not in parameter_sets:
+                parameter_sets.append(parameters)
+
+        job_list = []
+        for vin, vout in io_files:
+            has_audio = self.__media.record(vin).has_audio
+            for size, parameters in product(target_sizes_mib, parameter_sets):
+                bitrates = self.__media.bitrates_for_size(vin, size)
+                if bitrates["video_bitrate"] <= 0:
+                    raise ValueError(
+                        f"{size} MiB leaves no video bitrate for {vin}.")
+
+                options = {
+                    k: v for k, v in self.effective_options(parameters).items()
+                    if k not in ("crf", "qp")
+                }
+                options["b:v"] = f"{bitrates['video_bitrate']}k"
+                if has_audio and bitrates["audio_bitrate"] > 0:
+                    options["b:a"] = f"{bitrates['audio_bitrate']}k"
+
+                parameters = {**parameters, "size_mib": size}
+                job_list.append({
+                    "input": vin,
+                    "output": self.output_name(vout, parameters),
+                    "parameters": parameters,
+                    "options": options,
+                    "passes": 2,
+                })
+
+        return job_list
+
+    def proxy_jobs(self, segments=6, seconds=2.0, scene_cut=True):
+        """
+        Build the encode job list of the proxy clips of every input.
+
+        The proxies are cut on the first call, see ProxyClips.get. Their
+        outputs go to a proxies subdirectory of each output directory, with
+        the names of the full-length outputs, so both rankings can be
+        compared, see proxy.rank_correlation.
+
+        Parameters
+        ----------
+        segments : int, optional
+            Number of segments of each proxy. The default is 6.
+        seconds : float, optional
+            Length of each segment in seconds. The default is 2.0.
+        scene_cut : bool, optional
+            Start the segments on scene cuts instead of spreading them over
+            the timeline. The default is True.
+
+        Returns
+        -------
+        list
+            List of job dictionaries, see jobs(), the proxy clips as input.
+
+        """
+        job_list = []
+        for vin, vout in zip(self.__media.input_files() or [],
+                             self.__media.output_files() or []):
+            proxy = self.proxies().get(vin, segments, seconds, scene_cut)
+            proxy_out = os.path.join(
+                os.path.dirname(vout), "proxies", os.path.basename(vout))
+            job_list += self.jobs(proxy, proxy_out)
+        return job_list
+
+    @staticmethod
+    def group_jobs(job_list, group_size=1):
+        """
+        Group jobs sharing an input, to encode them from a single decode.
+
+        Parameters
+        ----------
+        job_list : list
+            Encode jobs, as built by jobs().
+        group_size : int, optional
+            Maximum number of outputs per group. Each output holds its own
+            encoder and frame queue, so larger groups use more memory.
+            The default is 1, one job per group.
 
-            if debug is True:
-                print(f"input {video_in}, output = {fname}")
+        Returns
+        -------
+        list
+            List of job lists, every job of a group having the same input.
+
+        """
+        groups, by_input = [], {}
+        group_size = max(1, int(group_size))
+
+        for job in job_list:
+            group = by_input.get(job["input"])
+            if group is None or len(group) >= group_size:
+                group = by_input[job["input"]] = []
+                groups.append(group)
+            group.append(job)
+
+        return groups
+
+    def run_group(self, group, debug=False, threads=None, resume=True,
+                  verify=False, chunks=1, scene_cut=False):
+        """
+        Run a group of encode jobs of the same input as one FFMPEG process.
+
+        Parameters
+        ----------
+        group : list
+            Encode jobs sharing the same input, see group_jobs().
+        debug : bool, optional
+            Skip encoding and print the job I/O files. The default is False.
+        threads : int, optional
+            Number of FFMPEG threads of each process, split between the
+            encoders of a group encoded by one process. The default is
+            None, letting FFMPEG decide.
+        resume : bool, optional
+            Skip the jobs the sweep manifest records as complete, with the
+            same input and options. The default is True.
+        verify : bool, optional
+            With resume, also decode check the recorded outputs before
+            skipping the jobs. The default is False.
+        chunks : int, optional
+            Split each encode into chunks encoded in parallel, see
+            encode_chunked(). The default is 1, no chunking.
+        scene_cut : bool, optional
+            Split the chunks on scene cuts instead of keyframes.
+            The default is False.
+
+        Returns
+        -------
+        list
+            The job dictionaries, in group order, with the added keys
+            "status", one of "done", "skipped", "failed" or "debug",
+            "error" with the failure message, and for the done jobs the
+            "telemetry" also saved next to the output, see save_telemetry.
+
+        """
+        results = [{**job, "status": "done", "error": None} for job in group]
+
+        if debug is True:
+            for result in results:
+                print(f"input {result['input']}, output = {result['output']}")
+                result["status"] = "debug"
+            return results
+
+        pending = []
+        for result in results:
+            if resume is True and \
+                    self.manifest().is_complete(result, verify=verify):
+                result["status"] = "skipped"
+            else:
+                pending.append(result)
+
+        if not pending:
+            return results
+
+        try:
+            video_in = pending[0]["input"]
+            outputs = []
+            for result in pending:
+                options = dict(result["options"])
+                if threads is not None:
+                    options["threads"] = threads
+
+                outdir = os.path.dirname(result["output"])
+                if outdir:
+                    os.makedirs(outdir, exist_ok=True)
+                outputs.append((result["output"], options))
+
+            reference = self.__media.reference(video_in)
+            audio = self.__media.record(video_in).has_audio
+            group_size = 1
+
+            if pending[0].get("passes", 1) == 2:
+                telemetries = [
+                    self.encode_two_pass(
+                        video_in, video_out, options, reference=reference,
+                        audio=audio)
+                    for video_out, options in outputs
+                ]
+            elif chunks > 1:
+                telemetries = []
+                for video_out, options in outputs:
+                    options.pop("threads", None)
+                    telemetries.append(self.encode_chunked(
+                        video_in, video_out, options, chunks,
+                        scene_cut=scene_cut, threads=threads,
+                        reference=reference, audio=audio))
+            elif len(outputs) == 1:
+                telemetries = [self.encode_video(
+                    video_in, *outputs[0], reference=reference, audio=audio)]
             else:
-                self.encode_video(video_in, fname, options)
+                # a single process, its cost and threads are shared by the
+                # whole group
+                group_size = len(outputs)
+                if threads is not None:
+                    for _, options in outputs:
+                        options["threads"] = max(1, threads // group_size)
+                telemetries = [self.encode_group(
+                    video_in, outputs, reference=reference, audio=audio)
+                ] * group_size
+
+            # only the plain encodes measure the cost of a single job
+            calibrate = group_size == 1 and chunks == 1 and \
+                pending[0].get("passes", 1) == 1
+            for result, telemetry in zip(pending, telemetries):
+                self.__complete(
+                    result, telemetry, group_size, threads, calibrate)
+        except Exception as exc:  # pylint: disable=broad-except
+            for result in pending:
+                result["status"] = "failed"
+                result["error"] = self.__error_message(exc)
+
+        return results
+
+    @staticmethod
+    def __error_message(exc):
+        """Return the FFMPEG stderr of a failed encode, or the exception."""
+        stderr = getattr(exc, "stderr", None)
+        return stderr.decode("utf8", "replace") if stderr else \
+            str(exc) or type(exc).__name__
+
+    def __complete(self, result, telemetry, group_size, threads,
+                   calibrate=True):
+        """Save the telemetry of a done job and record it as complete."""
+        duration = self.__media.record(result["input"]).duration
+        result["telemetry"] = {
+            **telemetry,
+            **output_stats(result["output"], duration),
+            "group_size": group_size,
+            "threads": threads,
+            "input": result["input"],
+            "parameters": result["parameters"],
+        }
+        save_telemetry(result["output"], result["telemetry"])
+        self.manifest().record(result)
+        if calibrate is True:
+            self.cost_model().observe(
+                self.job_features(result), result["telemetry"])
+
+    def __add_test_filename(self, result):
+        """Add a written job output to the full test filenames of its input."""
+        if result["status"] not in ("done", "skipped"):
+            return
+        filenames = self.__full_test_filenames.setdefault(
+            result["input"], [])
+        if result["output"] not in filenames:
+            filenames.append(result["output"])
+
+    def run_job(self, job, debug=False, threads=None, resume=True,
+                verify=False, chunks=1, scene_cut=False):
+        """
+        Run a single encode job.
+
+        Parameters
+        ----------
+        job : dict
+            Encode job, as built by jobs().
+        debug : bool, optional
+            Skip encoding and print the job I/O files. The default is False.
+        threads : int, optional
+            Number of FFMPEG encoder threads. The default is None, letting
+            FFMPEG decide.
+        resume : bool, optional
+            Skip the job if the sweep manifest records it as complete, with
+            the same input and options. The default is True.
+        verify : bool, optional
+            With resume, also decode check the recorded output before
+            skipping the job. The default is False.
+        chunks : int, optional
+            Split the encode into chunks encoded in parallel, see
+            encode_chunked(). The default is 1, no chunking.
+        scene_cut : bool, optional
+            Split the chunks on scene cuts instead of keyframes.
+            The default is False.
+
+        Returns
+        -------
+        dict
+            The job dictionary with the added keys "status", one of "done",
+            "skipped", "failed" or "debug", and "error" with the failure
+            message.
+
+        """
+        return self.run_group(
+            [job], debug=debug, threads=threads, resume=resume,
+            verify=verify, chunks=chunks, scene_cut=scene_cut)[0]
+
+    def run_jobs(self, job_list, jobs=1, threads_per_job=None,
+                 debug=False, progress=False, resume=True, verify=False,
+                 group_size=1, chunks=1, scene_cut=False,
+                 longest_first=True, dry_run=False):
+        """
+        Run encode jobs concurrently with bounded parallelism.
+
+        Each job is an FFMPEG process, so a thread pool is enough to keep
+        up to jobs encoders running at once without blocking on any of them.
+        The jobs are dispatched longest-first from their predicted cost, so
+        the slow encodes don't end the sweep on a few busy cores.
+
+        Parameters
+        ----------
+        job_list : list
+            Encode jobs, as built by jobs().
+        jobs : int, optional
+            Maximum number of concurrent encodes. The default is 1.
+        threads_per_job : int, optional
+            FFMPEG -threads for each encode process, split between the
+            encoders of a group, see group_size. The default is None,
+            splitting the CPU cores between the concurrent processes when
+            jobs, chunks or group_size > 1.
+        debug : bool, optional
+            Skip encoding and print the job I/O files. The default is False.
+        progress : bool, optional
+            Show a progress bar, advanced as each job completes.
+            The default is False.
+        resume : bool, optional
+            Skip the jobs the sweep manifest records as complete.
+            The default is True.
+        verify : bool, optional
+            Decode check recorded outputs before skipping their jobs.
+            The default is False.
+        group_size : int, optional
+            Number of jobs of the same input encoded by a single FFMPEG
+            process from one decode of the source, see group_jobs().
+            The default is 1.
+        chunks : int, optional
+            Split each encode into chunks encoded in parallel, for long
+            sources a single encoder can't spread over every core, see
+            encode_chunked(). The default is 1, no chunking.
+        scene_cut : bool, optional
+            Split the chunks on scene cuts instead of keyframes.
+            The default is False.
+        longest_first : bool, optional
+            Dispatch the job groups by decreasing predicted wall time, see
+            predict(). The default is True, False keeping the job order.
+        dry_run : bool, optional
+            Skip encoding and print the predicted sweep wall time, CPU time
+            and output disk usage instead, see plan(). The default is False.
+
+        Returns
+        -------
+        list
+            One result dictionary per job, see run_job, in job_list order.
+            In dry run, the jobs with the "status" "planned" and their
+            "prediction", see predict().
+
+        """
+        jobs = max(1, int(jobs))
+        chunks = max(1, int(chunks))
+        if threads_per_job is None and \
+                (jobs * chunks > 1 or int(group_size) > 1):
+            threads_per_job = max(1, (os.cpu_count() or 1) // (jobs * chunks))
+
+        if dry_run is True:
+            return self.plan(job_list, jobs=jobs, resume=resume)
+
+        groups = self.group_jobs(job_list, group_size)
+        if longest_first is True and jobs > 1 and debug is not True:
+            costs = {
+                id(job): self.predict(job)["wall_time"] for job in job_list
+            }
+            groups.sort(
+                key=lambda group: sum(costs[id(job)] for job in group),
+                reverse=True)
+
+        # job position in job_list, to return the results in order
+        order = {id(job): i for i, job in enumerate(job_list)}
+        results = [None] * len(job_list)
+
+        with ExitStack() as stack:
+            bar = stack.enter_context(alive_bar(len(job_list))) \
+                if progress is True else None
+            executor = stack.enter_context(
+                ThreadPoolExecutor(max_workers=jobs))
+
+            # dict order is submission order, the executor queue is FIFO
+            futures = {
+                executor.submit(self.run_group, group, debug,
+                                threads_per_job, resume, verify, chunks,
+                                scene_cut): group
+                for group in groups
+            }
+            for future in as_completed(futures):
+                for job, result in zip(futures[future], future.result()):
+                    results[order[id(job)]] = result
+                    if bar is not None:
+                        bar()
+
+        for result in results:
+            self.__add_test_filename(result)
+
+        return results
+
+    def plan(self, job_list, jobs=1, resume=True):
+        """
+        Predict the cost of a sweep without encoding, and print it.
+
+        Parameters
+        ----------
+        job_list : list
+            Encode jobs, as built by jobs().
+        jobs : int, optional
+            Number of concurrent encodes. The default is 1.
+        resume : bool, optional
+            Leave out the jobs the sweep manifest records as complete.
+            The default is True.
+
+        Returns
+        -------
+        list
+            One result dictionary per job, in job_list order, with the
+            "status" "planned", or "skipped" if already complete, and the
+            "prediction" of the planned jobs, see predict().
+
+        """
+        results = []
+        for job in job_list:
+            result = {**job, "status": "planned", "error": None}
+            if resume is True and self.manifest().is_complete(result):
+                result["status"] = "skipped"
+            else:
+                result["prediction"] = self.predict(job)
+            results.append(result)
+
+        planned = [r["prediction"] for r in results if "prediction" in r]
+        wall_time = CostModel.makespan(
+            [p["wall_time"] for p in planned], jobs)
+        cpu_time = sum(p["cpu_time"] for p in planned)
+        size = sum(p["size"] for p in planned)
+        print(f"{len(planned)} jobs planned, "
+              f"{len(results) - len(planned)} already done, "
+              f"{jobs} at a time: predicted wall time {wall_time:.1f}s, "
+              f"CPU time {cpu_time:.1f}s, "
+              f"disk usage {size / 2 ** 20:.1f} MiB")
+
+        return results
+
+    def encoding(self, video_in, video_out, debug=False, bar=None):
+        """
+        Encode video with the option sets configuration.
+
+        Parameters
+        ----------
+        video_in : str
+            Input video filename.
+        video_out : str
+            Output video filename.
+        debug: bool, optional
+            Skip encoding and print the full test filenames.
+
+        Returns
+        -------
+        list
+            One result dictionary per parameter set, see run_job. The full
+            test filenames, in the form <output_base_filename>_-_<param>_
+            <value>__(...).<ext>, are added to full_test_filenames().
+            Example, foobar_-_crf_23__preset_high__... .mp4
+
+        """
+        results = []
+        for job in self.jobs(video_in, video_out):
+            results.append(self.run_job(job, debug=debug))
+            self.__full_test_filenames.setdefault(video_in, [])
+            if job["output"] not in self.__full_test_filenames[video_in]:
+                self.__full_test_filenames[video_in].append(job["output"])
 
             if bar is not None:
                 bar()
 
-        self.__full_test_filenames = cp.deepcopy(full_test_filenames)
+        return results
 
-    def encode_videos(self, debug=False, progress=False):
+    def encode_videos(self, debug=False, progress=False, jobs=1,
+                      threads_per_job=None, resume=True, verify=False,
+                      group_size=1, chunks=1, scene_cut=False,
+                      longest_first=True, dry_run=False):
         """
         Encode all the input list videos with the options set.
 
+        The full (input x parameter set) job list is scheduled at once, so
+        up to jobs encodes run concurrently across every input.
+
+        Parameters
+        ----------
+        debug : bool, optional
+            Skip encoding and print the job I/O files. The default is False.
+        progress : bool, optional
+            Show a progress bar over every job. The default is False.
+        jobs : int, optional
+            Maximum number of concurrent encodes. The default is 1.
+        threads_per_job : int, optional
+            FFMPEG -threads for each encode. The default is None, splitting
+            the CPU cores between the concurrent jobs when jobs > 1.
+        resume : bool, optional
+            Skip the jobs the sweep manifest records as complete, so an
+            interrupted sweep, or one with new encoding set values, only
+            runs the missing combinations. The default is True.
+        verify : bool, optional
+            Decode check recorded outputs before skipping their jobs.
+            The default is False.
+        group_size : int, optional
+            Number of parameter sets of the same input encoded by a single
+            FFMPEG process, decoding the source once for the whole group.
+            The default is 1.
+        chunks : int, optional
+            Split each encode into chunks encoded in parallel, then joined
+            losslessly, see encode_chunked(). The default is 1.
+        scene_cut : bool, optional
+            Split the chunks on scene cuts instead of keyframes.
+            The default is False.
+        longest_first : bool, optional
+            Dispatch the slowest predicted encodes first, see run_jobs().
+            The default is True.
+        dry_run : bool, optional
+            Only print the predicted sweep wall time and disk usage, see
+            plan(). The default is False.
+
         Returns
         -------
-        None.
+        list
+            One result dictionary per job, see run_job.
 
         """
-        if progress is False:
-            for video_in, video_out in zip(
-                self.__media.input_files(), self.__media.output_files()
-            ):
-                self.encoding(video_in, video_out, debug=debug)
+        return self.run_jobs(
+            self.jobs(), jobs=jobs, threads_per_job=threads_per_job,
+            debug=debug, progress=progress, resume=resume, verify=verify,
+            group_size=group_size, chunks=chunks, scene_cut=scene_cut,
+            longest_first=longest_first, dry_run=dry_run)
 
-        else:
-            # len values for v in dict values
-            tmp = self.qualify_output_files()
-            numfiles = sum([len(v) for v in tmp.values()])
+    async def encode_videos_async(self, jobs=1, threads_per_job=None,
+                                  resume=True, verify=False, timeout=None,
+                                  progress=None, on_result=None,
+                                  job_list=None):
+        """
+        Encode all the input list videos without blocking the event loop.
+
+        The encodes are asyncio subprocesses, so in JupyterLab the sweep can
+        run as a background task, i.e, asyncio.ensure_future(...), while
+        full_test_filenames() and the sweep manifest fill up with the done
+        jobs. Cancelling the task kills the running encodes. The jobs start
+        longest-first from their predicted cost, see run_jobs().
+
+        Parameters
+        ----------
+        jobs : int, optional
+            Maximum number of concurrent encodes. The default is 1.
+        threads_per_job : int, optional
+            FFMPEG -threads for each encode. The default is None, splitting
+            the CPU cores between the concurrent jobs when jobs > 1.
+        resume : bool, optional
+            Skip the jobs the sweep manifest records as complete.
+            The default is True.
+        verify : bool, optional
+            Decode check recorded outputs before skipping their jobs.
+            The default is False.
+        timeout : float, optional
+            Maximum run time of each encode in seconds, a job running longer
+            is killed and failed. The default is None, no limit.
+        progress : callable, optional
+            Called as progress(job, report) with every FFMPEG -progress
+            report of a running job, see telemetry.run_ffmpeg_async.
+            The default is None.
+        on_result : callable, optional
+            Called with each job result as soon as the job ends.
+            The default is None.
+        job_list : list, optional
+            Single pass encode jobs to run. The default is None, jobs().
+
+        Returns
+        -------
+        list
+            One result dictionary per job, see run_job, in job order.
+
+        """
+        job_list = self.jobs() if job_list is None else job_list
+        jobs = max(1, int(jobs))
+        if threads_per_job is None and jobs > 1:
+            threads_per_job = max(1, (os.cpu_count() or 1) // jobs)
+        semaphore = asyncio.Semaphore(jobs)
+
+        # the semaphore wakes its waiters in order, longest-first here
+        dispatch = list(job_list)
+        if jobs > 1:
+            costs = await run_in_thread(
+                lambda: {id(job): self.predict(job)["wall_time"]
+                         for job in job_list})
+            dispatch.sort(key=lambda job: costs[id(job)], reverse=True)
+
+        async def run(job):
+            result = {**job, "status": "done", "error": None}
+            async with semaphore:
+                if resume is True and await run_in_thread(
+                        self.manifest().is_complete, result, verify):
+                    result["status"] = "skipped"
+                else:
+                    try:
+                        await self.__encode_async(
+                            result, threads_per_job, timeout, progress)
+                    except asyncio.TimeoutError:
+                        result["status"] = "failed"
+                        result["error"] = f"Timed out after {timeout}s."
+                    except Exception as exc:  # pylint: disable=broad-except
+                        result["status"] = "failed"
+                        result["error"] = self.__error_message(exc)
+
+            self.__add_test_filename(result)
+            if on_result is not None:
+                on_result(result)
+            return result
+
+        tasks = {id(job): asyncio.ensure_future(run(job)) for job in dispatch}
+        return list(await asyncio.gather(
+            *[tasks[id(job)] for job in job_list]))
+
+    async def __encode_async(self, result, threads, timeout, progress):
+        """Run the encode of a job as an asyncio FFMPEG subprocess."""
+        options = dict(result["options"])
+        if threads is not None:
+            options["threads"] = threads
+
+        outdir = os.path.dirname(result["output"])
+        if outdir:
+            os.makedirs(outdir, exist_ok=True)
+
+        # the reference decode, and probing, can take a while on a miss
+        reference = await run_in_thread(
+            self.__media.reference, result["input"])
+        audio = self.__media.record(result["input"]).has_audio
+
+        args = ffmpeg.compile(
+            self.encode_stream(
+                result["input"], result["output"], options,
+                reference=reference, audio=audio),
+            overwrite_output=True)
+        telemetry = await run_ffmpeg_async(
+            args, timeout=timeout,
+            progress=None if progress is None else
+            lambda report: progress(result, report))
+
+        await run_in_thread(self.__complete, result, telemetry, 1, threads)
+
+    def encode_target_sizes(self, target_sizes_mib, debug=False,
+                            progress=False, jobs=1, threads_per_job=None,
+                            resume=True, verify=False):
+        """
+        Two-pass encode all the input list videos to target file sizes.
 
-            with alive_bar(numfiles) as bar:
-                for video_in, video_out in zip(
-                    self.__media.input_files(), self.__media.output_files()
-                ):
-                    self.encoding(video_in, video_out, debug=debug, bar=bar)
+        The first pass runs once per source and analysis options, i.e,
+        codec and preset, its statistics being shared by every target size.
+
+        Parameters
+        ----------
+        target_sizes_mib : list
+            Target file sizes in MiB.
+        debug : bool, optional
+            Skip encoding and print the job I/O files. The default is False.
+        progress : bool, optional
+            Show a progress bar over every job. The default is False.
+        jobs : int, optional
+            Maximum number of concurrent encodes. The default is 1.
+        threads_per_job : int, optional
+            FFMPEG -threads for each encode. The default is None, splitting
+            the CPU cores between the concurrent jobs when jobs > 1.
+        resume : bool, optional
+            Skip the jobs the sweep manifest records as complete.
+            The default is True.
+        verify : bool, optional
+            Decode check recorded outputs before skipping their jobs.
+            The default is False.
+
+        Returns
+        -------
+        list
+            One result dictionary per job, see run_job.
+
+        """
+        return self.run_jobs(
+            self.target_size_jobs(target_sizes_mib), jobs=jobs,
+            threads_per_job=threads_per_job, debug=debug, progress=progress,
+            resume=resume, verify=verify)
 
     def qualify_output_files(self):
         """
@@ -237,23 +1526,150 @@ class Encoder:
 
         return None
 
-    def fqn(self, basename):
-        paramlist = []
+    # CRF scale of each video codec, from the best to the worst quality
+    __crf_ranges = {
+        "libx264": (0, 51), "libx265": (0, 51), "libvpx": (4, 63),
+        "libvpx-vp9": (0, 63), "libsvtav1": (1, 63), "libaom-av1": (0, 63),
+    }
 
-        # build list of dicts with permutations set via itertools.product
-        enc = self.__options.encoding_sets()
-        keys, values = zip(*enc.items())
-        info = [dict(zip(keys, v)) for v in product(*values)]
+    def crf_search(self, video_in, video_out, parameters, vqt, targets,
+                   crf_range=None, tolerance=1, max_encodes=8,
+                   vmaf_options=None, threads=None):
+        """
+        Search the highest CRF, the cheapest encode, meeting quality targets.
 
-        paramlist = []
+        Instead of a full CRF grid, the CRF bracket between the best passing
+        and the worst failing encode is narrowed by interpolating the target
+        margin, falling back to bisection, until it is within tolerance.
+        Encodes already recorded in the sweep manifest, and their metrics
+        JSON files, are reused instead of being computed again.
 
-        for i in info:
-            fname_suffix = "__".join(
-                map(lambda x, y: x + "_" + str(y),
-                    i.keys(), i.values()))
+        Parameters
+        ----------
+        video_in : str
+            Input video filename.
+        video_out : str
+            Output base filename.
+        parameters : dict
+            Encoding parameters, i.e, codec and preset, the "crf" key is set
+            by the search.
+        vqt : VideoQualityTests
+            Video quality tests instance running the metrics.
+        targets : list
+            Quality targets, see VideoQualityTests.target_margin, i.e,
+            [{"metric": "vmaf", "pooling": "mean", "threshold": 93}].
+        crf_range : tuple, optional
+            Lowest and highest CRF to search. The default is None, the full
+            CRF scale of the video codec.
+        tolerance : int, optional
+            Stop once the passing/failing CRF bracket is this narrow.
+            The default is 1, finding the exact highest passing CRF.
+        max_encodes : int, optional
+            Maximum number of new CRF points evaluated. The default is 8.
+        vmaf_options : dict, optional
+            Dictionary with key "model_path" to the VMAF model path.
+            The default is None.
+        threads : int, optional
+            Number of FFMPEG encoder threads. The default is None.
+
+        Returns
+        -------
+        dict
+            Dictionary with the found "crf" and its "output" file (None if
+            even the lowest CRF fails), the evaluated "points" as
+            {crf: target margin}, and the number of new "encodes".
+
+        """
+        codec = parameters.get(
+            "c:v", self.__options.common_options()["c:v"])
+        low, high = crf_range if crf_range is not None else \
+            self.__crf_ranges.get(codec, (0, 51))
+        metrics = sorted({target["metric"] for target in targets})
+
+        points, outputs, encodes = {}, {}, 0
+
+        def crf_job(crf):
+            job_parameters = {**parameters, "crf": crf}
+            return {
+                "input": video_in,
+                "output": self.output_name(video_out, job_parameters),
+                "parameters": job_parameters,
+                "options": self.effective_options(job_parameters),
+            }
+
+        def evaluate(job):
+            crf = job["parameters"]["crf"]
+            metrics_data = vqt.metrics_for(
+                video_in, job["output"], metrics, vmaf_options=vmaf_options)
+            points[crf] = vqt.target_margin(metrics_data, targets)
+            outputs[crf] = job["output"]
+
+        # reuse the points of earlier searches and sweeps
+        for crf in range(low, high + 1):
+            job = crf_job(crf)
+            if self.manifest().is_complete(job) and \
+                    os.path.isfile(vqt.metrics_filename(job["output"])):
+                evaluate(job)
+
+        failing = min(
+            [crf for crf, margin in points.items() if margin < 0],
+            default=high + 1)
+        passing = max(
+            [crf for crf, margin in points.items()
+             if margin >= 0 and crf < failing],
+            default=low - 1)  # virtual bracket edges out of the CRF range
+
+        evaluated = 0
+        while failing - passing > tolerance and evaluated < max_encodes:
+            crf = (passing + failing) // 2
+            if passing in points and failing in points and \
+                    points[passing] > points[failing]:
+                # linear interpolation of the margin zero crossing
+                fraction = points[passing] / \
+                    (points[passing] - points[failing])
+                crf = int(round(passing + fraction * (failing - passing)))
+            crf = min(max(crf, passing + 1), failing - 1)
 
-            fname, ext = basename.split(".")
-            fname = f"{fname}_-_{fname_suffix}.{ext}"
-            paramlist.append(fname)
+            job = crf_job(crf)
+            result = self.run_job(job, threads=threads)
+            if result["status"] == "failed":
+                raise RuntimeError(result["error"])
+            encodes += result["status"] == "done"
+            evaluated += 1
 
-        return paramlist
+            evaluate(job)
+            if points[crf] >= 0:
+                passing = crf
+            else:
+                failing = crf
+
+        best = passing if passing >= low and passing in points else None
+        return {
+            "crf": best,
+            "output": outputs.get(best),
+            "points": points,
+            "encodes": encodes,
+        }
+
+    def fqn(self, basename, codec=None):
+        """
+        Build the fully qualified output filenames of a base filename.
+
+        Parameters
+        ----------
+        basename : str
+            Output base filename.
+        codec : str, optional
+            Video codec to expand the parameter sets for. The default is None,
+            see parameter_sets().
+
+        Returns
+        -------
+        list
+            List of output filenames, one for each parameter set.
+
+        """
+        return [
+            self.output_name(basename, parameters)
+            for parameters in self.parameter_sets(codec)
+        ]
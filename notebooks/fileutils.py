@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 09:12:31 2026
+
+@author: cgwork
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+
+def file_fingerprint(filename):
+    """
+    Return a cheap fingerprint identifying the current state of a file.
+
+    Parameters
+    ----------
+    filename : Union[str, os.PathLike]
+        Path to the file.
+
+    Returns
+    -------
+    tuple
+        Tuple with the absolute path, the size in bytes and the modification
+        time in nanoseconds, which changes whenever the file is rewritten.
+
+    """
+    stat = os.stat(filename)
+    return (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+
+
+def content_fingerprint(filename, chunks=16, chunk_size=65536):
+    """
+    Return a fingerprint of the content of a file, whatever its name.
+
+    The file size and chunks sampled at evenly spaced offsets, the first
+    and the last included, are hashed, so a multi-gigabyte file is
+    fingerprinted from a few reads, and a file rewritten with a different
+    content gets a different fingerprint.
+
+    Parameters
+    ----------
+    filename : Union[str, os.PathLike]
+        Path to the file.
+    chunks : int, optional
+        Number of chunks sampled. The default is 16.
+    chunk_size : int, optional
+        Size in bytes of each chunk. The default is 65536.
+
+    Returns
+    -------
+    str
+        SHA1 hex digest of the size and sampled content.
+
+    """
+    size = os.path.getsize(filename)
+    digest = hashlib.sha1(str(size).encode("utf8"))
+
+    with open(filename, "rb") as file:
+        if size <= chunks * chunk_size:
+            digest.update(file.read())
+        else:
+            for i in range(chunks):
+                file.seek((size - chunk_size) * i // max(1, chunks - 1))
+                digest.update(file.read(chunk_size))
+
+    return digest.hexdigest()
+
+
+def atomic_write_json(data, filename, indent=None):
+    """
+    Write data as JSON through a temporary file renamed over filename.
+
+    Readers never see a partially written file, even if the process dies
+    halfway through the write.
+
+    Parameters
+    ----------
+    data : dict
+        JSON serializable data.
+    filename : Union[str, os.PathLike]
+        Destination filename.
+    indent : int, optional
+        JSON indentation. The default is None.
+
+    Returns
+    -------
+    None.
+
+    """
+    dirname = os.path.dirname(os.path.abspath(filename))
+    os.makedirs(dirname, exist_ok=True)
+
+    fd, tmpfile = tempfile.mkstemp(
+        dir=dirname, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wt", encoding="utf8") as file:
+            json.dump(data, file, indent=indent)
+        os.replace(tmpfile, filename)
+    except BaseException:
+        if os.path.exists(tmpfile):
+            os.remove(tmpfile)
+        raise
+
+
+def options_digest(options):
+    """
+    Return a stable hash of an FFMPEG options dictionary.
+
+    Parameters
+    ----------
+    options : dict
+        FFMPEG options in key:pair form.
+
+    Returns
+    -------
+    str
+        SHA1 hex digest of the options, independent of the key order.
+
+    """
+    data = json.dumps(options, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode("utf8")).hexdigest()
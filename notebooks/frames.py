@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 11:15:40 2026
+
+@author: cgwork
+"""
+
+import threading
+from collections import OrderedDict
+
+import ffmpeg
+import numpy as np
+
+# pixel format : (dtype, packed channels or None, [(w_shift, h_shift), ...])
+# packed formats are a single interleaved plane, planar formats list the
+# chroma subsampling shift of each plane, i.e, (1, 1) for 4:2:0 chroma
+_PIXEL_FORMATS = {
+    "rgb24": (np.uint8, 3, [(0, 0)]),
+    "bgr24": (np.uint8, 3, [(0, 0)]),
+    "rgba": (np.uint8, 4, [(0, 0)]),
+    "gray": (np.uint8, 1, [(0, 0)]),
+    "gray16le": (np.uint16, 1, [(0, 0)]),
+    "rgb48le": (np.uint16, 3, [(0, 0)]),
+    "yuv420p": (np.uint8, None, [(0, 0), (1, 1), (1, 1)]),
+    "yuv422p": (np.uint8, None, [(0, 0), (1, 0), (1, 0)]),
+    "yuv444p": (np.uint8, None, [(0, 0), (0, 0), (0, 0)]),
+    "yuv420p10le": (np.uint16, None, [(0, 0), (1, 1), (1, 1)]),
+    "yuv422p10le": (np.uint16, None, [(0, 0), (1, 0), (1, 0)]),
+    "yuv444p10le": (np.uint16, None, [(0, 0), (0, 0), (0, 0)]),
+}
+
+
+def pixel_formats():
+    """
+    Return the raw pixel formats the frame APIs can decode into.
+
+    Returns
+    -------
+    list
+        List of FFMPEG pixel format names.
+
+    """
+    return list(_PIXEL_FORMATS.keys())
+
+
+def plane_shapes(pix_fmt, width, height):
+    """
+    Return the (height, width) of each plane of a raw frame.
+
+    Parameters
+    ----------
+    pix_fmt : str
+        FFMPEG pixel format name, i.e, "rgb24" or "yuv420p".
+    width : int
+        Frame width.
+    height : int
+        Frame height.
+
+    Raises
+    ------
+    ValueError
+        If the pixel format isn't supported.
+
+    Returns
+    -------
+    list
+        List of (height, width) tuples, one for each plane.
+
+    """
+    if pix_fmt not in _PIXEL_FORMATS:
+        raise ValueError(f"Unsupported raw pixel format {pix_fmt}.")
+
+    _, _, planes = _PIXEL_FORMATS[pix_fmt]
+    return [
+        (-(-height >> hshift), -(-width >> wshift))  # ceil division
+        for wshift, hshift in planes
+    ]
+
+
+def frame_geometry(pix_fmt, width, height):
+    """
+    Return the array shape, dtype and size in bytes of one raw frame.
+
+    Packed formats have a (height, width, channels) shape, or (height, width)
+    for single channel formats. Planar formats are a flat array with the
+    planes stored one after the other, see split_planes.
+
+    Parameters
+    ----------
+    pix_fmt : str
+        FFMPEG pixel format name, i.e, "rgb24" or "yuv420p".
+    width : int
+        Frame width.
+    height : int
+        Frame height.
+
+    Returns
+    -------
+    tuple
+        Tuple (shape, dtype, nbytes) of a single frame.
+
+    """
+    dtype, channels, _ = _PIXEL_FORMATS.get(pix_fmt, (None, None, None))
+    shapes = plane_shapes(pix_fmt, width, height)
+    itemsize = np.dtype(dtype).itemsize
+
+    if channels == 1:
+        shape = (height, width)
+    elif channels is not None:
+        shape = (height, width, channels)
+    else:
+        shape = (sum(h * w for h, w in shapes),)
+
+    return shape, dtype, int(np.prod(shape)) * itemsize
+
+
+def split_planes(frames, pix_fmt, width, height):
+    """
+    Split a batch of raw planar frames into per-plane views, without copies.
+
+    Parameters
+    ----------
+    frames : numpy.ndarray
+        Batch of frames with shape (n, *frame_geometry(...)[0]).
+    pix_fmt : str
+        FFMPEG pixel format name of the frames.
+    width : int
+        Frame width.
+    height : int
+        Frame height.
+
+    Returns
+    -------
+    list
+        List of arrays with shape (n, plane_height, plane_width), i.e, the
+        Y, U, V planes. Packed formats are returned as a single plane.
+
+    """
+    if _PIXEL_FORMATS[pix_fmt][1] is not None:
+        return [frames]
+
+    planes, offset = [], 0
+    for plane_height, plane_width in plane_shapes(pix_fmt, width, height):
+        size = plane_height * plane_width
+        planes.append(
+            frames[:, offset:offset + size].reshape(
+                (-1, plane_height, plane_width))
+        )
+        offset += size
+
+    return planes
+
+
+def _read_batch(pipe, buffer):
+    """Fill buffer from the pipe, return the number of whole frames."""
+    view = memoryview(buffer).cast("B")
+    filled = 0
+    while filled < len(view):
+        nbytes = pipe.readinto(view[filled:])
+        if not nbytes:
+            break
+        filled += nbytes
+    return filled // (buffer.nbytes // len(buffer))
+
+
+def read_frames(stream, pix_fmt, width, height, batch=16, copy=False):
+    """
+    Stream the frames of an FFMPEG rawvideo pipe as fixed-size NumPy batches.
+
+    The frames are read from a single long-lived FFMPEG process into a
+    preallocated buffer, so the peak memory is O(batch) regardless of the
+    clip length. Closing the generator early kills the process.
+
+    Parameters
+    ----------
+    stream : ffmpeg.nodes.OutputStream
+        FFMPEG output writing rawvideo frames of pix_fmt to "pipe:".
+    pix_fmt : str
+        Raw pixel format of the frames, see pixel_formats().
+    width : int
+        Frame width.
+    height : int
+        Frame height.
+    batch : int, optional
+        Number of frames in each batch. The default is 16.
+    copy : bool, optional
+        Yield a copy of each batch instead of a view of the reused buffer,
+        which is overwritten by the next batch. The default is False.
+
+    Raises
+    ------
+    ffmpeg.Error
+        If FFMPEG fails to decode the video, with its error output.
+
+    Yields
+    ------
+    numpy.ndarray
+        Batch of up to batch frames, with shape (n, *frame_geometry(...)[0]).
+
+    """
+    shape, dtype, _ = frame_geometry(pix_fmt, width, height)
+    process = stream.run_async(pipe_stdout=True, pipe_stderr=True)
+    # drain stderr while reading the frames, so neither pipe fills up
+    stderr = []
+    reader = threading.Thread(
+        target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    reader.start()
+    buffer = np.empty((batch, *shape), dtype=dtype)
+
+    try:
+        while True:
+            frames = _read_batch(process.stdout, buffer)
+            # the end of the pipe, a decoding error or the video end
+            if frames < batch and process.wait() != 0:
+                reader.join()
+                raise ffmpeg.Error("ffmpeg", None, b"".join(stderr))
+            if frames == 0:
+                break
+            yield buffer[:frames].copy() if copy else buffer[:frames]
+            if frames < batch:
+                break
+    finally:
+        # killed before the pipe closes, or it logs a broken pipe
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        reader.join()
+        process.stdout.close()
+        process.stderr.close()
+
+
+class FrameCache:
+    """Byte-bounded LRU cache of decoded frames."""
+
+    def __init__(self, max_bytes=512 * 1024 ** 2):
+        self.__max_bytes = max_bytes
+        self.__nbytes = 0
+        self.__frames = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @property
+    def max_bytes(self):
+        """
+        Get the memory budget of the cache.
+
+        Returns
+        -------
+        int
+            Maximum size of the cached frames in bytes.
+
+        """
+        return self.__max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes):
+        with self.__lock:
+            self.__max_bytes = max_bytes
+            self.__evict()
+
+    @property
+    def nbytes(self):
+        """
+        Get the current size of the cached frames.
+
+        Returns
+        -------
+        int
+            Size of the cached frames in bytes.
+
+        """
+        return self.__nbytes
+
+    def __len__(self):
+        return len(self.__frames)
+
+    def __contains__(self, key):
+        return key in self.__frames
+
+    def __evict(self):
+        while self.__nbytes > self.__max_bytes and self.__frames:
+            _, frame = self.__frames.popitem(last=False)
+            self.__nbytes -= frame.nbytes
+
+    def get(self, key):
+        """
+        Return a cached frame, marking it as the most recently used.
+
+        Parameters
+        ----------
+        key : tuple
+            Frame key, i.e, (file fingerprint, pixel format, frame index).
+
+        Returns
+        -------
+        numpy.ndarray
+            The cached frame, or None on a miss.
+
+        """
+        with self.__lock:
+            frame = self.__frames.get(key)
+            if frame is not None:
+                self.__frames.move_to_end(key)
+            return frame
+
+    def put(self, key, frame):
+        """
+        Cache a frame, evicting the least recently used frames over budget.
+
+        Parameters
+        ----------
+        key : tuple
+            Frame key, i.e, (file fingerprint, pixel format, frame index).
+        frame : numpy.ndarray
+            Decoded frame, it must not be a view of a reused buffer.
+
+        Returns
+        -------
+        None.
+
+        """
+        if frame.nbytes > self.__max_bytes:
+            return
+
+        with self.__lock:
+            previous = self.__frames.pop(key, None)
+            if previous is not None:
+                self.__nbytes -= previous.nbytes
+            self.__frames[key] = frame
+            self.__nbytes += frame.nbytes
+            self.__evict()
+
+    def clear(self):
+        """
+        Drop every cached frame.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.__lock:
+            self.__frames.clear()
+            self.__nbytes = 0
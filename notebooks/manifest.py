@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 14:05:52 2026
+
+@author: cgwork
+"""
+
+import json
+import os
+import subprocess
+import threading
+import time
+
+from fileutils import atomic_write_json, file_fingerprint, options_digest
+
+
+class SweepManifest:
+    """Encode sweep manifest, recording the completed and valid jobs."""
+
+    def __init__(self, filename):
+        self.__filename = filename
+        self.__lock = threading.Lock()
+        self.__entries = {}
+
+        if os.path.isfile(filename):
+            with open(filename, "r", encoding="utf8") as jsonfile:
+                self.__entries = json.load(jsonfile).get("jobs", {})
+
+    @property
+    def filename(self):
+        """
+        Get the manifest JSON filename.
+
+        Returns
+        -------
+        str
+            Path to the manifest JSON file.
+
+        """
+        return self.__filename
+
+    def entries(self):
+        """
+        Return the manifest entries.
+
+        Returns
+        -------
+        dict
+            Dictionary with the absolute output filename as key, and as value
+            the recorded job state.
+
+        """
+        return self.__entries
+
+    def __save(self):
+        atomic_write_json(
+            {"version": 1, "jobs": self.__entries}, self.__filename, indent=4)
+
+    @staticmethod
+    def verify_output(filename):
+        """
+        Fast decode check of an encoded output, decoding only keyframes.
+
+        Parameters
+        ----------
+        filename : str
+            Encoded media file.
+
+        Returns
+        -------
+        bool
+            True if FFMPEG reads the whole file without any error.
+
+        """
+        process = subprocess.run(
+            ["ffmpeg", "-nostdin", "-v", "error", "-xerror",
+             "-skip_frame", "nokey", "-i", filename,
+             "-map", "0:v:0", "-f", "null", "-"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=False,
+        )
+        return process.returncode == 0 and not process.stderr.strip()
+
+    def is_complete(self, job, verify=False):
+        """
+        Check if a job already completed, and its output is still valid.
+
+        Parameters
+        ----------
+        job : dict
+            Encode job, with the "input", "output" and "options" keys.
+        verify : bool, optional
+            Also run a fast decode check of the output. The default is False.
+
+        Returns
+        -------
+        bool
+            True if the input and options are unchanged since the recorded
+            completion, and the output file is the one that was written.
+
+        """
+        output = os.path.abspath(job["output"])
+        entry = self.__entries.get(output)
+
+        if entry is None or entry.get("complete") is not True:
+            return False
+
+        try:
+            if list(file_fingerprint(job["input"])) != entry["input"] or \
+                    list(file_fingerprint(output)) != entry["output"]:
+                return False
+        except OSError:
+            return False
+
+        if options_digest(job["options"]) != entry["options_hash"]:
+            return False
+
+        return self.verify_output(output) if verify is True else True
+
+    def record(self, job, **extra):
+        """
+        Record a job as complete, after its output was written.
+
+        Parameters
+        ----------
+        job : dict
+            Encode job, with the "input", "output" and "options" keys.
+        **extra
+            Extra JSON serializable fields stored with the entry.
+
+        Returns
+        -------
+        None.
+
+        """
+        output = os.path.abspath(job["output"])
+        entry = {
+            "input": list(file_fingerprint(job["input"])),
+            "output": list(file_fingerprint(output)),
+            "options_hash": options_digest(job["options"]),
+            "options": job["options"],
+            "complete": True,
+            "completed_at": time.time(),
+            **extra,
+        }
+
+        with self.__lock:
+            self.__entries[output] = entry
+            self.__save()
+
+    def forget(self, output=None):
+        """
+        Drop a recorded job, or every job, so it runs again.
+
+        Parameters
+        ----------
+        output : str, optional
+            Output filename of the job. The default is None, for every job.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.__lock:
+            if output is None:
+                self.__entries.clear()
+            else:
+                self.__entries.pop(os.path.abspath(output), None)
+            self.__save()
@@ -5,11 +5,26 @@ Created on Sun Dec 26 11:08:01 2021
 
 @author: cgwork
 """
+import bisect
+import hashlib
+import json
 import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import ffmpeg
+import numpy as np
 from dotenv import dotenv_values
 
+from fileutils import file_fingerprint
+from frames import FrameCache, frame_geometry, read_frames
+from media_record import MediaRecord
+from packet_stats import (
+    PacketStatsCache, bitrate_curve, gop_lengths, peak_bitrate)
+from probe_cache import ProbeCache
+from reference_cache import ReferenceCache
+
 
 class Media:
     """Media interface for FFMPEG probe, containing related stream data."""
@@ -18,8 +33,17 @@ class Media:
 
         self.__config = {}
         self.__info = {}
+        self.__probe_errors = {}
+        self.__info_lock = threading.Lock()
+        self.__records = {}
+        self.__snapshot = None
+        self.__packets = {}
+        self.__scene_cuts = {}
+        self.__frame_cache = FrameCache()
+        self.__changes = {"added": [], "changed": [], "removed": []}
         self.__config["original_dir"] = os.getenv("VIDEO_RESOURCES", None)
         self.__config["compressed_dir"] = os.getenv("VIDEO_COMPRESSED", None)
+        cache_dir = os.getenv("VIDEO_CACHE", None)
 
         if not any(self.__config.values()):
             dotfile = os.path.join(os.path.dirname(os.getcwd()), ".env")
@@ -27,6 +51,7 @@ class Media:
                 _tmp = dotenv_values(dotfile)
                 self.__config["original_dir"] = _tmp["VIDEO_RESOURCES"]
                 self.__config["compressed_dir"] = _tmp["VIDEO_COMPRESSED"]
+                cache_dir = _tmp.get("VIDEO_CACHE", cache_dir)
             else:
                 print(
                     "No VIDEO_RESOURCES nor VIDEO_COMPRESS environment"
@@ -39,37 +64,138 @@ class Media:
         self.__input_dir = self.__config["original_dir"]
         self.__output_dir = self.__config["compressed_dir"]
 
-    def glob_media(self, containers=None):
+        # persistent ffprobe cache, shared by every metadata accessor
+        self.__config["cache_dir"] = cache_dir if cache_dir is not None \
+            else os.path.join(
+                os.path.expanduser("~"), ".cache", "videometrics")
+        self.__probe_cache = ProbeCache(
+            os.path.join(self.__config["cache_dir"], "probe_cache.sqlite")
+        )
+        # opt-in raw decoded references, see use_reference_cache
+        self.__reference_cache = ReferenceCache(
+            os.path.join(self.__config["cache_dir"], "references")
+        )
+        self.__use_reference_cache = False
+        self.__packet_cache = PacketStatsCache(
+            os.path.join(self.__config["cache_dir"], "packets")
+        )
+
+    def __snapshot_file(self, containers):
+        key = json.dumps([os.path.abspath(self.input_dir), sorted(containers)])
+        digest = hashlib.sha1(key.encode("utf8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"glob_snapshot_{digest}.json")
+
+    def __scan(self, containers, recursive):
+        """Walk the input directory, return {path: [size, mtime_ns]}."""
+        found = {}
+        output_dir = os.path.abspath(self.output_dir) \
+            if self.output_dir is not None else None
+        pending = [self.input_dir]
+
+        while pending:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=True):
+                        # never descend into the compressed media
+                        if recursive and \
+                                os.path.abspath(entry.path) != output_dir:
+                            pending.append(entry.path)
+                        continue
+
+                    ext = os.path.splitext(entry.name)[1][1:].lower()
+                    if ext in containers and entry.is_file():
+                        stat = entry.stat()
+                        found[entry.path] = [stat.st_size, stat.st_mtime_ns]
+
+        return found
+
+    def glob_media(self, containers=None, recursive=True):
         """
         Glob all media of extension set in containers.
 
         Glob all media of extension set in containers under the directories
         defined by the VIDEO_RESOURCES environment variable or dotenv file.
+        The scan is incremental, a snapshot of (path, size, mtime) is kept in
+        the cache directory, and each call returns only the delta against
+        the previous scan.
 
         Parameters
         ----------
         containers : list, optional
             List of video containers, i.e, mkv, mp4. The default is None.
+        recursive : bool, optional
+            Descend into subdirectories of the input directory, mirroring
+            them under the output directory. The default is True.
 
         Returns
         -------
-        None.
+        dict
+            Dictionary with the keys "added", "changed" and "removed", with
+            the lists of media files for each kind of change since the last
+            scan.
 
         """
-        _containers = containers if \
-            containers is not None else self.containers()
-
-        self.__config["media_in"] = [
-            os.path.join(self.input_dir, x)
-            for x in os.listdir(self.input_dir)
-            if x.split(".")[1] in _containers
+        _containers = [
+            x.lower() for x in (containers if
+                                containers is not None else self.containers())
         ]
+        snapshot_file = self.__snapshot_file(_containers)
+
+        if self.__snapshot is None or \
+                self.__snapshot["file"] != snapshot_file:
+            files = {}
+            if os.path.isfile(snapshot_file):
+                with open(snapshot_file, "r", encoding="utf8") as jsonfile:
+                    files = json.load(jsonfile)
+            self.__snapshot = {"file": snapshot_file, "files": files}
+
+        previous = self.__snapshot["files"]
+        current = self.__scan(_containers, recursive)
+
+        self.__changes = {
+            "added": sorted(x for x in current if x not in previous),
+            "changed": sorted(
+                x for x in current
+                if x in previous and current[x] != previous[x]
+            ),
+            "removed": sorted(x for x in previous if x not in current),
+        }
+
+        for video in self.__changes["changed"] + self.__changes["removed"]:
+            self.__probe_cache.invalidate(video)
+            self.__records.pop(os.path.abspath(video), None)
+            with self.__info_lock:
+                self.__info.pop(video, None)
+
+        self.__snapshot["files"] = current
+        if any(self.__changes.values()) or not os.path.isfile(snapshot_file):
+            os.makedirs(os.path.dirname(snapshot_file), exist_ok=True)
+            with open(snapshot_file, "w", encoding="utf8") as jsonfile:
+                json.dump(current, jsonfile)
+
+        self.__config["media_in"] = sorted(current)
         self.__config["media_out"] = [
-            os.path.join(self.output_dir, x)
-            for x in os.listdir(self.input_dir)
-            if x.split(".")[1] in _containers
+            os.path.join(self.output_dir,
+                         os.path.relpath(x, self.input_dir))
+            for x in self.__config["media_in"]
         ]
 
+        return self.__changes
+
+    def changes(self):
+        """
+        Return the media changes found by the last glob_media call.
+
+        Returns
+        -------
+        dict
+            Dictionary with the keys "added", "changed" and "removed".
+
+        """
+        return self.__changes
+
     @property
     def input_dir(self):
         """
@@ -130,6 +256,33 @@ class Media:
         """
         self.__output_dir = outdir
 
+    @property
+    def cache_dir(self):
+        """
+        Get the directory holding the persistent media caches.
+
+        Returns
+        -------
+        str
+            Path to the cache directory, set by the VIDEO_CACHE environment
+            variable or dotenv file, defaulting to ~/.cache/videometrics.
+
+        """
+        return self.__config["cache_dir"]
+
+    @property
+    def probe_cache(self):
+        """
+        Get the FFprobe cache used by the metadata accessors.
+
+        Returns
+        -------
+        ProbeCache
+            Persistent probe cache keyed by path, size and mtime.
+
+        """
+        return self.__probe_cache
+
     def input_files(self):
         """
         Return a list of globbed files from the source material directory.
@@ -216,10 +369,117 @@ class Media:
                 isinstance(media, str) and media in media_data:
             return media_data[media]
 
-        return self.probe_all()
+        return media_data
+
+    @property
+    def frame_cache(self):
+        """
+        Get the byte-bounded LRU cache of decoded frames used by frame_at.
+
+        Returns
+        -------
+        FrameCache
+            Decoded frames cache, its max_bytes sets the memory budget.
 
-    @staticmethod
-    def probe(video):
+        """
+        return self.__frame_cache
+
+    @property
+    def reference_cache(self):
+        """
+        Get the cache of sources decoded once to raw memory-mappable files.
+
+        Returns
+        -------
+        ReferenceCache
+            Raw reference cache, its max_bytes sets the disk budget.
+
+        """
+        return self.__reference_cache
+
+    @property
+    def packet_cache(self):
+        """
+        Get the cache of the packet arrays read by packet_stats.
+
+        Returns
+        -------
+        PacketStatsCache
+            Packet arrays cache keyed by path, size and mtime.
+
+        """
+        return self.__packet_cache
+
+    @property
+    def use_reference_cache(self):
+        """
+        Get whether sources are decoded once into the reference cache.
+
+        Returns
+        -------
+        bool
+            When True the encoders, metrics and frame APIs read the raw
+            cached reference instead of decoding the source again.
+
+        """
+        return self.__use_reference_cache
+
+    @use_reference_cache.setter
+    def use_reference_cache(self, enabled) -> None:
+        self.__use_reference_cache = bool(enabled)
+
+    def reference(self, video, pix_fmt=None):
+        """
+        Return the raw cached reference of a source, decoding it once.
+
+        Parameters
+        ----------
+        video : str
+            Source media filename.
+        pix_fmt : str, optional
+            Pixel format of the raw reference. The default is None, using the
+            source pixel format, or yuv444p when YUV4MPEG2 can't hold it.
+
+        Returns
+        -------
+        str
+            Path to the raw .y4m reference, or the source filename itself when
+            the reference cache is disabled or the reference is over budget.
+
+        """
+        if not self.__use_reference_cache:
+            return video
+
+        record = self.record(video)
+        if pix_fmt is None:
+            pix_fmt = record.pix_fmt if record.pix_fmt in \
+                self.__reference_cache.pixel_formats() else "yuv444p"
+
+        _, _, nbytes = frame_geometry(pix_fmt, record.width, record.height)
+        reference = self.__reference_cache.get(
+            video, pix_fmt, expected_bytes=nbytes * record.number_of_frames)
+
+        return reference if reference is not None else video
+
+    def probe_full(self, video):
+        """
+        Return the full FFprobe data, streams and format, from the cache.
+
+        Parameters
+        ----------
+        video : str
+            Path and filename to query information from.
+
+        Returns
+        -------
+        dict
+            Dictionary with the "streams" and "format" FFprobe sections.
+            FFprobe only runs when the file is new or changed on disk.
+
+        """
+        return self.__probe_cache.probe(video)
+
+    def probe(self, video):
         """
         Return the video stream info via FFMPEG ffprobe.
 
@@ -234,28 +494,123 @@ class Media:
             Dictionary of metadata, tags, found in the media file via FFprobe.
 
         """
-        probe = ffmpeg.probe(video)
+        probe = self.probe_full(video)
         video_info = next(
             stream for stream in probe["streams"] if
             stream["codec_type"] == "video"
         )
         return video_info
 
-    def probe_all(self):
+    def iter_probe_all(self, max_workers=None):
+        """
+        Probe every globbed media file concurrently, yielding as they finish.
+
+        FFprobe calls are fanned out over a bounded thread pool. A file that
+        fails to probe doesn't abort the scan, its error is recorded in the
+        error map returned by probe_errors() instead.
+
+        Parameters
+        ----------
+        max_workers : int, optional
+            Maximum number of concurrent FFprobe processes. The default is
+            None, using the number of CPU cores.
+
+        Yields
+        ------
+        tuple
+            Tuple (filename, info, error), where info is the video stream
+            FFprobe information or None, and error the exception or None.
+
+        """
+        videos = [str(video) for video in (self.input_files() or [])]
+        workers = max_workers if max_workers is not None else os.cpu_count()
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {
+                executor.submit(self.probe, video): video for video in videos
+            }
+            try:
+                for future in as_completed(futures):
+                    video = futures[future]
+                    try:
+                        info, error = future.result(), None
+                    except Exception as exc:  # pylint: disable=broad-except
+                        info, error = None, exc
+
+                    with self.__info_lock:
+                        if error is None:
+                            self.__info[video] = info
+                            self.__probe_errors.pop(video, None)
+                        else:
+                            self.__info.pop(video, None)
+                            self.__probe_errors[video] = error
+
+                    yield video, info, error
+            finally:
+                # the consumer stopped early, don't start pending probes
+                for future in futures:
+                    future.cancel()
+
+    def probe_all(self, max_workers=None):
         """
         Video metadata/tags from every globbed media file in the source dir.
 
+        Parameters
+        ----------
+        max_workers : int, optional
+            Maximum number of concurrent FFprobe processes. The default is
+            None, using the number of CPU cores.
+
         Returns
         -------
         dict
             Dictionary with source material filename as key, and as value the
-            set of metadata/tags found by FFprobe.
+            set of metadata/tags found by FFprobe. Files that failed to probe
+            are left out, and reported by probe_errors().
 
         """
-        for video in self.input_files():
-            self.__info[str(video)] = self.probe(video)
+        for _ in self.iter_probe_all(max_workers=max_workers):
+            pass
         return self.__info
 
+    def probe_errors(self):
+        """
+        Return the media files that failed to probe in the last scan.
+
+        Returns
+        -------
+        dict
+            Dictionary with source material filename as key, and as value the
+            exception raised while probing it.
+
+        """
+        return self.__probe_errors
+
+    def record(self, video):
+        """
+        Return the stream fields of the input video, derived once.
+
+        Parameters
+        ----------
+        video : str
+            Input video filename.
+
+        Returns
+        -------
+        MediaRecord
+            Record with the width, height, frame rate, duration, frame count,
+            pixel format and bitrates, built from a single cached FFprobe.
+
+        """
+        key = file_fingerprint(video)
+        memo = self.__records.get(key[0])
+        if memo is not None and memo[0] == key:
+            return memo[1]
+
+        record = MediaRecord(str(video), self.probe_full(video))
+        self.__records[key[0]] = (key, record)
+        return record
+
     def width(self, video):
         """
         Return the width of the input video.
@@ -271,7 +626,7 @@ class Media:
             Video width.
 
         """
-        return int(self.probe(video)["width"])
+        return self.record(video).width
 
     def height(self, video):
         """
@@ -288,7 +643,7 @@ class Media:
             Video height.
 
         """
-        return int(self.probe(video)["height"])
+        return self.record(video).height
 
     def framerate(self, video):
         """
@@ -302,10 +657,11 @@ class Media:
         Returns
         -------
         int
-            Input video framerate, i.e, 25fps for PAL.
+            Input video framerate, i.e, 25fps for PAL, 30 for 30000/1001.
+            The exact rational frame rate is in record(video).frame_rate.
 
         """
-        return int(self.probe(video)["r_frame_rate"].split("/")[0])
+        return int(round(self.record(video).frame_rate))
 
     def duration(self, video):
         """
@@ -323,18 +679,10 @@ class Media:
             milliseconds.
 
         """
-        info = self.probe(video)["tags"]
-
-        if "DURATION" not in info.keys():
-            print(f"No DURATION tag found in {video} probe.")
-            return None
-
-        hours, minutes, seconds = info["DURATION"].split(":")
-        seconds, milliseconds = seconds.split(",")
-        hours, minutes, seconds, milliseconds = map(
-            lambda x: int(x) if len(x) < 3 else round(int(x) * 1e-6),
-            [hours, minutes, seconds, milliseconds],
-        )
+        milliseconds = int(round(self.record(video).duration * 1000))
+        seconds, milliseconds = divmod(milliseconds, 1000)
+        minutes, seconds = divmod(seconds, 60)
+        hours, minutes = divmod(minutes, 60)
 
         return [hours, minutes, seconds, milliseconds]
 
@@ -353,8 +701,7 @@ class Media:
             Total duration of the input video in seconds.
 
         """
-        hours, minutes, seconds, milliseconds = self.duration(video)
-        return round(hours * 3600 + minutes * 60 + seconds + milliseconds)
+        return round(self.record(video).duration)
 
     def number_of_frames(self, video):
         """
@@ -371,19 +718,7 @@ class Media:
             Total duration of the input video in frames, depends on frame rate.
 
         """
-        if "nb_frames" in self.probe(video):
-            return self.probe(video)["nb_frames"]
-
-        frame_rate = self.framerate(video)
-        time_base = int(self.probe(video)["time_base"].split("/")[1])
-
-        hours, mins, secs, milliseconds = self.duration(video)
-        remaining_frames = int((milliseconds / float(time_base)) * frame_rate)
-        frames = frame_rate * (
-            3600 * hours + 60 * mins + secs
-        ) + remaining_frames
-
-        return frames
+        return self.record(video).number_of_frames
 
     @staticmethod
     def __video_bitrate(total_bitrate, audio_bitrate=0):
@@ -405,8 +740,7 @@ class Media:
         """
         return total_bitrate - audio_bitrate
 
-    @staticmethod
-    def __audio_bitrate(video, audio_bitrate=0):
+    def __audio_bitrate(self, video, audio_bitrate=0):
         """
         Return the audio bitrate found in the audio stream, or overriden.
 
@@ -420,25 +754,15 @@ class Media:
         Returns
         -------
         int
-            Audio bitrate from existing AV stream, or manually allocated.
+            Audio bitrate in kbit/s from existing AV stream, or manually
+            allocated.
 
         """
         if audio_bitrate != 0:
             return audio_bitrate
 
-        if ffmpeg.probe(video, select_streams="a")["streams"]:
-            bitrate = float(
-                next(
-                    (
-                        s
-                        for s in ffmpeg.probe(video)["streams"]
-                        if s["codec_type"] == "audio"
-                    ),
-                    None,
-                )["bit_rate"]
-            )
-            return bitrate
-        return 0
+        # FFprobe reports bit/s, the size budget is computed in kbit/s
+        return int(round(self.record(video).audio_bitrate / 1000))
 
     @staticmethod
     def __total_bitrate(target_size_mib, duration_secs):
@@ -480,7 +804,7 @@ class Media:
             the media stream duration and desired final file size.
 
         """
-        duration_secs = self.number_of_seconds(video)
+        duration_secs = self.record(video).duration
         total_bitrate = self.__total_bitrate(target_size_mib, duration_secs)
 
         audio_bitrate = self.__audio_bitrate(video)
@@ -494,3 +818,312 @@ class Media:
             "video_bitrate": video_bitrate,
             "audio_bitrate": audio_bitrate,
         }
+
+    def iter_frames(self, video, pix_fmt="rgb24", start=0, count=None,
+                    batch=16, copy=False):
+        """
+        Stream decoded frames of a video as fixed-size NumPy batches.
+
+        Frames are read from a single long-lived FFMPEG rawvideo pipe into a
+        preallocated buffer, see frames.read_frames, so the peak memory is
+        O(batch) regardless of the clip length. With use_reference_cache
+        enabled and a planar pixel format, the batches are zero-copy views
+        of the raw cached reference.
+
+        Parameters
+        ----------
+        video : str
+            Input video filename.
+        pix_fmt : str, optional
+            Raw pixel format to decode into, see frames.pixel_formats().
+            The default is "rgb24".
+        start : int, optional
+            Index of the first frame to decode. The default is 0.
+        count : int, optional
+            Maximum number of frames to decode. The default is None, decoding
+            until the end of the video.
+        batch : int, optional
+            Number of frames in each batch. The default is 16.
+        copy : bool, optional
+            Yield a copy of each batch instead of a view of the reused
+            buffer, which is overwritten by the next batch. The default is
+            False.
+
+        Raises
+        ------
+        ffmpeg.Error
+            If FFMPEG fails to decode the video, with its error output.
+
+        Yields
+        ------
+        numpy.ndarray
+            Batch of up to batch frames, with shape (n, height, width, 3) for
+            rgb24, see frames.frame_geometry for the other pixel formats.
+
+        """
+        record = self.record(video)
+        shape, _, _ = frame_geometry(
+            pix_fmt, record.width, record.height)
+
+        reference = self.reference(video, pix_fmt) \
+            if pix_fmt in self.__reference_cache.pixel_formats() else video
+        if reference != video:
+            # zero-copy slices of the memory-mapped raw reference
+            frames = ReferenceCache.memmap(reference)
+            stop = len(frames) if count is None else \
+                min(len(frames), start + count)
+            for first in range(start, stop, batch):
+                view = frames[first:min(first + batch, stop)].reshape(
+                    (-1, *shape))
+                yield view.copy() if copy else view
+            return
+
+        input_options = {}
+        if start > 0:
+            # seek half a frame early so float rounding never drops a frame
+            input_options["ss"] = float((start - 0.5) / record.frame_rate)
+
+        output_options = {"format": "rawvideo", "pix_fmt": pix_fmt,
+                          "loglevel": "error"}
+        if count is not None:
+            output_options["frames:v"] = count
+
+        yield from read_frames(
+            ffmpeg
+            .input(str(video), **input_options)
+            .output("pipe:", **output_options),
+            pix_fmt, record.width, record.height, batch, copy)
+
+    def packets(self, video):
+        """
+        Return the video packet arrays of a media file.
+
+        The packets are streamed from FFprobe once, cached on disk per file,
+        and kept in memory until the file changes on disk.
+
+        Parameters
+        ----------
+        video : str
+            Media filename, an input or an encoded output.
+
+        Returns
+        -------
+        dict
+            Dictionary with the "pts_time", "size" and "key" arrays, one row
+            per frame in presentation order, see packet_stats.read_packets.
+
+        """
+        key = file_fingerprint(video)
+        memo = self.__packets.get(key[0])
+        if memo is not None and memo[0] == key:
+            return memo[1]
+
+        packets = self.__packet_cache.get(video)
+        self.__packets[key[0]] = (key, packets)
+        return packets
+
+    def packet_stats(self, video, interval=1.0, window=1.0):
+        """
+        Return the bitrate and GOP statistics of a media file packets.
+
+        Parameters
+        ----------
+        video : str
+            Media filename, an input or an encoded output.
+        interval : float, optional
+            Interval of the bitrate curve in seconds. The default is 1.0.
+        window : float, optional
+            Sliding window of the peak bitrate in seconds.
+            The default is 1.0.
+
+        Returns
+        -------
+        dict
+            The packet arrays, see packets(), with the "frame" numbers
+            counted from 1, as the metrics DataFrames index, see
+            VideoQualityTests.get_dataframes, the "bitrate" curve in bit/s
+            of each interval, the "gop_lengths" in frames, the
+            "peak_bitrate" in bit/s, and the "peak_time" its window start.
+
+        """
+        packets = self.packets(video)
+        peak, peak_time = peak_bitrate(
+            packets["pts_time"], packets["size"], window)
+        return {
+            **packets,
+            "frame": np.arange(1, len(packets["size"]) + 1),
+            "bitrate": bitrate_curve(
+                packets["pts_time"], packets["size"], interval),
+            "gop_lengths": gop_lengths(packets["key"]),
+            "peak_bitrate": peak,
+            "peak_time": peak_time,
+        }
+
+    def keyframes(self, video):
+        """
+        Return the indices of the keyframes of the input video.
+
+        Parameters
+        ----------
+        video : str
+            Input video filename.
+
+        Returns
+        -------
+        list
+            Sorted list of the frame indices of every keyframe, see
+            packets().
+
+        """
+        keyframes = np.flatnonzero(self.packets(video)["key"])
+        return keyframes.tolist() or [0]
+
+    def scene_cuts(self, video, threshold=10.0):
+        """
+        Return the indices of the frames starting a new scene.
+
+        The scenes are detected by the FFMPEG scdet filter in one decode of
+        the video, and kept in memory until the file changes on disk.
+
+        Parameters
+        ----------
+        video : str
+            Input video filename.
+        threshold : float, optional
+            Scene change score threshold, from 0 to 100. The default is 10.
+
+        Returns
+        -------
+        list
+            Sorted list of the frame indices of every scene cut.
+
+        """
+        key = (file_fingerprint(video), threshold)
+        memo = self.__scene_cuts.get(key[0][0])
+        if memo is not None and memo[0] == key:
+            return memo[1]
+
+        process = subprocess.Popen(
+            ["ffmpeg", "-nostdin", "-v", "error", "-i", str(video),
+             "-map", "0:v:0", "-vf",
+             f"scdet=threshold={threshold},"
+             "metadata=mode=print:key=lavfi.scd.time:file=-",
+             "-f", "null", "-"],
+            stdout=subprocess.PIPE, universal_newlines=True,
+        )
+
+        cuts = []
+        for line in process.stdout:
+            if line.startswith("frame:"):
+                cuts.append(int(line.split()[0][len("frame:"):]))
+        process.wait()
+
+        cuts = sorted(set(cuts))
+        self.__scene_cuts[key[0][0]] = (key, cuts)
+        return cuts
+
+    def count_frames(self, video):
+        """
+        Count the video frames of a file, demuxing it without decoding.
+
+        Unlike number_of_frames(), never estimated from the duration when
+        the container has no frame count, i.e, FFMPEG muxed MKV and WebM.
+
+        Parameters
+        ----------
+        video : str
+            Media filename, an input or an encoded output.
+
+        Returns
+        -------
+        int
+            Number of packets of the first video stream, see packets().
+
+        """
+        return len(self.packets(video)["size"])
+
+    def frames_at(self, video, indices, pix_fmt="rgb24"):
+        """
+        Random access decoding of a set of frames of the input video.
+
+        Each frame is decoded from its nearest preceding keyframe, only as
+        far as needed, and frames of the same GOP share a single decode.
+        Every decoded frame is kept in the byte-bounded frame_cache, so
+        repeated seeks around one spot cost almost nothing.
+
+        Parameters
+        ----------
+        video : str
+            Input video filename.
+        indices : list
+            Frame indices to fetch.
+        pix_fmt : str, optional
+            Raw pixel format to decode into. The default is "rgb24".
+
+        Raises
+        ------
+        IndexError
+            If a frame index is outside the video.
+
+        Returns
+        -------
+        list
+            List of frames as NumPy arrays, in the order of indices.
+
+        """
+        fingerprint = file_fingerprint(video)
+        frames = {}
+        missing = {}  # GOP keyframe : last missing frame in that GOP
+
+        for index in indices:
+            frame = self.__frame_cache.get((fingerprint, pix_fmt, index))
+            if frame is not None:
+                frames[index] = frame
+                continue
+
+            if not 0 <= index < self.number_of_frames(video):
+                raise IndexError(f"Frame {index} is outside {video}.")
+
+            keyframes = self.keyframes(video)
+            gop = max(bisect.bisect_right(keyframes, index) - 1, 0)
+            keyframe = keyframes[gop]
+            missing[keyframe] = max(missing.get(keyframe, index), index)
+
+        for keyframe, last in missing.items():
+            index = keyframe
+            for batch in self.iter_frames(video, pix_fmt=pix_fmt,
+                                          start=keyframe,
+                                          count=last - keyframe + 1):
+                for frame in batch:
+                    frame = frame.copy()
+                    self.__frame_cache.put(
+                        (fingerprint, pix_fmt, index), frame)
+                    frames[index] = frame
+                    index += 1
+
+        for index in indices:
+            if index not in frames:
+                raise IndexError(f"Frame {index} could not be decoded.")
+
+        return [frames[index] for index in indices]
+
+    def frame_at(self, video, index, pix_fmt="rgb24"):
+        """
+        Random access decoding of a single frame of the input video.
+
+        Parameters
+        ----------
+        video : str
+            Input video filename.
+        index : int
+            Frame index to fetch.
+        pix_fmt : str, optional
+            Raw pixel format to decode into. The default is "rgb24".
+
+        Returns
+        -------
+        numpy.ndarray
+            The decoded frame, i.e, with shape (height, width, 3) for rgb24.
+
+        """
+        return self.frames_at(video, [index], pix_fmt=pix_fmt)[0]
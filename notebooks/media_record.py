@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 10:02:47 2026
+
+@author: cgwork
+"""
+
+from fractions import Fraction
+
+
+def _fraction(value, default=None):
+    """Parse an FFprobe rational such as "30000/1001", None if invalid."""
+    try:
+        fraction = Fraction(str(value))
+    except (ValueError, ZeroDivisionError):
+        return default
+    return fraction if fraction > 0 else default
+
+
+def _float(value, default=None):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _tag_duration(tags):
+    """Parse a Matroska DURATION tag, i.e, 00:01:02.040000000, in seconds."""
+    duration = (tags or {}).get("DURATION")
+    if duration is None:
+        return None
+
+    hours, minutes, seconds = duration.replace(",", ".").split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def _bitrate(stream):
+    """Stream bitrate in bit/s, from bit_rate or the Matroska BPS tag."""
+    if stream is None:
+        return None
+
+    bitrate = _float(stream.get("bit_rate"))
+    if bitrate is None:
+        bitrate = _float((stream.get("tags") or {}).get("BPS"))
+    return bitrate
+
+
+class MediaRecord:
+    """Media stream fields derived once from a single FFprobe call."""
+
+    __slots__ = (
+        "filename",
+        "codec_name",
+        "width",
+        "height",
+        "frame_rate",
+        "time_base",
+        "duration",
+        "number_of_frames",
+        "pix_fmt",
+        "video_bitrate",
+        "audio_bitrate",
+        "has_audio",
+    )
+
+    def __init__(self, filename, probe):
+        """
+        Build the record from FFprobe -show_streams -show_format data.
+
+        Parameters
+        ----------
+        filename : str
+            Media filename the probe data belongs to.
+        probe : dict
+            FFprobe data with the "streams" and "format" sections.
+
+        Raises
+        ------
+        ValueError
+            If the media file has no video stream.
+
+        """
+        streams = probe.get("streams", [])
+        container = probe.get("format", {})
+
+        video = next(
+            (s for s in streams if s.get("codec_type") == "video"), None)
+        audio = next(
+            (s for s in streams if s.get("codec_type") == "audio"), None)
+
+        if video is None:
+            raise ValueError(f"No video stream found in {filename}.")
+
+        self.filename = filename
+        self.codec_name = video.get("codec_name")
+        self.width = int(video["width"])
+        self.height = int(video["height"])
+        self.pix_fmt = video.get("pix_fmt")
+        self.time_base = _fraction(video.get("time_base"))
+        self.frame_rate = _fraction(
+            video.get("r_frame_rate"),
+            _fraction(video.get("avg_frame_rate"), Fraction(25)),
+        )
+
+        # container duration first, it is the only one MP4/MKV both carry
+        duration = _float(container.get("duration"))
+        if duration is None:
+            duration = _float(video.get("duration"))
+        if duration is None:
+            duration = _tag_duration(video.get("tags"))
+        self.duration = duration if duration is not None else 0.0
+
+        frames = video.get("nb_frames")
+        if frames is None:
+            frames = (video.get("tags") or {}).get("NUMBER_OF_FRAMES")
+        self.number_of_frames = int(frames) if frames is not None else \
+            int(round(self.duration * self.frame_rate))
+
+        self.has_audio = audio is not None
+        self.audio_bitrate = _bitrate(audio) or 0
+
+        video_bitrate = _bitrate(video)
+        if video_bitrate is None:
+            total = _float(container.get("bit_rate"), 0)
+            video_bitrate = max(total - self.audio_bitrate, 0)
+        self.video_bitrate = video_bitrate
+
+    def __repr__(self):
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"MediaRecord({fields})"
+
+    def to_dict(self):
+        """
+        Return the record fields as a dictionary.
+
+        Returns
+        -------
+        dict
+            Dictionary with the record field names as keys.
+
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
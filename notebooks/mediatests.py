@@ -8,7 +8,11 @@ Created on Sat Feb  5 16:25:14 2022
 
 import json
 import os
+import subprocess
+import tempfile
 
+import metric_graph
+import numpy_metrics
 from container import (Codec, MediaContainer, MediaInfo, OutputBasename,
                        Parameters, QualifiedOutput, VideoQuality, load_mc,
                        save_mc)
@@ -23,6 +27,11 @@ md = Media()
 # inputdir = md.input_dir()
 md.glob_media()  # glob all files into list, seen by md.input_files()
 
+# largest per-frame difference of the NumPy engine to the FFMPEG filters,
+# by column, or metric, the mse and psnr ones only the 3 decimals rounding,
+# the SSIM chroma a Gaussian window instead of the FFMPEG 8x8 blocks
+_NUMPY_TOLERANCES = {"mse": 0.01, "psnr": 0.01, "ssim_y": 0.02, "ssim": 0.05}
+
 
 class MediaTests:
 
@@ -64,8 +73,11 @@ class MediaTests:
     # add interface to options here
     # this encodes only one codec
     # add method to iterate over codecs
-    def encode_videos(self, debug=True, progress=False):
-        self.__encoder.encode_videos(debug=debug, progress=progress)
+    def encode_videos(self, debug=True, progress=False, jobs=1,
+                      threads_per_job=None):
+        return self.__encoder.encode_videos(
+            debug=debug, progress=progress, jobs=jobs,
+            threads_per_job=threads_per_job)
 
     @property
     def options(self):
@@ -95,7 +107,8 @@ class MediaTests:
         self.__mc["outputdata"] = {
             os.path.split(outfile)[1]: {
                 vcodec: {
-                    paramset: self.__encoder.fqn(os.path.split(outfile)[1]) for
+                    paramset: self.__encoder.fqn(
+                        os.path.split(outfile)[1], vcodec) for
                     paramset, setvals in
                     self.__options.encoding_sets().items()
                 } for vcodec in self.__options.codecs()["videocodecs"]
@@ -246,6 +259,41 @@ class MediaTests:
 
         # add it to the vq instance
         self.__videoqt.io_files_list = self.__io_files_list
+        self.__videoqt.reference_resolver = self.__md.reference
+        self.__videoqt.record_resolver = self.__md.record
+
+    @staticmethod
+    def check_numpy_metrics(reference, distorted, metrics=("psnr", "ssim"),
+                            tolerances=None):
+        """
+        Compare numpy_metrics.compute to the FFMPEG filters on a file pair.
+
+        Returns a dictionary with each column as key, i.e, "ssim_u", and as
+        value a dictionary with the "max_diff" over the frames, the
+        "tolerance", see _NUMPY_TOLERANCES, and whether it "passed".
+        """
+        tolerances = tolerances or _NUMPY_TOLERANCES
+        computed = numpy_metrics.compute(reference, distorted, metrics)
+        with tempfile.TemporaryDirectory() as log_dir:
+            args, logs = metric_graph.command(
+                reference, distorted, metrics, log_dir)
+            subprocess.run(args, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.PIPE, check=True)
+            filtered = metric_graph.parse_logs(logs)
+
+        checks = {}
+        for metric in metrics:
+            frames = list(zip(computed[metric], filtered[metric]))
+            for key in computed[metric][0]:
+                if key == "n":
+                    continue
+                tolerance = tolerances.get(
+                    key, tolerances.get(key.split("_")[0]))
+                max_diff = max(abs(ours[key] - theirs[key])
+                               for ours, theirs in frames)
+                checks[key] = {"max_diff": max_diff, "tolerance": tolerance,
+                               "passed": max_diff <= tolerance}
+        return checks
 
     def run_tests(self):
         pass
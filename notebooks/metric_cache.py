@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 01:05:47 2026
+
+@author: cgwork
+"""
+
+import hashlib
+import json
+import os
+
+from codec_caps import CodecCapabilities
+from fileutils import atomic_write_json, content_fingerprint, file_fingerprint
+
+# VMAF model of libvmaf and FFMPEG Quality Metrics when none is given
+_DEFAULT_VMAF_MODEL = "vmaf_v0.6.1"
+
+# engines running the same FFMPEG metric filters, sharing their records
+_FFMPEG_ENGINES = ("ffqm", "graph")
+
+# engine : version label, FFMPEG is only asked for its version once
+_ENGINE_VERSIONS = {}
+
+
+def _ffqm_version():
+    """Version of FFMPEG Quality Metrics, its parsing and VMAF defaults."""
+    # imported here, the cache of the other engines doesn't need it
+    import ffmpeg_quality_metrics  # pylint: disable=import-outside-toplevel
+
+    return getattr(ffmpeg_quality_metrics, "__version__", "unknown")
+
+
+def engine_version(engine="ffqm"):
+    """
+    Return the version label of a metrics engine, part of the cache keys.
+
+    Parameters
+    ----------
+    engine : str, optional
+        "ffqm", FFMPEG Quality Metrics, "numpy", numpy_metrics, or "graph",
+        the batched metric_graph. The default is "ffqm".
+
+    Returns
+    -------
+    str
+        Label with the FFMPEG version computing the metrics, and for
+        FFMPEG Quality Metrics and metric_graph, which run the same filters
+        and so share their records, the FFMPEG Quality Metrics version,
+        whose parsing and VMAF defaults metric_graph follows, i.e,
+        "ffmpeg-6.1.1-ffqm-3.12.7". The others are prefixed with the engine
+        name, i.e, "numpy-ffmpeg-6.1.1".
+
+    """
+    if engine not in _ENGINE_VERSIONS:
+        # ffmpeg version 6.1.1-3ubuntu5 Copyright (c) ... : 6.1.1-3ubuntu5
+        words = (CodecCapabilities().version() or "").split()
+        label = f"ffmpeg-{words[2] if len(words) > 2 else 'unknown'}"
+        _ENGINE_VERSIONS[engine] = \
+            f"{label}-ffqm-{_ffqm_version()}" if engine in _FFMPEG_ENGINES \
+            else f"{engine}-{label}"
+    return _ENGINE_VERSIONS[engine]
+
+
+class MetricCache:
+    """Cache of metric results, keyed by the content of the files compared."""
+
+    def __init__(self, cache_dir):
+        self.__cache_dir = cache_dir
+        # file fingerprint : content fingerprint, hashed once per state
+        self.__fingerprints = {}
+
+    @property
+    def cache_dir(self):
+        """
+        Get the directory holding the metric records.
+
+        Returns
+        -------
+        str
+            Path to the metric cache directory.
+
+        """
+        return self.__cache_dir
+
+    def fingerprint(self, filename):
+        """
+        Return the content fingerprint of a file, see content_fingerprint.
+
+        Parameters
+        ----------
+        filename : str
+            Media filename.
+
+        Returns
+        -------
+        str
+            The content fingerprint, only computed again once the file size
+            or modification time changed.
+
+        """
+        key = file_fingerprint(filename)
+        if key not in self.__fingerprints:
+            self.__fingerprints[key] = content_fingerprint(filename)
+        return self.__fingerprints[key]
+
+    def metric_key(self, metric, vmaf_options=None):
+        """
+        Return the key of a metric in a record.
+
+        Parameters
+        ----------
+        metric : str
+            Metric name.
+        vmaf_options : dict, optional
+            Dictionary with key "model_path" to the VMAF model path.
+            The default is None, the default VMAF model.
+
+        Returns
+        -------
+        str
+            The metric name, or for VMAF, "vmaf|" and the model file
+            content fingerprint or its name.
+
+        """
+        if metric != "vmaf":
+            return metric
+
+        model = (vmaf_options or {}).get("model_path") or _DEFAULT_VMAF_MODEL
+        if os.path.isfile(model):
+            model = self.fingerprint(model)
+        return f"{metric}|{model}"
+
+    def path(self, reference, distorted, engine="ffqm"):
+        """
+        Return the record filename of a reference and distorted file pair.
+
+        Parameters
+        ----------
+        reference : str
+            Reference media.
+        distorted : str
+            Distorted media.
+        engine : str, optional
+            Metrics engine, see engine_version(). The default is "ffqm".
+
+        Returns
+        -------
+        str
+            Path of the JSON record, keyed by both file contents and the
+            engine version.
+
+        """
+        key = repr((
+            self.fingerprint(reference), self.fingerprint(distorted),
+            engine_version(engine))).encode("utf8")
+        digest = hashlib.sha1(key).hexdigest()[:16]
+        basename = os.path.splitext(os.path.basename(distorted))[0]
+        return os.path.join(self.__cache_dir, f"{basename}_{digest}.json")
+
+    @staticmethod
+    def __load(filename):
+        """Load a record, None if missing or unreadable."""
+        try:
+            with open(filename, "rt", encoding="utf8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, reference, distorted, metrics, vmaf_options=None,
+            engine="ffqm"):
+        """
+        Return the cached results of metrics of a file pair.
+
+        Parameters
+        ----------
+        reference : str
+            Reference media.
+        distorted : str
+            Distorted media.
+        metrics : list
+            Metrics needed.
+        vmaf_options : dict, optional
+            Dictionary with key "model_path" to the VMAF model path.
+            The default is None.
+        engine : str, optional
+            Metrics engine, see engine_version(). The default is "ffqm".
+
+        Returns
+        -------
+        tuple
+            Tuple (metrics_data, missing), the FFMPEG Metrics test data
+            dictionary of the cached metrics, and the list of the metrics
+            missing from the cache.
+
+        """
+        record = self.__load(self.path(reference, distorted, engine)) or {}
+        cached = record.get("metrics", {})
+
+        metrics_data, missing = {}, []
+        for metric in metrics:
+            key = self.metric_key(metric, vmaf_options)
+            if key in cached:
+                metrics_data[metric] = cached[key]
+            else:
+                missing.append(metric)
+        return metrics_data, missing
+
+    def put(self, reference, distorted, metrics_data, vmaf_options=None,
+            engine="ffqm"):
+        """
+        Merge the results of metrics of a file pair into its record.
+
+        Parameters
+        ----------
+        reference : str
+            Reference media.
+        distorted : str
+            Distorted media.
+        metrics_data : dict
+            The FFMPEG Metrics test data dictionary of the computed metrics.
+        vmaf_options : dict, optional
+            Dictionary with key "model_path" to the VMAF model path the
+            results were computed with. The default is None.
+        engine : str, optional
+            Metrics engine, see engine_version(). The default is "ffqm".
+
+        Returns
+        -------
+        None.
+
+        """
+        filename = self.path(reference, distorted, engine)
+        record = self.__load(filename) or {"metrics": {}}
+        record.update({
+            "reference": {
+                "path": os.path.abspath(reference),
+                "fingerprint": self.fingerprint(reference),
+            },
+            "distorted": {
+                "path": os.path.abspath(distorted),
+                "fingerprint": self.fingerprint(distorted),
+            },
+            "engine": engine_version(engine),
+        })
+        for metric, frames in metrics_data.items():
+            record["metrics"][self.metric_key(metric, vmaf_options)] = frames
+
+        atomic_write_json(record, filename)
+
+    def gc(self, dry_run=False):
+        """
+        Remove the records of files deleted or changed since.
+
+        A record is kept while both its files exist at their recorded path
+        with the recorded content, see fingerprint().
+
+        Parameters
+        ----------
+        dry_run : bool, optional
+            Only list the records that would be removed.
+            The default is False.
+
+        Returns
+        -------
+        list
+            The removed record filenames.
+
+        """
+        if not os.path.isdir(self.__cache_dir):
+            return []
+
+        removed = []
+        for name in sorted(os.listdir(self.__cache_dir)):
+            if not name.endswith(".json"):
+                continue
+
+            filename = os.path.join(self.__cache_dir, name)
+            record = self.__load(filename)
+            valid = record is not None and all(
+                role in record and os.path.isfile(record[role]["path"]) and
+                self.fingerprint(record[role]["path"]) ==
+                record[role]["fingerprint"]
+                for role in ("reference", "distorted")
+            )
+
+            if not valid:
+                removed.append(filename)
+                if dry_run is not True:
+                    os.remove(filename)
+
+        return removed
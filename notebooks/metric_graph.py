@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:05:12 2026
+
+@author: cgwork
+"""
+
+import json
+import os
+from fractions import Fraction
+
+import ffmpeg
+
+# metric : FFMPEG filter
+_METRIC_FILTERS = {
+    "ssim": "ssim",
+    "psnr": "psnr",
+    "vmaf": "libvmaf",
+    "vif": "vif",
+}
+
+
+def metrics():
+    """
+    Return the metrics the FFMPEG metric graph can compute.
+
+    Returns
+    -------
+    list
+        List of metric names, as used by FFMPEG Quality Metrics.
+
+    """
+    return list(_METRIC_FILTERS.keys())
+
+
+def _escape(path):
+    """Escape a path for a filter option value, inside the filtergraph."""
+    path = path.replace("\\", "/").replace(":", "\\\\:")
+    return path.replace("'", "\\\\\\'")
+
+
+def log_files(log_dir, metric_list, label=""):
+    """
+    Return the log filename each metric filter writes its results to.
+
+    Parameters
+    ----------
+    log_dir : str
+        Directory of the log files.
+    metric_list : list
+        Metric names, see metrics().
+    label : str, optional
+        Prefix of the log filenames, for several graphs sharing a log
+        directory. The default is "".
+
+    Returns
+    -------
+    dict
+        Dictionary with the metric name as key, the log filename as value.
+
+    """
+    return {
+        metric: os.path.join(
+            log_dir,
+            f"{label}{metric}.{'json' if metric == 'vmaf' else 'log'}")
+        for metric in metric_list
+    }
+
+
+def metric_filters(metric_list, dist, ref, logs, vmaf_options=None):
+    """
+    Build the filter chains computing metrics of two filtergraph streams.
+
+    Parameters
+    ----------
+    metric_list : list
+        Metric names, see metrics().
+    dist : str
+        Filtergraph label of the distorted stream.
+    ref : str
+        Filtergraph label of the reference stream, scaled like dist.
+    logs : dict
+        Log filename of each metric, see log_files().
+    vmaf_options : dict, optional
+        Dictionary with the optional keys "model_path" to the VMAF model
+        and "n_threads". The default is None, the libvmaf built-in model.
+
+    Raises
+    ------
+    ValueError
+        If a metric isn't supported, see metrics().
+
+    Returns
+    -------
+    list
+        List of filter chains, the metric filter outputs left unlabelled.
+
+    """
+    unknown = set(metric_list) - set(_METRIC_FILTERS)
+    if unknown:
+        raise ValueError(f"Unsupported metrics {sorted(unknown)}.")
+
+    vmaf_options = vmaf_options or {}
+    chains, count = [], len(metric_list)
+    if count > 1:
+        chains.append(f"[{dist}]split={count}" + "".join(
+            f"[{dist}_{i}]" for i in range(count)))
+        chains.append(f"[{ref}]split={count}" + "".join(
+            f"[{ref}_{i}]" for i in range(count)))
+
+    for i, metric in enumerate(metric_list):
+        pads = f"[{dist}_{i}][{ref}_{i}]" if count > 1 else \
+            f"[{dist}][{ref}]"
+        log = _escape(logs[metric])
+
+        if metric in ("ssim", "psnr"):
+            chain = f"{metric}=stats_file={log}:shortest=1:repeatlast=0"
+        elif metric == "vif":
+            chain = "vif=shortest=1:repeatlast=0," \
+                f"metadata=mode=print:file={log}"
+        else:
+            model = f"path={_escape(vmaf_options['model_path'])}" \
+                if vmaf_options.get("model_path") else "version=vmaf_v0.6.1"
+            chain = (
+                f"libvmaf=model={model}:log_fmt=json:log_path={log}"
+                f":n_threads={vmaf_options.get('n_threads', 0) or 0}"
+                ":shortest=1:repeatlast=0"
+            )
+        chains.append(f"{pads}{chain}")
+
+    return chains
+
+
+def command(reference, distorted, metric_list, log_dir,
+            vmaf_options=None, threads=None, framerate=None, size=None):
+    """
+    Build the FFMPEG command computing the metrics of a distorted file.
+
+    The graph follows FFMPEG Quality Metrics: both inputs are retimed from
+    zero, the distorted one scaled to the reference size, then split into
+    one metric filter per metric, every filter writing to its log file.
+    The size is a plain scale, scale2ref drops frames at the framesync.
+
+    Parameters
+    ----------
+    reference : str
+        Reference media.
+    distorted : str
+        Distorted media.
+    metric_list : list
+        Metric names, see metrics().
+    log_dir : str
+        Directory of the metric log files.
+    vmaf_options : dict, optional
+        VMAF options, see metric_filters(). The default is None.
+    threads : int, optional
+        FFMPEG -threads. The default is None.
+    framerate : float, optional
+        Input frame rate forced on both inputs, so the frames are paired in
+        order. The default is None, the reference frame rate.
+    size : tuple, optional
+        Reference (width, height) the distorted frames are scaled to.
+        The default is None, probing the reference size.
+
+    Returns
+    -------
+    tuple
+        Tuple (args, logs), the FFMPEG argument list and the log filename
+        of each metric, see parse_logs().
+
+    """
+    args, logs = batch_command(
+        reference, [distorted], metric_list, log_dir, vmaf_options,
+        threads, framerate, size)
+    return args, logs[0]
+
+
+def batch_command(reference, distorted, metric_list, log_dir,
+                  vmaf_options=None, threads=None, framerate=None,
+                  size=None):
+    """
+    Build the FFMPEG command computing the metrics of many distorted files.
+
+    The reference is decoded once and split between the distorted inputs,
+    each compared to its copy as in command(), so a batch of N files costs
+    one reference decode instead of N. Every reference frame is buffered
+    until all the branches consumed it, so the memory grows with N.
+
+    Parameters
+    ----------
+    reference : str
+        Reference media.
+    distorted : list
+        Distorted media filenames.
+    metric_list : list
+        Metric names, see metrics().
+    log_dir : str
+        Directory of the metric log files.
+    vmaf_options : dict, optional
+        VMAF options, see metric_filters(). The default is None.
+    threads : int, optional
+        FFMPEG -threads. The default is None.
+    framerate : float, optional
+        Input frame rate forced on every input. The default is None, the
+        reference frame rate.
+    size : tuple, optional
+        Reference (width, height) the distorted frames are scaled to.
+        The default is None, probing the reference size.
+
+    Returns
+    -------
+    tuple
+        Tuple (args, logs), the FFMPEG argument list and, in distorted
+        order, the log filename of each metric of each file, see
+        parse_logs().
+
+    """
+    if framerate is None or size is None:
+        stream = ffmpeg.probe(
+            str(reference), select_streams="v:0")["streams"][0]
+        framerate = framerate or float(Fraction(stream["r_frame_rate"]))
+        size = size or (stream["width"], stream["height"])
+
+    count = len(distorted)
+    suffixes = [str(i) for i in range(count)] if count > 1 else [""]
+
+    chains = ["[0:v]settb=AVTB,setpts=PTS-STARTPTS" + (
+        f",split={count}" + "".join(f"[ref{i}]" for i in suffixes)
+        if count > 1 else "[ref]")]
+    all_logs = []
+    for i, suffix in enumerate(suffixes):
+        ref, dist = f"ref{suffix}", f"dist{suffix}"
+        logs = log_files(
+            log_dir, metric_list, f"{suffix}_" if suffix else "")
+        chains.append(
+            f"[{i + 1}:v]settb=AVTB,setpts=PTS-STARTPTS,"
+            f"scale={size[0]}:{size[1]}:flags=bicubic[{dist}]")
+        chains += metric_filters(metric_list, dist, ref, logs, vmaf_options)
+        all_logs.append(logs)
+
+    args = ["ffmpeg", "-nostdin", "-y"]
+    if threads is not None:
+        args += ["-threads", str(threads)]
+    rate = ["-r", str(framerate)]
+    args += rate + ["-i", str(reference)]
+    for filename in distorted:
+        args += rate + ["-i", str(filename)]
+    args += ["-filter_complex", ";".join(chains), "-an", "-f", "null", "-"]
+
+    return args, all_logs
+
+
+def _fields(line):
+    return dict(field.split(":", 1) for field in line.split())
+
+
+def _parse_psnr(filename):
+    # n:1 mse_avg:529.52 mse_y:887.00 ... psnr_avg:20.89 psnr_y:18.65 ...
+    frames = []
+    with open(filename, "r", encoding="utf8") as log:
+        for line in log:
+            if line.strip():
+                frames.append({
+                    key: int(value) if key == "n" else round(float(value), 3)
+                    for key, value in _fields(line).items()
+                })
+    return frames
+
+
+def _parse_ssim(filename):
+    # n:1 Y:0.937213 U:0.961733 V:0.945788 All:0.948245 (12.860441)
+    frames = []
+    with open(filename, "r", encoding="utf8") as log:
+        for line in log:
+            line = line.split(" (")[0].strip()
+            if not line:
+                continue
+            frame = {}
+            for key, value in _fields(line).items():
+                if key == "n":
+                    frame[key] = int(value)
+                else:
+                    key = "ssim_" + key.lower().replace("all", "avg")
+                    frame[key] = round(float(value), 3)
+            frames.append(frame)
+    return frames
+
+
+def _parse_vmaf(filename):
+    with open(filename, "r", encoding="utf8") as log:
+        vmaf_log = json.load(log)
+
+    frames = []
+    for frame in vmaf_log["frames"]:
+        frames.append({**frame["metrics"], "n": int(frame["frameNum"]) + 1})
+    return frames
+
+
+def _parse_vif(filename):
+    # frame:0    pts:0       pts_time:0
+    # lavfi.vif.scale.0=0.263582
+    frames = []
+    with open(filename, "r", encoding="utf8") as log:
+        for line in log:
+            line = line.strip()
+            if line.startswith("frame:"):
+                # the metadata filter counts from 0, the others from 1
+                frames.append({"n": int(line.split()[0][6:]) + 1})
+            elif line.startswith("lavfi.vif.") and frames:
+                key, value = line[len("lavfi.vif."):].split("=")
+                frames[-1][key.replace(".", "_").lower()] = \
+                    round(float(value), 3)
+    return frames
+
+
+_PARSERS = {
+    "ssim": _parse_ssim,
+    "psnr": _parse_psnr,
+    "vmaf": _parse_vmaf,
+    "vif": _parse_vif,
+}
+
+
+def parse_logs(logs):
+    """
+    Read the metric log files into FFMPEG Quality Metrics results.
+
+    Parameters
+    ----------
+    logs : dict
+        Log filename of each metric, see command().
+
+    Returns
+    -------
+    dict
+        Dictionary with the metric name as key, and the list of per-frame
+        dictionaries as value, i.e, {"ssim": [{"n": 1, "ssim_y": ...}]},
+        the layout FFMPEG Quality Metrics calc() returns.
+
+    """
+    return {
+        metric: _PARSERS[metric](filename)
+        for metric, filename in logs.items()
+    }
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 00:31:52 2026
+
+@author: cgwork
+"""
+
+import re
+from contextlib import closing
+from fractions import Fraction
+
+import ffmpeg
+import numpy as np
+
+from frames import read_frames, split_planes
+
+# Gaussian SSIM window of Wang et al.
+_SSIM_WINDOW = 11
+_SSIM_SIGMA = 1.5
+
+_PLANES = ("y", "u", "v")
+
+# yuv420p10le : 10, formats without a bit depth are 8 bits
+_BIT_DEPTH_RE = re.compile(r"p(\d+)(?:le|be)$")
+
+# planar YUV formats the videos are compared in, see compare_format()
+_COMPARE_FORMATS = ("yuv420p", "yuv422p", "yuv444p", "yuv420p10le",
+                    "yuv422p10le", "yuv444p10le")
+
+
+def metrics():
+    """
+    Return the metrics the NumPy engine can compute.
+
+    Returns
+    -------
+    list
+        List of metric names, as used by FFMPEG Quality Metrics.
+
+    """
+    return ["psnr", "ssim"]
+
+
+def compare_format(pix_fmt):
+    """
+    Return the pixel format videos of a reference pixel format are compared in.
+
+    Parameters
+    ----------
+    pix_fmt : str
+        Reference pixel format, i.e, MediaRecord.pix_fmt.
+
+    Returns
+    -------
+    str
+        The reference pixel format if a supported planar YUV one, or yuv420p.
+
+    """
+    return pix_fmt if pix_fmt in _COMPARE_FORMATS else "yuv420p"
+
+
+def _max_value(pix_fmt):
+    """Largest sample value of a pixel format."""
+    match = _BIT_DEPTH_RE.search(pix_fmt)
+    return float((1 << int(match.group(1))) - 1) if match else 255.0
+
+
+def _gaussian_kernel(size, sigma=_SSIM_SIGMA):
+    """Normalised 1D Gaussian kernel of an odd size."""
+    taps = np.arange(size) - size // 2
+    kernel = np.exp(-(taps ** 2) / (2.0 * sigma ** 2))
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def _filter(planes, kernel):
+    """Separable valid convolution of a (n, h, w) batch over h and w."""
+    size = len(kernel)
+    height, width = planes.shape[1] - size + 1, planes.shape[2] - size + 1
+
+    rows = kernel[0] * planes[:, :, :width]
+    for i in range(1, size):
+        rows += kernel[i] * planes[:, :, i:i + width]
+
+    filtered = kernel[0] * rows[:, :height]
+    for i in range(1, size):
+        filtered += kernel[i] * rows[:, i:i + height]
+    return filtered
+
+
+def mse(reference, distorted):
+    """
+    Mean squared error of each frame of a batch of planes.
+
+    Parameters
+    ----------
+    reference : numpy.ndarray
+        Reference planes, with shape (n, height, width).
+    distorted : numpy.ndarray
+        Distorted planes, with the reference shape.
+
+    Returns
+    -------
+    numpy.ndarray
+        The n frame MSE values.
+
+    """
+    diff = reference.astype(np.int64) - distorted.astype(np.int64)
+    return np.einsum("nhw,nhw->n", diff, diff) / \
+        float(reference.shape[1] * reference.shape[2])
+
+
+def psnr(mse_values, max_value=255.0):
+    """
+    Peak signal to noise ratio of MSE values.
+
+    Parameters
+    ----------
+    mse_values : numpy.ndarray
+        MSE values, see mse().
+    max_value : float, optional
+        Largest sample value, i.e, 1023 for 10 bits. The default is 255.0.
+
+    Returns
+    -------
+    numpy.ndarray
+        PSNR in dB, inf for identical frames.
+
+    """
+    with np.errstate(divide="ignore"):
+        return 10.0 * np.log10(max_value ** 2 / np.asarray(mse_values))
+
+
+def ssim(reference, distorted, max_value=255.0):
+    """
+    Structural similarity of each frame of a batch of planes.
+
+    The local statistics are Gaussian weighted, an 11 taps window of
+    sigma 1.5, over the window positions fully inside the plane, each
+    filter being a separable convolution of the whole batch.
+
+    Parameters
+    ----------
+    reference : numpy.ndarray
+        Reference planes, with shape (n, height, width).
+    distorted : numpy.ndarray
+        Distorted planes, with the reference shape.
+    max_value : float, optional
+        Largest sample value, i.e, 1023 for 10 bits. The default is 255.0.
+
+    Returns
+    -------
+    numpy.ndarray
+        The n frame SSIM values, the mean of the SSIM map.
+
+    """
+    # odd window, down to the size of small chroma planes
+    size = min(_SSIM_WINDOW, *reference.shape[1:])
+    kernel = _gaussian_kernel(size - (size % 2 == 0))
+    c1 = (0.01 * max_value) ** 2
+    c2 = (0.03 * max_value) ** 2
+
+    x = reference.astype(np.float32)
+    y = distorted.astype(np.float32)
+    mu_x, mu_y = _filter(x, kernel), _filter(y, kernel)
+    mu_xx, mu_yy, mu_xy = mu_x * mu_x, mu_y * mu_y, mu_x * mu_y
+    sigma_xx = _filter(x * x, kernel) - mu_xx
+    sigma_yy = _filter(y * y, kernel) - mu_yy
+    sigma_xy = _filter(x * y, kernel) - mu_xy
+
+    ssim_map = ((2.0 * mu_xy + c1) * (2.0 * sigma_xy + c2)) / \
+        ((mu_xx + mu_yy + c1) * (sigma_xx + sigma_yy + c2))
+    return ssim_map.reshape((len(ssim_map), -1)).mean(axis=1, dtype=np.float64)
+
+
+def batch_metrics(reference, distorted, metric_list, max_value=255.0):
+    """
+    Compute the metrics of a batch of frames, vectorised over the batch.
+
+    Parameters
+    ----------
+    reference : list
+        Reference Y, U, V planes, arrays with shape (n, height, width), see
+        frames.split_planes.
+    distorted : list
+        Distorted Y, U, V planes, with the reference shapes.
+    metric_list : list
+        Metric names, see metrics().
+    max_value : float, optional
+        Largest sample value. The default is 255.0.
+
+    Returns
+    -------
+    dict
+        Dictionary with the FFMPEG Quality Metrics per-frame column names as
+        keys, i.e, "mse_y", "psnr_avg", "ssim_u", and arrays of n values.
+        The averages weigh the planes by their number of pixels, as the
+        FFMPEG psnr and ssim filters.
+
+    """
+    weights = np.array([plane[0].size for plane in reference], dtype=float)
+    weights /= weights.sum()
+    columns = {}
+
+    if "psnr" in metric_list:
+        plane_mse = [mse(ref, dist) for ref, dist in zip(reference, distorted)]
+        average = sum(w * value for w, value in zip(weights, plane_mse))
+        columns["mse_avg"] = average
+        for name, value in zip(_PLANES, plane_mse):
+            columns[f"mse_{name}"] = value
+        columns["psnr_avg"] = psnr(average, max_value)
+        for name, value in zip(_PLANES, plane_mse):
+            columns[f"psnr_{name}"] = psnr(value, max_value)
+
+    if "ssim" in metric_list:
+        plane_ssim = [
+            ssim(ref, dist, max_value)
+            for ref, dist in zip(reference, distorted)
+        ]
+        for name, value in zip(_PLANES, plane_ssim):
+            columns[f"ssim_{name}"] = value
+        columns["ssim_avg"] = sum(
+            w * value for w, value in zip(weights, plane_ssim))
+
+    return columns
+
+
+def iter_planes(video, pix_fmt, width, height, framerate=None, batch=8):
+    """
+    Stream the Y, U, V planes of a video in batches, scaled to a size.
+
+    Parameters
+    ----------
+    video : str
+        Media filename.
+    pix_fmt : str
+        Planar YUV pixel format decoded into, see frames.pixel_formats().
+    width : int
+        Frame width the video is scaled to.
+    height : int
+        Frame height the video is scaled to.
+    framerate : float, optional
+        Input frame rate forced on the video, so the frames of two videos
+        are paired in order. The default is None.
+    batch : int, optional
+        Number of frames in each batch. The default is 8.
+
+    Raises
+    ------
+    ffmpeg.Error
+        If FFMPEG fails to decode the video, with its error output.
+
+    Yields
+    ------
+    list
+        Y, U, V planes of up to batch frames, see frames.split_planes,
+        views of a buffer overwritten by the next batch.
+
+    """
+    input_options = {"r": framerate} if framerate is not None else {}
+    stream = (
+        ffmpeg
+        .input(str(video), **input_options)
+        .video
+        .filter("scale", width, height, flags="bicubic")
+        .output("pipe:", format="rawvideo", pix_fmt=pix_fmt,
+                loglevel="error")
+    )
+    # closed with this generator, killing the decoder
+    with closing(read_frames(stream, pix_fmt, width, height, batch)) as \
+            batches:
+        for frames in batches:
+            yield split_planes(frames, pix_fmt, width, height)
+
+
+def compute(reference, distorted, metric_list=None, pix_fmt=None, batch=8,
+            framerate=None, size=None):
+    """
+    Compute the metrics of a distorted video in process, with NumPy.
+
+    Both videos are decoded through FFMPEG pipes, the distorted one scaled
+    to the reference size as in metric_graph.command, and compared batch
+    by batch until the shorter one ends, so the memory is a few batches of
+    frames whatever the video length.
+
+    Parameters
+    ----------
+    reference : str
+        Reference media.
+    distorted : str
+        Distorted media.
+    metric_list : list, optional
+        Metric names, see metrics(). The default is None, every metric.
+    pix_fmt : str, optional
+        Planar YUV pixel format both videos are compared in. The default is
+        None, the reference pixel format, see compare_format().
+    batch : int, optional
+        Number of frames compared at once. The default is 8.
+    framerate : float, optional
+        Input frame rate forced on both videos, so the frames are paired in
+        order. The default is None, the reference frame rate.
+    size : tuple, optional
+        Reference (width, height) both videos are scaled to.
+        The default is None, probing the reference size.
+
+    Raises
+    ------
+    ValueError
+        If a metric isn't supported, see metrics().
+
+    Returns
+    -------
+    dict
+        Dictionary with the metric name as key, and the list of per-frame
+        dictionaries as value, the layout FFMPEG Quality Metrics calc()
+        returns, with its rounding to 3 decimals.
+
+    """
+    metric_list = metrics() if metric_list is None else list(metric_list)
+    unknown = set(metric_list) - set(metrics())
+    if unknown:
+        raise ValueError(f"Unsupported metrics {sorted(unknown)}.")
+
+    if framerate is None or size is None or pix_fmt is None:
+        stream = ffmpeg.probe(
+            str(reference), select_streams="v:0")["streams"][0]
+        framerate = framerate or float(Fraction(stream["r_frame_rate"]))
+        size = size or (stream["width"], stream["height"])
+        pix_fmt = pix_fmt or compare_format(stream.get("pix_fmt"))
+    width, height = size
+    max_value = _max_value(pix_fmt)
+
+    columns = {metric: {} for metric in metric_list}
+    references = iter_planes(
+        reference, pix_fmt, width, height, framerate, batch)
+    distortions = iter_planes(
+        distorted, pix_fmt, width, height, framerate, batch)
+    try:
+        for ref, dist in zip(references, distortions):
+            count = min(len(ref[0]), len(dist[0]))
+            values = batch_metrics(
+                [plane[:count] for plane in ref],
+                [plane[:count] for plane in dist],
+                metric_list, max_value)
+            for key, value in values.items():
+                metric = "psnr" if key.startswith("mse") else \
+                    key.split("_")[0]
+                columns[metric].setdefault(key, []).append(value)
+            if count < batch:
+                break
+    finally:
+        # kill the decoder of the longer video
+        references.close()
+        distortions.close()
+
+    metrics_data = {}
+    for metric, metric_columns in columns.items():
+        arrays = {
+            key: np.round(np.concatenate(value), 3)
+            for key, value in metric_columns.items()
+        }
+        count = len(next(iter(arrays.values()))) if arrays else 0
+        metrics_data[metric] = [
+            {"n": i + 1, **{key: float(value[i])
+                            for key, value in arrays.items()}}
+            for i in range(count)
+        ]
+
+    return metrics_data
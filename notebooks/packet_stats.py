@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 22:06:33 2026
+
+@author: cgwork
+"""
+
+import hashlib
+import os
+import subprocess
+import threading
+
+import numpy as np
+
+from fileutils import file_fingerprint
+
+# packets parsed into preallocated arrays of this many rows at a time
+_CHUNK = 65536
+
+
+def read_packets(video):
+    """
+    Stream the video packets of a file from FFprobe into NumPy arrays.
+
+    The compact CSV output is parsed line by line into fixed size chunks,
+    so the memory is the arrays themselves, a few bytes per packet, and
+    never the FFprobe text output of the whole file.
+
+    Parameters
+    ----------
+    video : str
+        Media filename.
+
+    Raises
+    ------
+    RuntimeError
+        If FFprobe fails to read the file.
+
+    Returns
+    -------
+    dict
+        Dictionary with the "pts_time" in seconds, the "size" in bytes and
+        the "key" keyframe flag arrays, one row per video packet, in
+        presentation order.
+
+    """
+    # ffprobe writes the fields in its own order, the one requested here
+    process = subprocess.Popen(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "packet=pts_time,dts_time,size,flags",
+         "-of", "csv=p=0", str(video)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    # drain stderr while reading the packets, so neither pipe fills up
+    stderr = []
+    reader = threading.Thread(
+        target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    reader.start()
+
+    chunks = []
+    times = np.empty(_CHUNK, dtype=np.float64)
+    sizes = np.empty(_CHUNK, dtype=np.int64)
+    keys = np.empty(_CHUNK, dtype=bool)
+    count = 0
+
+    for line in process.stdout:
+        fields = line.strip().split(",")
+        if len(fields) < 4:
+            continue
+        try:
+            # no pts on some packets of raw streams, their dts then
+            times[count] = float(
+                fields[0] if fields[0] not in ("", "N/A") else fields[1])
+            sizes[count] = int(fields[2])
+        except ValueError:
+            continue
+        keys[count] = "K" in fields[3]
+        count += 1
+
+        if count == _CHUNK:
+            chunks.append((times, sizes, keys))
+            times = np.empty(_CHUNK, dtype=np.float64)
+            sizes = np.empty(_CHUNK, dtype=np.int64)
+            keys = np.empty(_CHUNK, dtype=bool)
+            count = 0
+
+    process.wait()
+    reader.join()
+    process.stdout.close()
+    process.stderr.close()
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"FFprobe failed on {video}: {''.join(stderr).strip()}")
+
+    chunks.append((times[:count], sizes[:count], keys[:count]))
+    times, sizes, keys = (
+        np.concatenate([chunk[i] for chunk in chunks]) for i in range(3))
+
+    order = np.argsort(times, kind="stable")
+    return {
+        "pts_time": times[order],
+        "size": sizes[order],
+        "key": keys[order],
+    }
+
+
+def bitrate_curve(pts_time, size, interval=1.0):
+    """
+    Return the bitrate of each interval of a packet stream.
+
+    Parameters
+    ----------
+    pts_time : numpy.ndarray
+        Packet presentation times in seconds, see read_packets().
+    size : numpy.ndarray
+        Packet sizes in bytes.
+    interval : float, optional
+        Interval length in seconds. The default is 1.0.
+
+    Returns
+    -------
+    numpy.ndarray
+        Bitrate in bit/s of each interval from the first packet.
+
+    """
+    if len(pts_time) == 0:
+        return np.zeros(0)
+
+    bins = ((pts_time - pts_time.min()) // interval).astype(np.int64)
+    return np.bincount(bins, weights=size * 8) / interval
+
+
+def gop_lengths(key):
+    """
+    Return the length in frames of each GOP of a packet stream.
+
+    Parameters
+    ----------
+    key : numpy.ndarray
+        Keyframe flags in presentation order, see read_packets().
+
+    Returns
+    -------
+    numpy.ndarray
+        Number of frames from each keyframe to the next, or to the end of
+        the stream. The frames before the first keyframe are left out.
+
+    """
+    starts = np.flatnonzero(key)
+    return np.diff(np.append(starts, len(key)))
+
+
+def peak_bitrate(pts_time, size, window=1.0):
+    """
+    Return the highest bitrate over a sliding window of a packet stream.
+
+    Parameters
+    ----------
+    pts_time : numpy.ndarray
+        Packet presentation times in seconds, sorted, see read_packets().
+    size : numpy.ndarray
+        Packet sizes in bytes.
+    window : float, optional
+        Window length in seconds. The default is 1.0.
+
+    Returns
+    -------
+    tuple
+        Tuple (bitrate, start), the peak bitrate in bit/s and the start
+        time of its window in seconds, (0.0, 0.0) for an empty stream.
+
+    """
+    if len(pts_time) == 0:
+        return 0.0, 0.0
+
+    # bits of the packets in [pts, pts + window) of every packet
+    total = np.concatenate(([0], np.cumsum(size * 8)))
+    ends = np.searchsorted(pts_time, pts_time + window, side="left")
+    bits = total[ends] - total[:-1]
+    peak = int(np.argmax(bits))
+    return float(bits[peak] / window), float(pts_time[peak])
+
+
+class PacketStatsCache:
+    """Cache of the packet arrays of media files, as compressed .npz."""
+
+    def __init__(self, cache_dir):
+        self.__cache_dir = cache_dir
+
+    @property
+    def cache_dir(self):
+        """
+        Get the directory holding the packet arrays.
+
+        Returns
+        -------
+        str
+            Path to the packet cache directory.
+
+        """
+        return self.__cache_dir
+
+    def path(self, video):
+        """
+        Return the cache filename of the packet arrays of a media file.
+
+        Parameters
+        ----------
+        video : str
+            Media filename.
+
+        Returns
+        -------
+        str
+            Path of the .npz file, keyed by the media path, size and mtime.
+
+        """
+        key = repr(file_fingerprint(video)).encode("utf8")
+        digest = hashlib.sha1(key).hexdigest()[:16]
+        basename = os.path.splitext(os.path.basename(video))[0]
+        return os.path.join(self.__cache_dir, f"{basename}_{digest}.npz")
+
+    def get(self, video):
+        """
+        Return the packet arrays of a media file, read once and cached.
+
+        Parameters
+        ----------
+        video : str
+            Media filename.
+
+        Returns
+        -------
+        dict
+            The packet arrays, see read_packets().
+
+        """
+        filename = self.path(video)
+        if os.path.isfile(filename):
+            with np.load(filename) as npz:
+                return {key: npz[key] for key in npz.files}
+
+        packets = read_packets(video)
+        os.makedirs(self.__cache_dir, exist_ok=True)
+        # np.savez appends .npz to names without it
+        tmp = f"{filename[:-len('.npz')]}.{os.getpid()}.tmp.npz"
+        try:
+            np.savez_compressed(tmp, **packets)
+            os.replace(tmp, filename)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return packets
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 17:02:44 2026
+
+@author: cgwork
+"""
+
+import hashlib
+import os
+import threading
+
+from fileutils import file_fingerprint, options_digest
+
+# Options only driving the rate control, or the muxing, of a second pass.
+# The first pass analysis (motion search, lookahead, mbtree/cutree) doesn't
+# depend on them, so its statistics are shared by all their values.
+_RATE_OPTIONS = {
+    "b:v", "minrate", "maxrate", "bufsize", "crf", "qp", "pass",
+    "passlogfile", "threads", "f", "format", "movflags", "loglevel",
+    "c:a", "acodec", "codec:a", "b:a", "an",
+}
+
+
+class PassLogCache:
+    """Cache of first pass statistics, shared by the second pass encodes."""
+
+    def __init__(self, cache_dir):
+        self.__cache_dir = cache_dir
+        self.__lock = threading.Lock()
+        # one first pass per statistics file even with concurrent callers
+        self.__pending = {}
+
+    @property
+    def cache_dir(self):
+        """
+        Get the directory holding the first pass statistics.
+
+        Returns
+        -------
+        str
+            Path to the pass log cache directory.
+
+        """
+        return self.__cache_dir
+
+    @staticmethod
+    def analysis_options(options):
+        """
+        Return the options affecting the first pass analysis.
+
+        Parameters
+        ----------
+        options : dict
+            FFMPEG options in key:pair form.
+
+        Returns
+        -------
+        dict
+            The options without the rate control and muxing ones.
+
+        """
+        return {
+            key: value for key, value in options.items()
+            if key not in _RATE_OPTIONS
+        }
+
+    def prefix(self, video, options):
+        """
+        Return the pass log file prefix of a source and encoding options.
+
+        Parameters
+        ----------
+        video : str
+            Source media filename.
+        options : dict
+            FFMPEG options in key:pair form, with the "c:v" video codec.
+
+        Returns
+        -------
+        str
+            FFMPEG -passlogfile prefix, keyed by the source path, size and
+            mtime, and the analysis options, see analysis_options().
+
+        """
+        key = repr((
+            file_fingerprint(video),
+            options_digest(self.analysis_options(options)),
+        )).encode("utf8")
+        digest = hashlib.sha1(key).hexdigest()[:16]
+        basename = os.path.splitext(os.path.basename(video))[0]
+        return os.path.join(self.__cache_dir, f"{basename}_{digest}")
+
+    @staticmethod
+    def stats_file(prefix):
+        """
+        Return the first pass statistics filename of a pass log prefix.
+
+        Parameters
+        ----------
+        prefix : str
+            Pass log file prefix.
+
+        Returns
+        -------
+        str
+            The FFMPEG statistics file of the first video stream.
+
+        """
+        return f"{prefix}-0.log"
+
+    def get(self, video, options, first_pass):
+        """
+        Return the pass log prefix of a source, running the first pass once.
+
+        Parameters
+        ----------
+        video : str
+            Source media filename.
+        options : dict
+            FFMPEG options in key:pair form, with the "c:v" video codec.
+        first_pass : callable
+            Function running the first pass, called with the pass log
+            prefix to write the statistics to.
+
+        Returns
+        -------
+        str
+            Pass log prefix holding complete first pass statistics.
+
+        """
+        prefix = self.prefix(video, options)
+        stats = self.stats_file(prefix)
+
+        with self.__lock:
+            event = self.__pending.get(prefix)
+            owner = event is None and not os.path.isfile(stats)
+            if owner:
+                event = self.__pending[prefix] = threading.Event()
+
+        if not owner:
+            if event is not None:
+                event.wait()
+            if not os.path.isfile(stats):
+                raise RuntimeError(f"First pass of {video} failed.")
+            return prefix
+
+        try:
+            os.makedirs(self.__cache_dir, exist_ok=True)
+            tmp_prefix = f"{prefix}.part"
+            first_pass(tmp_prefix)
+
+            # the encoders add their own files, i.e, .mbtree or .cutree,
+            # the statistics file itself is renamed last, marking completion
+            tmp_stats = self.stats_file(tmp_prefix)
+            dirname, basename = os.path.split(tmp_stats)
+            for name in os.listdir(dirname):
+                if name.startswith(basename) and name != basename:
+                    os.replace(os.path.join(dirname, name),
+                               stats + name[len(basename):])
+            os.replace(tmp_stats, stats)
+        finally:
+            with self.__lock:
+                self.__pending.pop(prefix).set()
+
+        return prefix
+
+    def clear(self):
+        """
+        Remove every cached first pass statistics file.
+
+        Returns
+        -------
+        None.
+
+        """
+        if not os.path.isdir(self.__cache_dir):
+            return
+
+        with os.scandir(self.__cache_dir) as scan:
+            for entry in scan:
+                if ".log" in entry.name and entry.is_file():
+                    os.remove(entry.path)
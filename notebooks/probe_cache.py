@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 09:20:04 2026
+
+@author: cgwork
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+import ffmpeg
+
+from fileutils import file_fingerprint
+
+
+class ProbeCache:
+    """Persistent FFprobe cache keyed by path, size and modification time."""
+
+    def __init__(self, filename=None, prober=None):
+        # in-process memo, abspath : (fingerprint, probe data)
+        self.__memo = {}
+        self.__lock = threading.RLock()
+        self.__prober = prober if prober is not None else ffmpeg.probe
+        self.__filename = filename
+        self.__db = None
+
+        if filename is not None:
+            dirname = os.path.dirname(os.path.abspath(filename))
+            os.makedirs(dirname, exist_ok=True)
+            self.__db = sqlite3.connect(filename, check_same_thread=False)
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS probe ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+                "data TEXT)"
+            )
+            self.__db.commit()
+
+    @property
+    def filename(self):
+        """
+        Get the SQLite database filename backing the cache.
+
+        Returns
+        -------
+        str
+            Path to the SQLite database, None for an in-memory only cache.
+
+        """
+        return self.__filename
+
+    def __load(self, key):
+        if self.__db is None:
+            return None
+
+        row = self.__db.execute(
+            "SELECT data FROM probe WHERE path = ? AND size = ? AND "
+            "mtime_ns = ?", key
+        ).fetchone()
+
+        return json.loads(row[0]) if row is not None else None
+
+    def __store(self, key, data):
+        if self.__db is None:
+            return
+
+        self.__db.execute(
+            "INSERT OR REPLACE INTO probe (path, size, mtime_ns, data) "
+            "VALUES (?, ?, ?, ?)", (*key, json.dumps(data))
+        )
+        self.__db.commit()
+
+    def probe(self, video):
+        """
+        Return the full FFprobe data of a media file, probing only on a miss.
+
+        Parameters
+        ----------
+        video : str
+            Path and filename to query information from.
+
+        Returns
+        -------
+        dict
+            Dictionary with the "streams" and "format" FFprobe sections.
+
+        """
+        key = file_fingerprint(video)
+
+        with self.__lock:
+            memo = self.__memo.get(key[0])
+            if memo is not None and memo[0] == key:
+                return memo[1]
+
+            data = self.__load(key)
+            if data is not None:
+                self.__memo[key[0]] = (key, data)
+                return data
+
+        # probe outside the lock so concurrent callers don't serialize
+        data = self.__prober(video)
+
+        with self.__lock:
+            self.__memo[key[0]] = (key, data)
+            self.__store(key, data)
+
+        return data
+
+    def invalidate(self, video=None):
+        """
+        Drop cached probe data for a media file, or for every file.
+
+        Parameters
+        ----------
+        video : str, optional
+            Media file to invalidate. The default is None, clearing all.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.__lock:
+            if video is None:
+                self.__memo.clear()
+                if self.__db is not None:
+                    self.__db.execute("DELETE FROM probe")
+                    self.__db.commit()
+                return
+
+            path = os.path.abspath(video)
+            self.__memo.pop(path, None)
+            if self.__db is not None:
+                self.__db.execute("DELETE FROM probe WHERE path = ?", (path,))
+                self.__db.commit()
+
+    def purge(self):
+        """
+        Remove the cached entries of media files that no longer exist.
+
+        Returns
+        -------
+        int
+            Number of purged entries.
+
+        """
+        with self.__lock:
+            paths = set(self.__memo.keys())
+            if self.__db is not None:
+                paths.update(
+                    row[0] for row in
+                    self.__db.execute("SELECT path FROM probe").fetchall()
+                )
+
+            stale = [path for path in paths if not os.path.isfile(path)]
+            for path in stale:
+                self.invalidate(path)
+
+            return len(stale)
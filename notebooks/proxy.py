@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 22:41:09 2026
+
+@author: cgwork
+"""
+
+import hashlib
+import os
+import random
+import threading
+
+import ffmpeg
+import numpy as np
+import pandas as pd
+
+from fileutils import file_fingerprint
+
+
+class ProxyClips:
+    """Cache of short lossless clips sampling the scenes of the sources."""
+
+    def __init__(self, media, cache_dir):
+        self.__media = media  # md.Media
+        self.__cache_dir = cache_dir
+        self.__lock = threading.Lock()
+        # one cut per proxy even with concurrent callers
+        self.__pending = {}
+
+    @property
+    def cache_dir(self):
+        """
+        Get the directory holding the proxy clips.
+
+        Returns
+        -------
+        str
+            Path to the proxy cache directory.
+
+        """
+        return self.__cache_dir
+
+    def segments(self, video, segments=6, seconds=2.0, scene_cut=True):
+        """
+        Pick the segments of a source making up its proxy clip.
+
+        With scene_cut, the segments start on scene cuts spread over the
+        whole source, see Media.scene_cuts, the timeline filling in when
+        there are fewer scenes than segments. Otherwise the segments are
+        evenly spread over the timeline.
+
+        Parameters
+        ----------
+        video : str
+            Source media filename.
+        segments : int, optional
+            Number of segments. The default is 6.
+        seconds : float, optional
+            Length of each segment in seconds. The default is 2.0.
+        scene_cut : bool, optional
+            Start the segments on scene cuts. The default is True.
+
+        Returns
+        -------
+        list
+            Sorted list of non overlapping (start, frames) segments, the
+            first frame index and number of frames, or None when the
+            source is too short for a proxy to be any cheaper.
+
+        """
+        total = self.__media.number_of_frames(video)
+        frame_rate = self.__media.record(video).frame_rate
+        length = max(1, int(round(seconds * frame_rate)))
+        if total <= segments * length:
+            return None
+
+        last = total - length
+        timeline = [
+            int(start) for start in np.linspace(0, last, segments).round()
+        ]
+        if scene_cut is True:
+            scenes = [0] + [c for c in self.__media.scene_cuts(video)
+                            if 0 < c <= last]
+            picks = np.linspace(0, len(scenes) - 1, segments).round()
+            starts = sorted({scenes[int(i)] for i in picks})
+            # fill in with the timeline points furthest from the scenes
+            for start in sorted(
+                    timeline,
+                    key=lambda s: -min(abs(s - c) for c in starts)):
+                if len(starts) >= segments:
+                    break
+                if start not in starts:
+                    starts.append(start)
+            starts.sort()
+        else:
+            starts = timeline
+
+        spans = []
+        for start in starts:
+            if spans and start < spans[-1][0] + spans[-1][1]:
+                start = spans[-1][0] + spans[-1][1]
+            frames = min(length, total - start)
+            if frames > 0:
+                spans.append((start, frames))
+        return spans
+
+    def path(self, video, spans):
+        """
+        Return the cache filename of a proxy clip.
+
+        Parameters
+        ----------
+        video : str
+            Source media filename.
+        spans : list
+            Proxy segments, see segments().
+
+        Returns
+        -------
+        str
+            Path of the .mkv proxy, keyed by the source path, size and
+            mtime, and the segments.
+
+        """
+        key = repr((file_fingerprint(video), spans)).encode("utf8")
+        digest = hashlib.sha1(key).hexdigest()[:16]
+        basename = os.path.splitext(os.path.basename(video))[0]
+        return os.path.join(self.__cache_dir, f"{basename}_{digest}.mkv")
+
+    def __cut(self, video, spans, filename):
+        """Cut the segments losslessly into a single FFV1 clip."""
+        frame_rate = self.__media.record(video).frame_rate
+        streams = [
+            # seek half a frame early, the accurate seek then starts on the
+            # first frame of the segment
+            ffmpeg.input(
+                str(video), ss=float(max(0, start - 0.5) / frame_rate))
+            .video
+            .trim(end_frame=frames)
+            .setpts("PTS-STARTPTS")
+            for start, frames in spans
+        ]
+        (
+            ffmpeg
+            .concat(*streams, v=1, a=0)
+            .output(filename, vcodec="ffv1", level=3, format="matroska",
+                    loglevel="error")
+            .run(overwrite_output=True, capture_stderr=True)
+        )
+
+    def get(self, video, segments=6, seconds=2.0, scene_cut=True):
+        """
+        Return the proxy clip of a source, cutting it on the first call.
+
+        Parameters
+        ----------
+        video : str
+            Source media filename.
+        segments : int, optional
+            Number of segments. The default is 6.
+        seconds : float, optional
+            Length of each segment in seconds. The default is 2.0.
+        scene_cut : bool, optional
+            Start the segments on scene cuts, see segments().
+            The default is True.
+
+        Returns
+        -------
+        str
+            Path to the lossless proxy clip, without audio, or the source
+            filename itself when it's too short for a proxy.
+
+        """
+        spans = self.segments(video, segments, seconds, scene_cut)
+        if spans is None:
+            return video
+
+        filename = self.path(video, spans)
+
+        with self.__lock:
+            event = self.__pending.get(filename)
+            owner = event is None and not os.path.isfile(filename)
+            if owner:
+                event = self.__pending[filename] = threading.Event()
+
+        if not owner:
+            if event is not None:
+                event.wait()
+            if not os.path.isfile(filename):
+                raise RuntimeError(f"Proxy of {video} failed.")
+            return filename
+
+        try:
+            os.makedirs(self.__cache_dir, exist_ok=True)
+            tmp = f"{filename}.{os.getpid()}.part"
+            try:
+                self.__cut(video, spans, tmp)
+                os.replace(tmp, filename)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        finally:
+            with self.__lock:
+                self.__pending.pop(filename).set()
+
+        return filename
+
+
+def sample_jobs(job_list, count, seed=0):
+    """
+    Sample the jobs of a random subset of the parameter sets.
+
+    Parameters
+    ----------
+    job_list : list
+        Encode jobs, see Encoder.jobs.
+    count : int
+        Number of parameter sets to keep.
+    seed : int, optional
+        Random seed, the same seed samples the same parameter sets.
+        The default is 0.
+
+    Returns
+    -------
+    list
+        The jobs of every input with one of the sampled parameter sets.
+
+    """
+    parameter_sets = []
+    for job in job_list:
+        if job["parameters"] not in parameter_sets:
+            parameter_sets.append(job["parameters"])
+
+    sampled = random.Random(seed).sample(
+        parameter_sets, min(count, len(parameter_sets)))
+    return [job for job in job_list if job["parameters"] in sampled]
+
+
+def job_io_files(job_list):
+    """
+    Map the inputs of encode jobs to their outputs.
+
+    Parameters
+    ----------
+    job_list : list
+        Encode jobs, see Encoder.jobs.
+
+    Returns
+    -------
+    dict
+        Dictionary where the key is the input media filename, and the value
+        the list of its output filenames, see
+        VideoQualityTests.io_files_list.
+
+    """
+    io_files = {}
+    for job in job_list:
+        io_files.setdefault(job["input"], []).append(job["output"])
+    return io_files
+
+
+def rank_correlation(full, proxy, top=5):
+    """
+    Report how well the proxy rankings match the full-length rankings.
+
+    The encodes are matched by output filename, the proxy outputs having
+    the name of their full-length counterpart, see Encoder.proxy_jobs.
+
+    Parameters
+    ----------
+    full : pandas.DataFrame
+        Full-length encodes, see VideoQualityTests.tradeoffs.
+    proxy : pandas.DataFrame
+        Proxy encodes of the same parameter sets, see
+        VideoQualityTests.tradeoffs.
+    top : int, optional
+        Size of the best scoring set compared. The default is 5.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per full-length original, with the number of matched
+        "encodes", the Spearman rank correlation of the "score", "size"
+        and "cpu_time" columns, and "top_overlap", the fraction of the top
+        full-length scores also in the top proxy scores.
+
+    """
+    def by_name(df):
+        df = df.copy()
+        df.index = [os.path.basename(name) for name in df.index]
+        return df
+
+    full, proxy = by_name(full), by_name(proxy)
+    names = full.index.intersection(proxy.index)
+
+    def spearman(column, index):
+        if column not in full or column not in proxy or len(index) < 2:
+            return np.nan
+        # pandas' own spearman goes through scipy
+        return full.loc[index, column].rank().corr(
+            proxy.loc[index, column].rank())
+
+    rows = []
+    for original, group in full.loc[names].groupby("original"):
+        index = group.index
+        best = set(full.loc[index, "score"].nlargest(top).index)
+        proxy_best = set(proxy.loc[index, "score"].nlargest(top).index)
+        rows.append({
+            "original": original,
+            "encodes": len(index),
+            "score": spearman("score", index),
+            "size": spearman("size", index),
+            "cpu_time": spearman("cpu_time", index),
+            "top_overlap": len(best & proxy_best) / len(best)
+            if best else np.nan,
+        })
+
+    return pd.DataFrame(rows).set_index("original") \
+        if rows else pd.DataFrame()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 12:40:18 2026
+
+@author: cgwork
+"""
+
+import hashlib
+import os
+import threading
+from fractions import Fraction
+
+import ffmpeg
+import numpy as np
+
+from fileutils import file_fingerprint
+from frames import frame_geometry
+
+# YUV4MPEG2 colorspace tag : FFMPEG pixel format
+_Y4M_COLORSPACES = {
+    "420jpeg": "yuv420p",
+    "420mpeg2": "yuv420p",
+    "420paldv": "yuv420p",
+    "420": "yuv420p",
+    "422": "yuv422p",
+    "444": "yuv444p",
+    "mono": "gray",
+    "420p10": "yuv420p10le",
+    "422p10": "yuv422p10le",
+    "444p10": "yuv444p10le",
+    "mono16": "gray16le",
+}
+_Y4M_FRAME_HEADER = b"FRAME\n"
+
+
+def y4m_header(filename):
+    """
+    Parse the stream header of a YUV4MPEG2 file.
+
+    Parameters
+    ----------
+    filename : Union[str, os.PathLike]
+        Path to the .y4m file.
+
+    Raises
+    ------
+    ValueError
+        If the file isn't a YUV4MPEG2 stream of a supported colorspace.
+
+    Returns
+    -------
+    dict
+        Dictionary with the "width", "height", "frame_rate" (Fraction),
+        "pix_fmt", "header_size" and "frame_size" in bytes, including the
+        per-frame FRAME marker, and the "number_of_frames".
+
+    """
+    with open(filename, "rb") as y4m:
+        line = y4m.readline(4096)
+
+    if not line.startswith(b"YUV4MPEG2 ") or not line.endswith(b"\n"):
+        raise ValueError(f"{filename} is not a YUV4MPEG2 stream.")
+
+    header = {"pix_fmt": "yuv420p", "header_size": len(line)}
+    for token in line.decode("ascii").split()[1:]:
+        tag, value = token[0], token[1:]
+        if tag == "W":
+            header["width"] = int(value)
+        elif tag == "H":
+            header["height"] = int(value)
+        elif tag == "F":
+            header["frame_rate"] = Fraction(*map(int, value.split(":")))
+        elif tag == "C":
+            if value not in _Y4M_COLORSPACES:
+                raise ValueError(f"Unsupported Y4M colorspace {value}.")
+            header["pix_fmt"] = _Y4M_COLORSPACES[value]
+
+    _, _, nbytes = frame_geometry(
+        header["pix_fmt"], header["width"], header["height"])
+    header["frame_size"] = len(_Y4M_FRAME_HEADER) + nbytes
+    header["number_of_frames"] = (
+        os.path.getsize(filename) - header["header_size"]
+    ) // header["frame_size"]
+
+    return header
+
+
+class ReferenceCache:
+    """Size-bounded cache of sources decoded once to raw YUV4MPEG2 files."""
+
+    def __init__(self, cache_dir, max_bytes=100 * 1024 ** 3):
+        self.__cache_dir = cache_dir
+        self.__max_bytes = max_bytes
+        self.__lock = threading.Lock()
+        # one decode per reference even with concurrent callers
+        self.__pending = {}
+
+    @property
+    def cache_dir(self):
+        """
+        Get the directory holding the raw reference files.
+
+        Returns
+        -------
+        str
+            Path to the reference cache directory.
+
+        """
+        return self.__cache_dir
+
+    @property
+    def max_bytes(self):
+        """
+        Get the size budget of the reference cache directory.
+
+        Returns
+        -------
+        int
+            Maximum size of the cached references in bytes.
+
+        """
+        return self.__max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes):
+        self.__max_bytes = max_bytes
+        self.evict()
+
+    @staticmethod
+    def pixel_formats():
+        """
+        Return the pixel formats a raw reference can be stored in.
+
+        Returns
+        -------
+        list
+            List of FFMPEG pixel format names supported by YUV4MPEG2.
+
+        """
+        return sorted(set(_Y4M_COLORSPACES.values()))
+
+    def path(self, video, pix_fmt):
+        """
+        Return the cache filename of a source decoded to a pixel format.
+
+        Parameters
+        ----------
+        video : str
+            Source media filename.
+        pix_fmt : str
+            Pixel format of the raw reference.
+
+        Returns
+        -------
+        str
+            Path of the .y4m file, keyed by the source path, size and mtime.
+
+        """
+        key = repr((file_fingerprint(video), pix_fmt)).encode("utf8")
+        digest = hashlib.sha1(key).hexdigest()[:16]
+        basename = os.path.splitext(os.path.basename(video))[0]
+        return os.path.join(self.__cache_dir, f"{basename}_{digest}.y4m")
+
+    def get(self, video, pix_fmt, expected_bytes=None):
+        """
+        Return the raw reference of a source, decoding it on the first call.
+
+        Parameters
+        ----------
+        video : str
+            Source media filename.
+        pix_fmt : str
+            Pixel format of the raw reference, see pixel_formats().
+        expected_bytes : int, optional
+            Expected size of the raw reference. When it exceeds the cache
+            budget the source isn't decoded. The default is None.
+
+        Returns
+        -------
+        str
+            Path of the .y4m reference, or None if it can't be cached.
+
+        """
+        if pix_fmt not in self.pixel_formats() or (
+                expected_bytes is not None and
+                expected_bytes > self.__max_bytes):
+            return None
+
+        filename = self.path(video, pix_fmt)
+
+        with self.__lock:
+            event = self.__pending.get(filename)
+            owner = event is None and not os.path.isfile(filename)
+            if owner:
+                event = self.__pending[filename] = threading.Event()
+
+        if not owner:
+            if event is not None:
+                event.wait()
+            if os.path.isfile(filename):
+                os.utime(filename)  # LRU order by modification time
+                return filename
+            return None
+
+        try:
+            os.makedirs(self.__cache_dir, exist_ok=True)
+            if expected_bytes is not None:
+                self.evict(reserve=expected_bytes)
+
+            tmpfile = f"{filename}.{os.getpid()}.part"
+            try:
+                (
+                    ffmpeg
+                    .input(str(video))
+                    .output(tmpfile, format="yuv4mpegpipe", pix_fmt=pix_fmt,
+                            strict=-1, loglevel="error", an=None)
+                    .overwrite_output()
+                    .run()
+                )
+                os.replace(tmpfile, filename)
+            finally:
+                # a failed decode leaves a partial reference out of evict()
+                if os.path.exists(tmpfile):
+                    os.remove(tmpfile)
+        finally:
+            with self.__lock:
+                self.__pending.pop(filename).set()
+
+        self.evict()
+        return filename if os.path.isfile(filename) else None
+
+    def evict(self, reserve=0):
+        """
+        Remove the least recently used references over the size budget.
+
+        Parameters
+        ----------
+        reserve : int, optional
+            Extra space to free for a reference about to be written.
+            The default is 0.
+
+        Returns
+        -------
+        list
+            List of the removed reference files.
+
+        """
+        if not os.path.isdir(self.__cache_dir):
+            return []
+
+        entries = []
+        with os.scandir(self.__cache_dir) as scan:
+            for entry in scan:
+                if entry.name.endswith(".y4m") and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size,
+                                    entry.path))
+
+        total = sum(size for _, size, _ in entries) + reserve
+        removed = []
+        for _, size, path in sorted(entries):
+            if total <= self.__max_bytes:
+                break
+            os.remove(path)
+            removed.append(path)
+            total -= size
+
+        return removed
+
+    def clear(self):
+        """
+        Remove every cached reference.
+
+        Returns
+        -------
+        None.
+
+        """
+        budget, self.__max_bytes = self.__max_bytes, -1
+        try:
+            self.evict()
+        finally:
+            self.__max_bytes = budget
+
+    @staticmethod
+    def memmap(filename):
+        """
+        Map the frames of a raw reference, without reading them.
+
+        Parameters
+        ----------
+        filename : str
+            Path of the .y4m reference.
+
+        Returns
+        -------
+        numpy.ndarray
+            Read-only array of shape (frames, frame bytes), each row being a
+            zero-copy view of one raw planar frame, see frames.split_planes.
+
+        """
+        header = y4m_header(filename)
+        _, dtype, nbytes = frame_geometry(
+            header["pix_fmt"], header["width"], header["height"])
+
+        if header["number_of_frames"] == 0:
+            return np.empty((0, nbytes // np.dtype(dtype).itemsize), dtype)
+
+        # the FRAME marker is 6 bytes, a whole number of 8 or 16 bit samples
+        itemsize = np.dtype(dtype).itemsize
+        rows = np.memmap(
+            filename, dtype=dtype, mode="r",
+            offset=header["header_size"],
+            shape=(header["number_of_frames"],
+                   header["frame_size"] // itemsize),
+        )
+        return rows[:, len(_Y4M_FRAME_HEADER) // itemsize:]
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 21:02:51 2026
+
+@author: cgwork
+"""
+
+import os
+import re
+import subprocess
+import threading
+from fractions import Fraction
+
+import numpy as np
+
+# block QP histogram bins, covering the H.264 0-51 and MPEG 1-31 ranges
+_QP_BINS = 64
+
+# decoders logging their block QP table with -debug qp
+_QP_TABLE_CODECS = {"h264", "mpeg1video", "mpeg2video", "mpeg4", "h263"}
+
+# [h264 @ 0x55d0c1e0a2c0]  16 2832323429343820202020203333333333333333
+_LOG_RE = re.compile(r"^\[([\w.-]+) @ (0x[0-9a-fA-F]+)\] ?(.*)$")
+_NEW_FRAME_RE = re.compile(r"New frame, type: (\S+)")
+# a QP table row, its y position and %2d per block, and the column header,
+# its x positions padded to 8 characters, both at the end of a line broken
+# by the log of another thread
+_QP_ROW_RE = re.compile(r"(?:^|\s)\d+ ((?:[ \d]\d)+)$")
+_QP_HEADER_RE = re.compile(r"(?:^|\s)0( {3,}\d+)*\s*$")
+# showinfo, n:   0 pts:      0 pts_time:0 ... iskey:1 type:I checksum:...
+_SHOWINFO_RE = re.compile(r"n:\s*(\d+) pts:\s*-?\d+ pts_time:.* type:(\S)")
+_VENC_QP_RE = re.compile(r"Video encoding parameters: type \d+; qp=(-?\d+);")
+
+
+def side_data_filename(compressed_file):
+    """
+    Return the side data filename of a compressed media file.
+
+    Parameters
+    ----------
+    compressed_file : str
+        Compressed media filename.
+
+    Returns
+    -------
+    str
+        The compressed filename with its extension replaced by
+        .side_data.npz, next to its JSON metrics file.
+
+    """
+    return os.path.splitext(compressed_file)[0] + ".side_data.npz"
+
+
+def _run(args, on_line, stdout_lines=None):
+    """Run FFMPEG, passing each stderr line to on_line as it's logged."""
+    process = subprocess.Popen(
+        args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, errors="replace")
+
+    stdout_lines = [] if stdout_lines is None else stdout_lines
+    reader = threading.Thread(
+        target=lambda: stdout_lines.extend(process.stdout), daemon=True)
+    reader.start()
+
+    tail = []
+    for line in process.stderr:
+        on_line(line.rstrip("\n"))
+        tail = (tail + [line])[-20:]
+
+    process.wait()
+    reader.join()
+    process.stdout.close()
+    process.stderr.close()
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"Decoding {args[args.index('-i') + 1]} failed: "
+            f"{''.join(tail).strip()}")
+
+
+def _frame_info(video):
+    """
+    Decode a video through showinfo, while stream copying it to framecrc.
+
+    Returns the codec name, the (pts_time, size, key) of the packets in
+    pts order, and the showinfo frame index : [type, venc_params qp].
+    """
+    frames = {}
+    last = [None]
+
+    def on_line(line):
+        # searched anywhere, FFMPEG threads can log into the same line
+        info = _SHOWINFO_RE.search(line)
+        if info is not None:
+            last[0] = int(info.group(1))
+            frames[last[0]] = [info.group(2), np.nan]
+        venc = _VENC_QP_RE.search(line)
+        if venc is not None and last[0] is not None:
+            frames[last[0]][1] = float(venc.group(1))
+
+    stdout = []
+    _run([
+        "ffmpeg", "-hide_banner", "-nostdin", "-nostats", "-loglevel",
+        "info", "-export_side_data", "venc_params", "-i", str(video),
+        "-map", "0:v:0", "-vf", "showinfo", "-f", "null", "-",
+        "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "pipe:1",
+    ], on_line, stdout)
+
+    codec, time_base, packets = None, Fraction(1), []
+    for line in stdout:
+        if line.startswith("#codec_id 0:"):
+            codec = line.split(":", 1)[1].strip()
+        elif line.startswith("#tb 0:"):
+            time_base = Fraction(line.split(":", 1)[1].strip())
+        elif not line.startswith("#"):
+            # stream, dts, pts, duration, size, crc[, F=0x<flags>], the
+            # flags only written when not just the keyframe flag
+            fields = [field.strip() for field in line.split(",")]
+            if len(fields) >= 6:
+                flags = int(fields[6][2:], 16) if len(fields) > 6 else 1
+                packets.append(
+                    (int(fields[2]), int(fields[4]), bool(flags & 1)))
+
+    return codec, [
+        (float(pts * time_base), size, key)
+        for pts, size, key in sorted(packets)
+    ], frames
+
+
+def _qp_tables(video):
+    """
+    Decode a video logging the decoder QP tables.
+
+    Returns the QP histogram of each decoded frame, in output order, or
+    None for the frames whose table couldn't be read whole.
+    """
+    tables = []  # [context, histogram, rows]
+    state = {"table": None, "width": None}
+
+    def on_line(line):
+        match = _LOG_RE.match(line)
+        if _NEW_FRAME_RE.search(line) is not None:
+            # the line loses its prefix when another FFMPEG thread logs at
+            # the same time, the context is then the one of the rows
+            context = match.group(2) if match is not None and \
+                _NEW_FRAME_RE.match(match.group(3)) else None
+            state["table"] = [context, np.zeros(_QP_BINS, np.int64), 0]
+            state["width"] = None
+            tables.append(state["table"])
+            return
+
+        table = state["table"]
+        if table is None:
+            return
+        context, message = (match.group(2), match.group(3)) \
+            if match is not None else (table[0], line)
+        header = _QP_HEADER_RE.search(message)
+        row = _QP_ROW_RE.search(message) if header is None else None
+        if table[0] is None and (header or row):
+            table[0] = context
+        if context != table[0] or header is not None or \
+                (match is None and row is None):
+            return
+
+        cells = row.group(1) if row is not None else ""
+        state["width"] = state["width"] or len(cells)
+        if not cells or len(cells) != state["width"]:
+            state["table"] = None
+            return
+
+        qps = np.array([int(cells[i:i + 2]) for i in range(0, len(cells), 2)])
+        table[1] += np.bincount(qps.clip(0, _QP_BINS - 1), minlength=_QP_BINS)
+        table[2] += 1
+
+    _run([
+        "ffmpeg", "-hide_banner", "-nostdin", "-nostats", "-loglevel",
+        "debug", "-debug:v", "qp",
+        # a single decoder context, frame threads would interleave tables
+        "-thread_type", "slice", "-i", str(video),
+        "-map", "0:v:0", "-f", "null", "-",
+    ], on_line)
+
+    # the stream info probing opens its own decoder, logging a few tables
+    contexts = [table[0] for table in tables]
+    decoder = max(set(contexts), key=contexts.count, default=None)
+    tables = [table for table in tables if table[0] == decoder]
+    # a table missing rows was broken by the log of another thread
+    rows = [table[2] for table in tables]
+    full = max(set(rows), key=rows.count, default=0)
+    return [table[1] if table[2] == full else None for table in tables]
+
+
+def extract(video):
+    """
+    Extract the per-frame encoder side data of a compressed video.
+
+    The video is decoded with the venc_params side data exported, through
+    showinfo, while its packets are stream copied to a framecrc listing of
+    the coded frame sizes. For the decoders logging their block QP table,
+    i.e, H.264 and the MPEG family, a second decode reads the tables. The
+    logs are parsed as they stream, so the memory doesn't grow with the
+    number of blocks.
+
+    The statistics a decoder doesn't export are NaN, and their histogram
+    rows zero, i.e, the block QPs of VP9 and AV1, or any QP of HEVC.
+
+    Parameters
+    ----------
+    video : str
+        Compressed media filename.
+
+    Raises
+    ------
+    RuntimeError
+        If FFMPEG fails to decode the video.
+
+    Returns
+    -------
+    dict
+        Dictionary of column arrays, one row per frame in presentation
+        order: "n", "pts_time", "pict_type" ("I", "P", "B", or "?" if
+        unknown), "key", the coded frame "size" in bytes, the frame "qp",
+        the venc_params "base_qp" the block QP deltas apply to, in the
+        codec scale, i.e, the H.264 PPS init_qp, constant over a stream,
+        or the 0-255 VP9 and AV1 base qindex, the block "qp_mean",
+        "qp_min", "qp_max", and "qp_hist", the (frames, 64) block count of
+        each QP value. The frame "qp" is the block "qp_mean" for the
+        decoders logging their QP table, the "base_qp" for the others.
+
+    """
+    codec, packets, frames = _frame_info(video)
+    count = len(packets)
+
+    hist = np.zeros((count, _QP_BINS), dtype=np.uint32)
+    valid = np.zeros(count, dtype=bool)
+    if codec in _QP_TABLE_CODECS:
+        tables = _qp_tables(video)
+        if len(tables) == count:
+            for i, table in enumerate(tables):
+                if table is not None:
+                    hist[i], valid[i] = table, True
+
+    blocks = hist.sum(axis=1)
+    qp_values = np.arange(_QP_BINS)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        qp_mean = np.where(
+            valid, (hist * qp_values).sum(axis=1) / blocks, np.nan)
+    present = hist > 0
+    qp_min = np.where(valid, np.argmax(present, axis=1), np.nan)
+    qp_max = np.where(
+        valid, _QP_BINS - 1 - np.argmax(present[:, ::-1], axis=1), np.nan)
+
+    # a showinfo line broken by the log of another thread leaves a gap
+    info = [frames.get(i, ["?", np.nan]) for i in range(count)]
+    base_qp = np.array([f[1] for f in info], dtype=np.float32)
+    return {
+        "n": np.arange(count, dtype=np.int32),
+        "pts_time": np.array(
+            [pts_time for pts_time, _, _ in packets], dtype=np.float64),
+        "pict_type": np.array([f[0] for f in info], dtype="<U1"),
+        "key": np.array([key for _, _, key in packets], dtype=bool),
+        "size": np.array([size for _, size, _ in packets], dtype=np.int64),
+        "qp": qp_mean.astype(np.float32)
+        if codec in _QP_TABLE_CODECS else base_qp,
+        "base_qp": base_qp,
+        "qp_mean": qp_mean.astype(np.float32),
+        "qp_min": qp_min.astype(np.float32),
+        "qp_max": qp_max.astype(np.float32),
+        "qp_hist": hist,
+    }
+
+
+def save_side_data(compressed_file, data):
+    """
+    Save the side data arrays of a compressed file next to it.
+
+    Parameters
+    ----------
+    compressed_file : str
+        Compressed media filename.
+    data : dict
+        Column arrays, see extract().
+
+    Returns
+    -------
+    None.
+
+    """
+    filename = side_data_filename(compressed_file)
+    # np.savez appends .npz to names without it
+    tmp = f"{filename[:-len('.npz')]}.{os.getpid()}.tmp.npz"
+    try:
+        np.savez_compressed(tmp, **data)
+        os.replace(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_side_data(compressed_file):
+    """
+    Load the side data arrays of a compressed file.
+
+    Parameters
+    ----------
+    compressed_file : str
+        Compressed media filename.
+
+    Returns
+    -------
+    dict
+        The column arrays, see extract(), or None if there are none.
+
+    """
+    filename = side_data_filename(compressed_file)
+    if not os.path.isfile(filename):
+        return None
+
+    with np.load(filename) as npz:
+        return {key: npz[key] for key in npz.files}
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 23:48:26 2026
+
+@author: cgwork
+"""
+
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from telemetry import load_telemetry
+
+# objectives ranking the encodes, higher is better, from their pooled
+# "score", and the "bitrate", "size", "cpu_time" and "wall_time" telemetry
+_OBJECTIVES = {
+    "score": lambda row: row["score"],
+    "score_per_kbit": lambda row: row["score"] / (row["bitrate"] / 1000.0),
+    "score_per_second": lambda row: row["score"] / row["cpu_time"],
+}
+
+
+def _objective_value(objective, row):
+    """Evaluate an objective on an encode, -inf if it can't be."""
+    if row["score"] is None or any(
+            row.get(key) is None for key in ("bitrate", "cpu_time")):
+        return -np.inf
+    try:
+        value = float(objective(row))
+    except (ArithmeticError, KeyError, TypeError):
+        return -np.inf
+    return value if np.isfinite(value) else -np.inf
+
+
+def _rung_output(encoder, video_out, parameters, segments, seconds):
+    """Output filename of a parameter set encoded on a proxy clip."""
+    output = encoder.output_name(video_out, parameters)
+    return os.path.join(
+        os.path.dirname(output), "proxies", f"{segments}x{seconds:g}s",
+        os.path.basename(output))
+
+
+def successive_halving(encoder, vqt, metric="vmaf", pooling="mean",
+                       objective="score_per_kbit", keep=1 / 3, growth=None,
+                       finalists=1, segments=6, seconds=0.5,
+                       scene_cut=True, jobs=1, threads_per_job=None,
+                       vmaf_options=None, progress=False):
+    """
+    Sweep the encoding sets, promoting only the best to full length.
+
+    Every parameter set is first encoded, and its metric run, on a short
+    proxy clip of each input, see ProxyClips. Only the keep fraction with
+    the best objective, averaged over the inputs, is promoted to the next
+    rung, on proxies with growth times longer segments, until the survivors
+    are down to the finalists, or the proxies as long as the sources, and
+    are then encoded and measured at full length.
+
+    The encodes, and their metrics JSON files, of earlier sweeps are reused,
+    see Encoder.run_jobs and VideoQualityTests.metrics_for. The full-length
+    outputs are the ones of a full sweep, the rung outputs are written to
+    a proxies/<segments>x<seconds>s subdirectory of the output directory.
+
+    Parameters
+    ----------
+    encoder : Encoder
+        Encoder instance, with the media and encoding sets swept.
+    vqt : VideoQualityTests
+        Video quality tests instance running the metrics.
+    metric : str, optional
+        Metric pooled into the quality score. The default is "vmaf".
+    pooling : str, optional
+        Pooling method, see VideoQualityTests.pooled_score.
+        The default is "mean".
+    objective : str or callable, optional
+        Ranking objective, higher is better, one of "score",
+        "score_per_kbit" or "score_per_second", the score per encode CPU
+        second, or a callable taking a dictionary with the "score", and the
+        "bitrate", "size", "cpu_time" and "wall_time" encode telemetry.
+        The default is "score_per_kbit".
+    keep : float, optional
+        Fraction of the parameter sets promoted from each rung.
+        The default is 1 / 3.
+    growth : float, optional
+        Segment length factor from one rung to the next. The default is
+        None, 1 / keep, so every rung has about the same encode cost.
+    finalists : int, optional
+        Number of parameter sets encoded at full length. The default is 1.
+    segments : int, optional
+        Number of segments of the proxy clips. The default is 6.
+    seconds : float, optional
+        Length of each segment in seconds on the first rung.
+        The default is 0.5.
+    scene_cut : bool, optional
+        Start the proxy segments on scene cuts. The default is True.
+    jobs : int, optional
+        Maximum number of concurrent encodes. The default is 1.
+    threads_per_job : int, optional
+        FFMPEG -threads for each encode, see Encoder.run_jobs.
+        The default is None.
+    vmaf_options : dict, optional
+        Dictionary with key "model_path" to the VMAF model path.
+        The default is None.
+    progress : bool, optional
+        Show a progress bar of the encodes of each rung.
+        The default is False.
+
+    Raises
+    ------
+    ValueError
+        If the objective is unknown, or keep isn't in (0, 1).
+
+    Returns
+    -------
+    dict
+        Dictionary with the "finalists", their parameter sets from the best
+        full-length objective, and the "results" DataFrame, one row per
+        encode with its "rung", segment "seconds" (NaN at full length),
+        "parameters", "input", "output", "status", "failed" if the encode
+        or its metric failed, "error", "score", "bitrate",
+        "cpu_time", "objective" and whether it was "promoted".
+
+    """
+    if not callable(objective):
+        if objective not in _OBJECTIVES:
+            raise ValueError(f"Unknown objective {objective}.")
+        objective = _OBJECTIVES[objective]
+    if not 0 < keep < 1:
+        raise ValueError(f"keep must be in (0, 1), not {keep}.")
+    growth = 1.0 / keep if growth is None else growth
+
+    media = encoder.media()
+    io_files = list(zip(media.input_files() or [], media.output_files() or []))
+    survivors = encoder.parameter_sets()
+    finalists = max(1, int(finalists))
+
+    rows, rung = [], 0
+    while survivors:
+        full = len(survivors) <= finalists
+        # the inputs too short for a proxy are measured at full length
+        sources = {
+            video_in: video_in if full else encoder.proxies().get(
+                video_in, segments, seconds, scene_cut)
+            for video_in, _ in io_files
+        }
+        full = full or all(
+            source == video_in for video_in, source in sources.items())
+
+        job_list = []
+        for video_in, video_out in io_files:
+            for parameters in survivors:
+                source = video_in if full else sources[video_in]
+                job_list.append({
+                    "input": source,
+                    "output": encoder.output_name(video_out, parameters)
+                    if source == video_in else _rung_output(
+                        encoder, video_out, parameters, segments, seconds),
+                    "parameters": parameters,
+                    "options": encoder.effective_options(parameters),
+                })
+
+        rung_rows = []
+        for result in encoder.run_jobs(
+                job_list, jobs=jobs, threads_per_job=threads_per_job,
+                progress=progress):
+            row = {
+                "rung": rung,
+                "seconds": np.nan if full else seconds,
+                "parameters": result["parameters"],
+                "input": result["input"],
+                "output": result["output"],
+                "status": result["status"],
+                "error": result.get("error"),
+                "score": None,
+            }
+            if result["status"] in ("done", "skipped"):
+                try:
+                    metrics_data = vqt.metrics_for(
+                        result["input"], result["output"], [metric],
+                        vmaf_options=vmaf_options)
+                except Exception as exc:  # pylint: disable=broad-except
+                    # ranked last, as a failed encode, the others go on
+                    stderr = getattr(exc, "stderr", None)
+                    if isinstance(stderr, bytes):
+                        stderr = stderr.decode("utf8", "replace")
+                    row.update(status="failed", error=stderr or str(exc))
+                    metrics_data = {}
+                row["score"] = vqt.pooled_score(
+                    metrics_data, metric, pooling=pooling)
+                telemetry = load_telemetry(result["output"]) or {}
+                row.update({
+                    key: telemetry.get(key) for key in
+                    ("bitrate", "size", "cpu_time", "wall_time")
+                })
+            row["objective"] = _objective_value(objective, row)
+            rung_rows.append(row)
+
+        # mean objective of each parameter set over the inputs
+        means = [
+            np.mean([
+                row["objective"] for row in rung_rows
+                if row["parameters"] == parameters
+            ]) if io_files else -np.inf
+            for parameters in survivors
+        ]
+        order = sorted(
+            range(len(survivors)), key=lambda i: means[i], reverse=True)
+        count = finalists if full else \
+            max(finalists, int(math.ceil(len(survivors) * keep)))
+        promoted = [
+            survivors[i] for i in order[:count] if np.isfinite(means[i])
+        ]
+
+        for row in rung_rows:
+            row["promoted"] = row["parameters"] in promoted
+        rows += rung_rows
+
+        survivors = promoted
+        if full:
+            break
+        rung += 1
+        seconds *= growth
+
+    return {
+        "finalists": survivors,
+        "results": pd.DataFrame(rows),
+    }
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 18:20:36 2026
+
+@author: cgwork
+"""
+
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+import ffmpeg
+
+from fileutils import atomic_write_json
+
+# ru_maxrss unit, kilobytes on Linux, bytes on macOS
+_MAXRSS_SCALE = 1 if sys.platform == "darwin" else 1024
+
+# FFMPEG -benchmark report, the resource usage of its own process
+_BENCH_TIMES_RE = re.compile(
+    r"bench: utime=([\d.]+)s stime=([\d.]+)s rtime=([\d.]+)s")
+_BENCH_RSS_RE = re.compile(r"bench: maxrss=(\d+)KiB")
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def run_ffmpeg(stream_spec):
+    """
+    Run an ffmpeg-python stream, measuring what the FFMPEG process costs.
+
+    Parameters
+    ----------
+    stream_spec : ffmpeg.Stream
+        Output stream, i.e, ffmpeg.output(...), overwriting its outputs.
+
+    Raises
+    ------
+    ffmpeg.Error
+        If FFMPEG exits with an error, with the captured stderr.
+
+    Returns
+    -------
+    dict
+        Dictionary with the "wall_time", "user_time", "system_time" and
+        "cpu_time" in seconds, the peak resident memory "max_rss" in bytes,
+        and from the FFMPEG -progress stream, the encoded "frames", the
+        achieved encoding "fps" and "speed" relative to real time. The
+        resource usage is None where os.wait4 isn't available.
+
+    """
+    args = ffmpeg.compile(stream_spec, overwrite_output=True)
+    args = [args[0], "-nostdin", "-nostats", "-progress", "pipe:1"] + \
+        args[1:]
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True)
+
+    # drain stderr while reading the progress, so neither pipe fills up
+    stderr = []
+    reader = threading.Thread(
+        target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    reader.start()
+
+    progress = {}
+    for line in process.stdout:
+        key, _, value = line.strip().partition("=")
+        progress[key] = value
+
+    rusage = None
+    if hasattr(os, "wait4"):
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.WEXITSTATUS(status) \
+            if os.WIFEXITED(status) else -os.WTERMSIG(status)
+    else:
+        process.wait()
+    wall_time = time.perf_counter() - start
+    reader.join()
+    process.stdout.close()
+    process.stderr.close()
+
+    if process.returncode != 0:
+        raise ffmpeg.Error(
+            "ffmpeg", None, "".join(stderr).encode("utf8"))
+
+    frames = _number(progress.get("frame"))
+    return {
+        "wall_time": wall_time,
+        "user_time": rusage.ru_utime if rusage else None,
+        "system_time": rusage.ru_stime if rusage else None,
+        "cpu_time": rusage.ru_utime + rusage.ru_stime if rusage else None,
+        "max_rss": rusage.ru_maxrss * _MAXRSS_SCALE if rusage else None,
+        "frames": int(frames) if frames is not None else None,
+        "fps": frames / wall_time if frames and wall_time > 0 else None,
+        "speed": _number(progress.get("speed", "").rstrip("x")),
+    }
+
+
+async def run_in_thread(func, *args):
+    """
+    Run a blocking function in the default executor, see asyncio.to_thread.
+
+    Parameters
+    ----------
+    func : callable
+        Blocking function.
+    *args
+        Function arguments.
+
+    Returns
+    -------
+    Any
+        The function result.
+
+    """
+    # asyncio.to_thread is Python 3.9+
+    return await asyncio.get_running_loop().run_in_executor(
+        None, lambda: func(*args))
+
+
+async def run_ffmpeg_async(args, progress=None, timeout=None):
+    """
+    Run an FFMPEG command as an asyncio subprocess, measuring its cost.
+
+    The event loop is never blocked, so a Jupyter kernel stays responsive.
+    On timeout or cancellation the FFMPEG process is killed.
+
+    Parameters
+    ----------
+    args : list
+        FFMPEG command line, i.e, ffmpeg.compile(...).
+    progress : callable, optional
+        Called with the dictionary of each FFMPEG -progress report, i.e,
+        {"frame": "120", "fps": "48.2", "out_time": ..., "progress":
+        "continue"}. The default is None.
+    timeout : float, optional
+        Maximum run time in seconds. The default is None, no limit.
+
+    Raises
+    ------
+    asyncio.TimeoutError
+        If FFMPEG runs for longer than timeout.
+    ffmpeg.Error
+        If FFMPEG exits with an error, with the captured stderr.
+
+    Returns
+    -------
+    dict
+        The telemetry, see run_ffmpeg. The resource usage comes from the
+        FFMPEG -benchmark report, as asyncio reaps the process itself.
+
+    """
+    args = list(args)
+    for option in ("-loglevel", "-v"):
+        while option in args:
+            del args[args.index(option):args.index(option) + 2]
+    # the benchmark report is logged at the info level
+    args = [args[0], "-hide_banner", "-loglevel", "info", "-nostdin",
+            "-nostats", "-benchmark", "-progress", "pipe:1"] + args[1:]
+
+    start = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE)
+
+    report = {}
+
+    async def read_progress():
+        block = {}
+        async for line in process.stdout:
+            key, _, value = line.decode("utf8", "replace").strip() \
+                .partition("=")
+            block[key] = value
+            if key == "progress":
+                report.update(block)
+                if progress is not None:
+                    progress(dict(block))
+                block = {}
+
+    try:
+        _, stderr, _ = await asyncio.wait_for(
+            asyncio.gather(
+                read_progress(), process.stderr.read(), process.wait()),
+            timeout)
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    wall_time = time.perf_counter() - start
+
+    stderr = stderr.decode("utf8", "replace")
+    if process.returncode != 0:
+        raise ffmpeg.Error("ffmpeg", None, stderr.encode("utf8"))
+
+    times = _BENCH_TIMES_RE.search(stderr)
+    rss = _BENCH_RSS_RE.search(stderr)
+    user, system = (float(times.group(1)), float(times.group(2))) \
+        if times else (None, None)
+    frames = _number(report.get("frame"))
+    return {
+        "wall_time": wall_time,
+        "user_time": user,
+        "system_time": system,
+        "cpu_time": user + system if times else None,
+        "max_rss": int(rss.group(1)) * 1024 if rss else None,
+        "frames": int(frames) if frames is not None else None,
+        "fps": frames / wall_time if frames and wall_time > 0 else None,
+        "speed": _number(report.get("speed", "").rstrip("x")),
+    }
+
+
+def combine(telemetries, wall_time=None):
+    """
+    Combine the telemetry of several FFMPEG processes of one encode.
+
+    Parameters
+    ----------
+    telemetries : list
+        Telemetry dictionaries, see run_ffmpeg.
+    wall_time : float, optional
+        Elapsed time of the whole encode, for concurrent processes.
+        The default is None, the sum of the process wall times.
+
+    Returns
+    -------
+    dict
+        The summed times and frames, and the highest peak memory.
+
+    """
+    def total(key):
+        values = [t[key] for t in telemetries]
+        return None if None in values else sum(values)
+
+    combined = {
+        key: total(key)
+        for key in ("wall_time", "user_time", "system_time", "cpu_time",
+                    "frames")
+    }
+    rss = [t["max_rss"] for t in telemetries]
+    combined["max_rss"] = None if None in rss else max(rss, default=0)
+
+    if wall_time is not None:
+        combined["wall_time"] = wall_time
+    wall_time = combined["wall_time"]
+    combined["fps"] = combined["frames"] / wall_time \
+        if combined["frames"] and wall_time else None
+    combined["speed"] = None
+    return combined
+
+
+def output_stats(filename, duration):
+    """
+    Return the size and overall bitrate of an encoded file.
+
+    Parameters
+    ----------
+    filename : str
+        Encoded media file.
+    duration : float
+        Media duration in seconds.
+
+    Returns
+    -------
+    dict
+        Dictionary with the file "size" in bytes and "bitrate" in bit/s.
+
+    """
+    size = os.path.getsize(filename)
+    return {
+        "size": size,
+        "bitrate": size * 8 / duration if duration else None,
+    }
+
+
+def telemetry_filename(output):
+    """
+    Return the telemetry JSON filename of an encoded file.
+
+    Parameters
+    ----------
+    output : str
+        Encoded media file.
+
+    Returns
+    -------
+    str
+        The encoded filename with its extension replaced by .encode.json.
+
+    """
+    return os.path.splitext(output)[0] + ".encode.json"
+
+
+def save_telemetry(output, telemetry):
+    """
+    Save the telemetry of an encoded file next to it.
+
+    Parameters
+    ----------
+    output : str
+        Encoded media file.
+    telemetry : dict
+        JSON serializable telemetry.
+
+    Returns
+    -------
+    None.
+
+    """
+    atomic_write_json(telemetry, telemetry_filename(output), indent=4)
+
+
+def load_telemetry(output):
+    """
+    Load the telemetry of an encoded file.
+
+    Parameters
+    ----------
+    output : str
+        Encoded media file.
+
+    Returns
+    -------
+    dict
+        The saved telemetry, or None if there is none.
+
+    """
+    filename = telemetry_filename(output)
+    if not os.path.isfile(filename):
+        return None
+
+    with open(filename, "r", encoding="utf8") as jsonfile:
+        return json.load(jsonfile)
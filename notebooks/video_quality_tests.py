@@ -7,19 +7,44 @@ Created on Wed Dec 29 00:56:07 2021
 """
 
 
+import asyncio
 import json
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
 
+import numpy as np
 import pandas as pd
+from alive_progress import alive_bar
 from ffmpeg_quality_metrics import FfmpegQualityMetrics as ffqm
 
+import metric_graph
+import numpy_metrics
+import side_data
+from fileutils import atomic_write_json
+from telemetry import load_telemetry, run_ffmpeg_async, run_in_thread
+
 
 class VideoQualityTests:
     """ Video quality tests and auxiliary methods. """
 
+    # default per-frame column pooled for each metric
+    __score_columns = {
+        "vmaf": "vmaf", "ssim": "ssim_avg", "psnr": "psnr_avg",
+        "vif": "scale_0",
+    }
+
     def __init__(self, io_files_list=None):
         self.__metrics = ["ssim", "psnr", "vmaf", "vif"]
         # dict( original : out_basename_params_encoding)
         self.__io_files_list = io_files_list
+        # original media : raw cached reference, i.e, Media.reference
+        self.__reference_resolver = None
+        # original media : its cached stream fields, i.e, Media.record
+        self.__record_resolver = None
+        self.__metric_cache = None
 
     @property
     def io_files_list(self):
@@ -33,6 +58,61 @@ class VideoQualityTests:
     def io_files_list(self):
         del self.__io_files_list
 
+    @property
+    def reference_resolver(self):
+        """
+        Get the callable mapping original media to its decoded reference.
+
+        Returns
+        -------
+        callable
+            Callable such as Media.reference, returning the raw cached
+            reference read by the metrics instead of the original, or None.
+
+        """
+        return self.__reference_resolver
+
+    @reference_resolver.setter
+    def reference_resolver(self, resolver):
+        self.__reference_resolver = resolver
+
+    @property
+    def record_resolver(self):
+        """
+        Get the callable mapping original media to its stream fields.
+
+        Returns
+        -------
+        callable
+            Callable such as Media.record, returning the MediaRecord whose
+            frame rate and size the metrics use instead of probing the
+            reference again, or None.
+
+        """
+        return self.__record_resolver
+
+    @record_resolver.setter
+    def record_resolver(self, resolver):
+        self.__record_resolver = resolver
+
+    @property
+    def metric_cache(self):
+        """
+        Get the metric results cache.
+
+        Returns
+        -------
+        MetricCache
+            Cache the metric results are read from and merged into, so only
+            the metrics missing for a file pair are computed, or None.
+
+        """
+        return self.__metric_cache
+
+    @metric_cache.setter
+    def metric_cache(self, cache):
+        self.__metric_cache = cache
+
     @staticmethod
     def __moving_averages(df, metric, mean_period):
 
@@ -136,10 +216,7 @@ class VideoQualityTests:
         None
 
         """
-        metrics_json = json.dumps(metrics_data, indent=4)
-
-        with open(json_filename, "wt", encoding="utf8") as file:
-            file.write(metrics_json)
+        atomic_write_json(metrics_data, json_filename, indent=4)
 
     @staticmethod
     def load_json(filename):
@@ -161,10 +238,173 @@ class VideoQualityTests:
             return json.load(file)
         return None
 
+    @staticmethod
+    def metrics_filename(compressed_file):
+        """
+        Return the JSON metrics filename of a compressed media file.
+
+        Parameters
+        ----------
+        compressed_file : str
+            Compressed media filename.
+
+        Returns
+        -------
+        str
+            The compressed filename with its extension replaced by .json.
+
+        """
+        return os.path.splitext(compressed_file)[0] + ".json"
+
+    @classmethod
+    def pooled_score(cls, metrics_data, metric="vmaf", column=None,
+                     pooling="mean"):
+        """
+        Pool the per-frame scores of a metric into a single value.
+
+        Parameters
+        ----------
+        metrics_data : dict
+            The FFMPEG Metrics test data dictionary.
+        metric : str, optional
+            Metric name. The default is "vmaf".
+        column : str, optional
+            Per-frame column to pool. The default is None, the metric main
+            score, i.e, "vmaf" or "ssim_avg".
+        pooling : str, optional
+            One of "mean", "harmonic_mean", "min", or "p<N>" for the N-th
+            percentile, i.e, "p5". The default is "mean".
+
+        Raises
+        ------
+        ValueError
+            If the pooling method is unknown.
+
+        Returns
+        -------
+        float
+            The pooled score, or None if the metric isn't in the data.
+
+        """
+        column = column if column is not None else \
+            cls.__score_columns.get(metric, metric)
+        frames = metrics_data.get(metric)
+        if not frames:
+            return None
+
+        scores = np.array([frame[column] for frame in frames], dtype=float)
+
+        if pooling == "mean":
+            return float(np.mean(scores))
+        if pooling == "harmonic_mean":
+            return float(len(scores) / np.sum(1.0 / (scores + 1.0)) - 1.0)
+        if pooling == "min":
+            return float(np.min(scores))
+        if pooling.startswith("p"):
+            return float(np.percentile(scores, float(pooling[1:])))
+
+        raise ValueError(f"Unknown pooling method {pooling}.")
+
+    @classmethod
+    def target_margin(cls, metrics_data, targets):
+        """
+        Relative margin of the metrics data over a set of quality targets.
+
+        Parameters
+        ----------
+        metrics_data : dict
+            The FFMPEG Metrics test data dictionary.
+        targets : list
+            List of targets, dictionaries with the keys "metric",
+            "threshold", and optionally "pooling" and "column", i.e,
+            [{"metric": "vmaf", "threshold": 93},
+             {"metric": "vmaf", "pooling": "p5", "threshold": 85}].
+
+        Returns
+        -------
+        float
+            The smallest (score - threshold) / threshold over the targets,
+            non-negative when every target is met.
+
+        """
+        margins = []
+        for target in targets:
+            score = cls.pooled_score(
+                metrics_data, target["metric"], target.get("column"),
+                target.get("pooling", "mean"))
+            if score is None:
+                return -np.inf
+            margins.append(
+                (score - target["threshold"]) /
+                (abs(target["threshold"]) or 1.0))
+
+        return float(min(margins))
+
+    def metrics_for(self, original, compressed_file, metrics,
+                    progress=False, vmaf_options=None):
+        """
+        Return the metrics of a compressed file, reusing its JSON results.
+
+        Only the metrics missing from the JSON metrics file are run, every
+        metric if it's older than the compressed file, and merged into it.
+
+        Parameters
+        ----------
+        original : str
+            Original media.
+        compressed_file : str
+            Distorted media.
+        metrics : list
+            Metrics needed.
+        progress : bool, optional
+            Toggles progress indication on or off. The default is False.
+        vmaf_options : dict, optional
+            Dictionary with key "model_path" to the VMAF model path.
+            The default is None.
+
+        Returns
+        -------
+        dict
+            The FFMPEG Metrics test data dictionary.
+
+        """
+        json_filename = self.metrics_filename(compressed_file)
+        metrics_data = {}
+        if os.path.isfile(json_filename) and \
+                os.path.getmtime(json_filename) >= \
+                os.path.getmtime(compressed_file):
+            metrics_data = self.load_json(json_filename)["metrics_data"]
+
+        missing = [metric for metric in metrics if metric not in metrics_data]
+        if not missing:
+            return metrics_data
+
+        reference = original if self.__reference_resolver is None \
+            else self.__reference_resolver(original)
+        # the metrics already saved are kept, get_dataframes reads them
+        metrics_data = {
+            **metrics_data,
+            **self.cached_metrics(
+                original, reference, compressed_file, missing,
+                progress=progress, vmaf_options=vmaf_options,
+                cache=self.__metric_cache),
+        }
+
+        self.save_json({
+            "original_media": original,
+            "compressed_media": compressed_file,
+            "vq_metrics": list(metrics_data),
+            "metrics_data": metrics_data,
+            "encode_telemetry": load_telemetry(compressed_file),
+        }, json_filename)
+
+        return metrics_data
+
     @staticmethod
     def run_metrics(video_in,
                     video_out,
-                    metrics, progress=False, vmaf_options=None):
+                    metrics, progress=False, vmaf_options=None,
+                    threads=None, engine="ffqm", record=None):
         """
         Run the FFMPEG metrics on the original and distorted media.
 
@@ -181,6 +421,25 @@ class VideoQualityTests:
         vmaf_options : dict, optional
             Dictionary with key "model_path" with the model for the VMAF
             model data used. The default is None.
+        threads : int, optional
+            Number of FFMPEG threads. The default is None, letting FFMPEG
+            decide.
+        engine : str, optional
+            "ffqm", FFMPEG Quality Metrics, or "numpy", the in process
+            NumPy PSNR and SSIM of numpy_metrics, for quick screening, its
+            SSIM Gaussian weighted instead of the FFMPEG 8x8 blocks, so its
+            ssim_* values aren't interchangeable with the ffqm ones, the
+            chroma ones a few hundredths apart, see
+            MediaTests.check_numpy_metrics. The default is "ffqm".
+        record : MediaRecord, optional
+            Stream fields of the original, see record_resolver, its frame
+            rate, size and pixel format used by the "numpy" engine.
+            The default is None, probing the original.
+
+        Raises
+        ------
+        ValueError
+            If the engine is unknown, or doesn't support a metric.
 
         Returns
         -------
@@ -188,8 +447,19 @@ class VideoQualityTests:
             DESCRIPTION.
 
         """
+        if engine == "numpy":
+            if record is None:
+                return numpy_metrics.compute(video_in, video_out, metrics)
+            return numpy_metrics.compute(
+                video_in, video_out, metrics,
+                numpy_metrics.compare_format(record.pix_fmt),
+                framerate=float(record.frame_rate),
+                size=(record.width, record.height))
+        if engine != "ffqm":
+            raise ValueError(f"Unknown metrics engine {engine}.")
 
-        _ffqm = ffqm(video_in, video_out, progress=progress)
+        _ffqm = ffqm(video_in, video_out, progress=progress,
+                     threads=threads or 0)
 
         if vmaf_options is not None and isinstance(vmaf_options, dict):
             metrics_data = _ffqm.calc(metrics, vmaf_options=vmaf_options)
@@ -198,46 +468,589 @@ class VideoQualityTests:
 
         return metrics_data
 
+    @classmethod
+    def cached_metrics(cls, original, reference, compressed_file, metrics,
+                       progress=False, vmaf_options=None, threads=None,
+                       engine="ffqm", cache=None, record=None):
+        """
+        Return the metrics of a compressed file, computing the uncached ones.
+
+        Parameters
+        ----------
+        original : str
+            Original media, the cache key with the compressed file.
+        reference : str
+            Media the metrics read as the original, see run_test().
+        compressed_file : str
+            Distorted media.
+        metrics : list
+            Metrics needed.
+        progress : bool, optional
+            Toggles progress indication on or off. The default is False.
+        vmaf_options : dict, optional
+            Dictionary with key "model_path" to the VMAF model path.
+            The default is None.
+        threads : int, optional
+            Number of FFMPEG threads. The default is None.
+        engine : str, optional
+            Metrics engine, see run_metrics(). The default is "ffqm".
+        cache : MetricCache, optional
+            Metric results cache, the computed metrics merged into it.
+            The default is None, computing every metric.
+        record : MediaRecord, optional
+            Stream fields of the original, see run_metrics().
+            The default is None.
+
+        Returns
+        -------
+        dict
+            The FFMPEG Metrics test data dictionary, in metrics order.
+
+        """
+        metrics_data, missing = ({}, list(metrics)) if cache is None else \
+            cache.get(original, compressed_file, metrics, vmaf_options,
+                      engine)
+
+        if missing:
+            computed = cls.run_metrics(
+                reference,
+                compressed_file,
+                missing,
+                progress=progress,
+                vmaf_options=vmaf_options,
+                threads=threads,
+                engine=engine,
+                record=record,
+            )
+            if cache is not None:
+                cache.put(original, compressed_file, computed, vmaf_options,
+                          engine)
+            metrics_data.update(computed)
+
+        return {
+            metric: metrics_data[metric]
+            for metric in metrics if metric in metrics_data
+        }
+
+    @classmethod
+    def run_test(cls, original, reference, compressed_file, metrics,
+                 progress=False, vmaf_options=None, threads=None,
+                 engine="ffqm", cache=None, record=None):
+        """
+        Run the metrics of a compressed file and save its JSON results.
+
+        Parameters
+        ----------
+        original : str
+            Original media, recorded in the JSON results.
+        reference : str
+            Media the metrics read as the original, i.e, its raw cached
+            reference, see reference_resolver.
+        compressed_file : str
+            Distorted media.
+        metrics : list
+            Metrics used, defaults to SSIM, PSNR, VMAF, VIF.
+        progress : bool, optional
+            Toggles progress indication on or off. The default is False.
+        vmaf_options : dict, optional
+            Dictionary with key "model_path" to the VMAF model path.
+            The default is None.
+        threads : int, optional
+            Number of FFMPEG threads. The default is None.
+        engine : str, optional
+            Metrics engine, see run_metrics(). The default is "ffqm".
+        cache : MetricCache, optional
+            Metric results cache, see cached_metrics(). The default is None.
+        record : MediaRecord, optional
+            Stream fields of the original, see run_metrics().
+            The default is None.
+
+        Returns
+        -------
+        dict
+            Dictionary with the "status", "done" or "failed", and "error"
+            with the failure message.
+
+        """
+        try:
+            metrics_data = cls.cached_metrics(
+                original, reference, compressed_file, metrics, progress,
+                vmaf_options, threads, engine, cache, record)
+            cls.save_json({
+                "original_media": original,
+                "compressed_media": compressed_file,
+                "vq_metrics": metrics,
+                "metrics_data": metrics_data,
+                "encode_telemetry": load_telemetry(compressed_file),
+            }, cls.metrics_filename(compressed_file))
+        except Exception as exc:  # pylint: disable=broad-except
+            stderr = getattr(exc, "stderr", None)
+            if isinstance(stderr, bytes):
+                stderr = stderr.decode("utf8", "replace")
+            return {"status": "failed", "error": stderr or str(exc)}
+
+        return {"status": "done", "error": None}
+
+    @classmethod
+    def run_test_batch(cls, original, reference, compressed_files, metrics,
+                       vmaf_options=None, threads=None, engine="ffqm",
+                       cache=None, record=None):
+        """
+        Run the metrics of many compressed files of the same original.
+
+        The metrics run in a single FFMPEG filter graph decoding the
+        reference once for every compressed file, see
+        metric_graph.batch_command. If the graph fails, the files are tested
+        one by one with run_test(), so a bad file only fails its own test.
+
+        Parameters
+        ----------
+        original : str
+            Original media, recorded in the JSON results.
+        reference : str
+            Media the metrics read as the original, see run_test().
+        compressed_files : list
+            Distorted media filenames.
+        metrics : list
+            Metrics used, see metric_graph.metrics().
+        vmaf_options : dict, optional
+            Dictionary with key "model_path" to the VMAF model path.
+            The default is None.
+        threads : int, optional
+            Number of FFMPEG threads. The default is None.
+        engine : str, optional
+            Metrics engine the files are tested with one by one if the
+            graph fails, see run_metrics(). The default is "ffqm".
+        cache : MetricCache, optional
+            Metric results cache, only the files missing metrics are tested
+            and only for those, their results merged into the cache.
+            The default is None.
+        record : MediaRecord, optional
+            Stream fields of the original, see record_resolver, its frame
+            rate and size passed to the filter graph. The default is None,
+            probing the reference.
+
+        Returns
+        -------
+        dict
+            Dictionary with the compressed filename as key, and as value a
+            dictionary with the "status", "done" or "failed", and "error"
+            with the failure message.
+
+        """
+        cached, missing = {}, set()
+        for compressed_file in compressed_files:
+            cached[compressed_file], file_missing = ({}, metrics) \
+                if cache is None else cache.get(
+                    original, compressed_file, metrics, vmaf_options,
+                    "graph")
+            missing.update(file_missing)
+        missing = [metric for metric in metrics if metric in missing]
+        pending = [
+            compressed_file for compressed_file in compressed_files
+            if any(metric not in cached[compressed_file]
+                   for metric in metrics)
+        ]
+
+        framerate, size = (None, None) if record is None else (
+            float(record.frame_rate), (record.width, record.height))
+
+        computed = []
+        try:
+            if pending:
+                with tempfile.TemporaryDirectory() as log_dir:
+                    args, logs = metric_graph.batch_command(
+                        reference, pending, missing, log_dir,
+                        vmaf_options, threads, framerate, size)
+                    subprocess.run(
+                        args, stdout=subprocess.DEVNULL,
+                        stderr=subprocess.PIPE, check=True)
+                    computed = [metric_graph.parse_logs(log) for log in logs]
+        except Exception:  # pylint: disable=broad-except
+            return {
+                compressed_file: cls.run_test(
+                    original, reference, compressed_file, metrics, False,
+                    vmaf_options, threads, engine, cache, record)
+                for compressed_file in compressed_files
+            }
+
+        for compressed_file, data in zip(pending, computed):
+            if cache is not None:
+                cache.put(original, compressed_file, data, vmaf_options,
+                          "graph")
+            cached[compressed_file].update(data)
+
+        for compressed_file in compressed_files:
+            cls.save_json({
+                "original_media": original,
+                "compressed_media": compressed_file,
+                "vq_metrics": metrics,
+                "metrics_data": {
+                    metric: cached[compressed_file][metric]
+                    for metric in metrics
+                },
+                "encode_telemetry": load_telemetry(compressed_file),
+            }, cls.metrics_filename(compressed_file))
+
+        return {
+            compressed_file: {"status": "done", "error": None}
+            for compressed_file in compressed_files
+        }
+
     def run_tests(self,
-                  metrics, progress=False, vmaf_options=None):
+                  metrics, progress=False, vmaf_options=None, jobs=1,
+                  threads_per_job=None, batch_size=1, engine="ffqm"):
         """
         Run the metric tests for the entire media in the lists.
 
+        With jobs > 1, the (original, compressed) pairs are tested in a
+        process pool, as a single metrics run doesn't keep every core busy.
+        With batch_size > 1, the compressed files of an original are tested
+        batch_size at a time from a single decode of the original, see
+        run_test_batch(). A failed test is reported instead of stopping the
+        others. With a metric_cache, only the metrics missing from the cache
+        are computed.
+
         Parameters
         ----------
         metrics : list
             Metrics used, defaults to SSIM, PSNR, VMAF, VIF.
         progress : bool, optional
-            Toggles progress indication on or off. The default is False.
+            Toggles progress indication on or off, the progress of each
+            test, or with jobs > 1, a bar advanced as each test completes.
+            The default is False.
         vmaf_options : dict, optional
             Dictionary with key "model_path" to the VMAF model path.
             The default is None.
+        jobs : int, optional
+            Maximum number of concurrent tests. The default is 1.
+        threads_per_job : int, optional
+            FFMPEG threads of each test. The default is None, splitting the
+            CPU cores between the concurrent tests when jobs > 1.
+        batch_size : int, optional
+            Maximum number of compressed files tested from one decode of
+            their original, bounding the frames buffered by the filter
+            graph. The default is 1, each file tested on its own by the
+            metrics engine.
+        engine : str, optional
+            Metrics engine of the files tested on their own, with
+            batch_size 1 or once their filter graph failed, see
+            run_metrics(). The default is "ffqm".
+
+        Raises
+        ------
+        ValueError
+            If there are no I/O files to test.
 
         Returns
         -------
-        None
+        dict
+            Dictionary with the compressed filename as key, and as value a
+            dictionary with the "status", "done" or "failed", and "error"
+            with the failure message.
+
+        """
+        if self.__io_files_list is None:
+            raise ValueError
+
+        jobs = max(1, int(jobs))
+        batch_size = max(1, int(batch_size))
+        if threads_per_job is None and jobs > 1:
+            threads_per_job = max(1, (os.cpu_count() or 1) // jobs)
+
+        results = {}
+        tests = []  # (original, reference, record, compressed files)
+        for original, compressed_files in self.__io_files_list.items():
+            try:
+                reference = original if self.__reference_resolver is None \
+                    else self.__reference_resolver(original)
+                record = None if self.__record_resolver is None \
+                    else self.__record_resolver(original)
+            except Exception as exc:  # pylint: disable=broad-except
+                for compressed_file in compressed_files:
+                    results[compressed_file] = {
+                        "status": "failed", "error": str(exc)}
+                continue
+
+            tests += [
+                (original, reference, record,
+                 compressed_files[i:i + batch_size])
+                for i in range(0, len(compressed_files), batch_size)
+            ]
+
+        def task(original, reference, record, batch, test_progress=False):
+            # the test method and its arguments, run here or in the pool
+            if batch_size > 1:
+                return self.run_test_batch, (
+                    original, reference, batch, metrics, vmaf_options,
+                    threads_per_job, engine, self.__metric_cache, record)
+            return self.run_test, (
+                original, reference, batch[0], metrics, test_progress,
+                vmaf_options, threads_per_job, engine, self.__metric_cache,
+                record)
+
+        def collect(batch, result):
+            if batch_size > 1:
+                results.update(result)
+            else:
+                results[batch[0]] = result
+
+        if jobs == 1:
+            with ExitStack() as stack:
+                bar = stack.enter_context(
+                    alive_bar(sum(len(test[3]) for test in tests))) \
+                    if progress is True and batch_size > 1 else None
+                for original, reference, record, batch in tests:
+                    run, args = task(
+                        original, reference, record, batch, progress)
+                    collect(batch, run(*args))
+                    if bar is not None:
+                        bar(len(batch))
+            return results
+
+        with ExitStack() as stack:
+            bar = stack.enter_context(
+                alive_bar(sum(len(test[3]) for test in tests))) \
+                if progress is True else None
+            executor = stack.enter_context(
+                ProcessPoolExecutor(max_workers=jobs))
+
+            futures = {}
+            for original, reference, record, batch in tests:
+                run, args = task(original, reference, record, batch)
+                futures[executor.submit(run, *args)] = batch
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    collect(batch, future.result())
+                except Exception as exc:  # pylint: disable=broad-except
+                    # the worker process died, i.e, killed out of memory
+                    results.update({
+                        compressed_file: {
+                            "status": "failed", "error": str(exc)}
+                        for compressed_file in batch
+                    })
+                if bar is not None:
+                    bar(len(batch))
+
+        return results
+
+    async def run_tests_async(self, metrics, jobs=1, threads_per_job=None,
+                              vmaf_options=None, timeout=None,
+                              progress=None, on_result=None):
+        """
+        Run the metric tests for the entire media without blocking.
+
+        The metrics run as asyncio FFMPEG subprocesses, with the filter
+        graph of metric_graph, so in JupyterLab the tests can run as a
+        background task while the JSON metrics files fill up. Cancelling
+        the task kills the running tests.
+
+        Parameters
+        ----------
+        metrics : list
+            Metrics used, see metric_graph.metrics().
+        jobs : int, optional
+            Maximum number of concurrent tests. The default is 1.
+        threads_per_job : int, optional
+            FFMPEG -threads for each test. The default is None.
+        vmaf_options : dict, optional
+            Dictionary with key "model_path" to the VMAF model path.
+            The default is None.
+        timeout : float, optional
+            Maximum run time of each test in seconds. The default is None.
+        progress : callable, optional
+            Called as progress(compressed_file, report) with every FFMPEG
+            -progress report of a running test. The default is None.
+        on_result : callable, optional
+            Called as on_result(compressed_file, result) as soon as a test
+            ends. The default is None.
+
+        Raises
+        ------
+        ValueError
+            If there are no I/O files to test.
+
+        Returns
+        -------
+        dict
+            Dictionary with the compressed filename as key, and as value a
+            dictionary with the "status", "done" or "failed", and "error"
+            with the failure message.
 
         """
         if self.__io_files_list is None:
             raise ValueError
 
+        semaphore = asyncio.Semaphore(max(1, int(jobs)))
+
+        async def run(original, compressed_file):
+            result = {"status": "done", "error": None}
+            async with semaphore:
+                try:
+                    reference = original \
+                        if self.__reference_resolver is None else \
+                        await run_in_thread(
+                            self.__reference_resolver, original)
+                    record = None if self.__record_resolver is None else \
+                        await run_in_thread(self.__record_resolver, original)
+                    framerate, size = (None, None) if record is None else (
+                        float(record.frame_rate),
+                        (record.width, record.height))
+
+                    with tempfile.TemporaryDirectory() as log_dir:
+                        args, logs = await run_in_thread(
+                            metric_graph.command, reference,
+                            compressed_file, metrics, log_dir,
+                            vmaf_options, threads_per_job, framerate, size)
+                        await run_ffmpeg_async(
+                            args, timeout=timeout,
+                            progress=None if progress is None else
+                            lambda report: progress(compressed_file, report))
+                        metrics_data = metric_graph.parse_logs(logs)
+
+                    self.save_json({
+                        "original_media": original,
+                        "compressed_media": compressed_file,
+                        "vq_metrics": metrics,
+                        "metrics_data": metrics_data,
+                        "encode_telemetry": load_telemetry(compressed_file),
+                    }, self.metrics_filename(compressed_file))
+                except asyncio.TimeoutError:
+                    result = {"status": "failed",
+                              "error": f"Timed out after {timeout}s."}
+                except Exception as exc:  # pylint: disable=broad-except
+                    stderr = getattr(exc, "stderr", None)
+                    result = {"status": "failed",
+                              "error": stderr.decode("utf8", "replace")
+                              if stderr else str(exc)}
+
+            if on_result is not None:
+                on_result(compressed_file, result)
+            return compressed_file, result
+
+        return dict(await asyncio.gather(*[
+            run(original, compressed_file)
+            for original, compressed_files in self.__io_files_list.items()
+            for compressed_file in compressed_files
+        ]))
+
+    def tradeoffs(self, metric="vmaf", pooling="mean"):
+        """
+        Tabulate the encode cost, size and quality of every compressed file.
+
+        Parameters
+        ----------
+        metric : str, optional
+            Metric pooled into the quality score. The default is "vmaf".
+        pooling : str, optional
+            Pooling method, see pooled_score. The default is "mean".
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per compressed file with a metrics JSON file, indexed by
+            the compressed filename, with the "original" media, the pooled
+            "score", and the encode telemetry columns, i.e, "wall_time",
+            "cpu_time", "max_rss", "fps", "size" and "bitrate".
+
+        """
+        rows = []
         for original, compressed_files in self.__io_files_list.items():
             for compressed_file in compressed_files:
-                metrics_data = self.run_metrics(
-                    original,
-                    compressed_file,
-                    metrics,
-                    progress=progress,
-                    vmaf_options=vmaf_options,
-                )
-                data = {
-                    "original_media": original,
+                json_filename = self.metrics_filename(compressed_file)
+                if not os.path.isfile(json_filename):
+                    continue
+
+                json_data = self.load_json(json_filename)
+                telemetry = json_data.get("encode_telemetry") or \
+                    load_telemetry(compressed_file) or {}
+                rows.append({
                     "compressed_media": compressed_file,
-                    "vq_metrics": metrics,
-                    "metrics_data": metrics_data,
-                }
-                json_filename = compressed_file.split(".")[0] + ".json"
-                self.save_json(data, json_filename)
+                    "original": original,
+                    "score": self.pooled_score(
+                        json_data["metrics_data"], metric, pooling=pooling),
+                    **{
+                        key: value for key, value in telemetry.items()
+                        if not isinstance(value, (dict, list))
+                    },
+                })
+
+        return pd.DataFrame(rows).set_index("compressed_media") \
+            if rows else pd.DataFrame()
+
+    def run_side_data(self, overwrite=False):
+        """
+        Extract the per-frame encoder side data of every compressed file.
+
+        The frame types, coded sizes and QP statistics are saved as NumPy
+        arrays next to the metrics JSON files, see side_data.extract.
+
+        Parameters
+        ----------
+        overwrite : bool, optional
+            Extract again the files already having side data, otherwise
+            only the files re-encoded since are. The default is False.
+
+        Raises
+        ------
+        ValueError
+            If there are no I/O files.
+
+        Returns
+        -------
+        dict
+            Dictionary with the compressed filename as key, and None, or
+            the error message if the extraction failed, as value.
+
+        """
+        if self.__io_files_list is None:
+            raise ValueError
+
+        errors = {}
+        for compressed_files in self.__io_files_list.values():
+            for compressed_file in compressed_files:
+                errors[compressed_file] = None
+                filename = side_data.side_data_filename(compressed_file)
+                if overwrite is False and os.path.isfile(filename) and \
+                        os.path.getmtime(filename) >= \
+                        os.path.getmtime(compressed_file):
+                    continue
+                try:
+                    side_data.save_side_data(
+                        compressed_file, side_data.extract(compressed_file))
+                except (OSError, RuntimeError) as exc:
+                    errors[compressed_file] = str(exc)
+
+        return errors
+
+    @staticmethod
+    def get_side_data(compressed_file):
+        """
+        Get a Pandas DataFrame of the per-frame encoder side data.
+
+        Parameters
+        ----------
+        compressed_file : str
+            Compressed media filename.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The side data indexed by "frame", counted from 1 as the metrics
+            DataFrames, see get_dataframes, without the QP histogram.
+            None if the side data wasn't extracted, see run_side_data.
+
+        """
+        data = side_data.load_side_data(compressed_file)
+        if data is None:
+            return None
+
+        df = pd.DataFrame({
+            key: value for key, value in data.items() if value.ndim == 1
+        })
+        df["frame"] = df.pop("n") + 1
+        return df.set_index("frame")
 
     # get the dataframes for the metrics of an individual file
     def get_dataframes(self,
@@ -310,8 +1123,8 @@ class VideoQualityTests:
             io_media = {"original": original, "compressed_files": {}}
 
             for compressed_file in compressed_files:
-                json_filename = compressed_file.split(".")[0] + ".json"
-                json_data = self.load_json(json_filename)
+                json_data = self.load_json(
+                    self.metrics_filename(compressed_file))
 
                 # array of pandas dataframes foreach metric in vq_metrics
                 dfs = self.get_dataframes(